@@ -1,18 +1,20 @@
+import hashlib
+import logging
+
 from langchain.prompts import PromptTemplate
-from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_postgres.vectorstores import PGVector
-from typing import Union
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from typing import AsyncIterator, List, Optional, Union
 
 # <<< CORREÇÃO: Importa o LLM definido no seu arquivo models.py
 from ..models import llm_gemini_flash 
+from ..registry import componente
+from ..retrieval import HybridRetriever
 
-# <<< CORREÇÃO: A lógica foi encapsulada em uma função que recebe os parâmetros necessários
-def generate_embedding_response(db_retriever: PGVector, query: str, history: str) -> Union[dict, None]:
-    """
-    Busca documentos relevantes no banco de vetores e gera uma resposta conversacional.
-    """
-    template = """
+logger = logging.getLogger(__name__)
+
+TEMPLATE_CONVERSA = """
                 Você é um assistente cordial e especializado em contratos.
 
                 Sua tarefa é usar:
@@ -34,26 +36,114 @@ def generate_embedding_response(db_retriever: PGVector, query: str, history: str
 
                 Agora, responda à pergunta com base apenas no que foi fornecido.
             """
+
+
+# Quantidade de trechos recuperados do banco de vetores por pergunta
+K_DOCUMENTOS = 10
+
+# Versão do prompt para o cache de respostas do chat: muda com o template, o modelo ou o K
+VERSAO_PROMPT_CONVERSA = hashlib.sha256(
+    "|".join([TEMPLATE_CONVERSA, llm_gemini_flash.model, str(K_DOCUMENTOS)]).encode("utf-8")
+).hexdigest()[:16]
+
+
+@componente
+def _build_answer_chain():
+    """Cadeia que "recheia" o prompt com os trechos recuperados e gera a resposta (texto)."""
+    prompt = PromptTemplate.from_template(TEMPLATE_CONVERSA)
+
+    # <<< CORREÇÃO: Usa a instância do LLM importada de models.py
+    return create_stuff_documents_chain(llm_gemini_flash, prompt)
+
+
+# <<< CORREÇÃO: A lógica foi encapsulada em uma função que recebe os parâmetros necessários
+def generate_embedding_response(retriever: BaseRetriever, query: str, history: str) -> Union[dict, None]:
+    """
+    Busca documentos relevantes com o retriever e gera uma resposta conversacional.
+    Retorna {"answer": ..., "context": [documentos]}.
+    """
     try:
-        prompt = PromptTemplate.from_template(template)
-
-        # <<< CORREÇÃO: Usa a instância do LLM importada de models.py
-        combine_docs_chain = create_stuff_documents_chain(llm_gemini_flash, prompt)
-        
-        # <<< CORREÇÃO: Cria o retriever a partir do banco de dados (db) passado como parâmetro
-        retriever = db_retriever.as_retriever(
-            search_kwargs={"k": 10}
-        )
-        
-        retrieval_chain = create_retrieval_chain(retriever, combine_docs_chain)
+        documents = retriever.invoke(query)
 
         # <<< CORREÇÃO: Invoca a cadeia com os parâmetros corretos
-        response = retrieval_chain.invoke({
-            "input": query, 
+        answer = _build_answer_chain().invoke({
+            "context": documents,
+            "input": query,
             "history": history
         })
-        
-        return response
+
+        return {"answer": answer, "context": documents}
     except Exception as e:
-        print(f"ERRO ao executar a cadeia de conversação: {e}")
-        return None
\ No newline at end of file
+        logger.exception("Erro ao executar a cadeia de conversação: %s", e)
+        return None
+
+
+async def agenerate_embedding_response(retriever: BaseRetriever, query: str, history: str) -> Union[dict, None]:
+    """
+    Versão assíncrona de generate_embedding_response.
+    """
+    try:
+        documents = await aretrieve_documents(retriever, query)
+
+        answer = await _build_answer_chain().ainvoke({
+            "context": documents,
+            "input": query,
+            "history": history
+        })
+
+        return {"answer": answer, "context": documents}
+    except Exception as e:
+        logger.exception("Erro ao executar a cadeia de conversação: %s", e)
+        return None
+
+
+def build_retriever(file_names: Optional[List[str]] = None) -> BaseRetriever:
+    """
+    Retriever do chat (busca híbrida lexical + vetorial), opcionalmente restrito a um
+    conjunto de arquivos. É só um objeto de configuração: criar um por requisição é barato.
+    """
+    return HybridRetriever(k=K_DOCUMENTOS, file_names=file_names or None)
+
+
+async def aretrieve_documents(retriever: BaseRetriever, query: str) -> List[Document]:
+    """Trechos mais relevantes para a pergunta."""
+    return await retriever.ainvoke(query)
+
+
+async def astream_embedding_response(documents: List[Document], query: str, history: str) -> AsyncIterator[str]:
+    """
+    Gera a resposta do chat em pedaços de texto, à medida que o LLM os produz,
+    a partir de trechos já recuperados (ver aretrieve_documents).
+    """
+    async for trecho in _build_answer_chain().astream({
+        "context": documents,
+        "input": query,
+        "history": history
+    }):
+        if trecho:
+            yield trecho
+
+
+TEMPLATE_RESUMO_HISTORICO = """
+                Você mantém o resumo de uma conversa entre um usuário e um assistente de contratos.
+
+                Resumo atual (pode estar vazio):
+                {resumo}
+
+                Novos turnos da conversa:
+                {turnos}
+
+                Escreva um novo resumo, curto e em português, que incorpore os novos turnos ao resumo atual.
+                Preserve os documentos, cláusulas, valores e datas citados e as conclusões já alcançadas.
+            """
+
+
+@componente
+def _build_summary_chain():
+    return PromptTemplate.from_template(TEMPLATE_RESUMO_HISTORICO) | llm_gemini_flash
+
+
+async def asummarize_history(resumo_anterior: str, turnos: str) -> str:
+    """Atualiza o resumo dos turnos antigos de um chat (usado pelo histórico em app/ia/chat_history.py)."""
+    response = await _build_summary_chain().ainvoke({"resumo": resumo_anterior, "turnos": turnos})
+    return response.content
@@ -1,26 +1,248 @@
-# Em app/ia/vectorstore.py
+import logging
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
-import asyncio
 from ..models import google_embedding
-from langchain_postgres.vectorstores import PGVector
-from langchain_core.documents import Document
-from config import GEMINI_API_KEY
-from database import DATABASE_URL
-from app.ia.utils import chunk_split, clean_text_data, pg_vector
-
-COLLECTION_NAME = "auditia_docs"
-
-def create_embeddings(pdf_pages, file_name):
-
-    documents = [
-        Document(
-            page_content=clean_text_data(page.page_content),
-            metadata={
-                "page_number": idx + 1,
-                "file_name": file_name
+from config import (
+    EMBEDDING_BATCH_SIZE, EMBEDDING_CONCORRENCIA, EMBEDDING_TEXTOS_POR_MINUTO, EMBEDDING_MAX_TENTATIVAS,
+)
+from app.ia.embedding_cache import CachedEmbedder
+from app.ia.rate_limit import TokenBucket
+from app.ia.pdf import clean_text_data
+from app.ia.utils import (
+    chunk_hash, chunk_separators, chunk_split, get_pg_vector, list_current_chunks, publish_chunk_version,
+)
+from app.observability import EMBEDDING_TEXTOS, medir_etapa
+
+logger = logging.getLogger(__name__)
+
+# Limite compartilhado por todas as ingestões do processo (cota do Gemini por minuto).
+# A capacidade permite rajadas de até 10 segundos de cota.
+_limite_gemini = TokenBucket(
+    rate_per_second=EMBEDDING_TEXTOS_POR_MINUTO / 60,
+    capacity=max(EMBEDDING_TEXTOS_POR_MINUTO / 6, EMBEDDING_BATCH_SIZE),
+)
+
+# Cache de embeddings por (hash do texto normalizado, modelo): só os chunks inéditos vão para o Gemini
+embedding_cache = CachedEmbedder(model_name=google_embedding.model)
+
+# Espera inicial e máxima (segundos) entre tentativas depois de um 429
+_BACKOFF_INICIAL = 2
+_BACKOFF_MAXIMO = 60
+
+
+def _eh_limite_de_taxa(erro: Exception) -> bool:
+    """Identifica erros de cota (HTTP 429 / RESOURCE_EXHAUSTED) vindos do Gemini."""
+    while erro is not None:
+        mensagem = str(erro)
+        if "429" in mensagem or "RESOURCE_EXHAUSTED" in mensagem or "ResourceExhausted" in type(erro).__name__:
+            return True
+        erro = erro.__cause__
+    return False
+
+
+def _embed_batch_gemini(textos: List[str]) -> List[List[float]]:
+    """Envia um lote ao Gemini respeitando a cota, com backoff exponencial em caso de 429."""
+    for tentativa in range(EMBEDDING_MAX_TENTATIVAS):
+        _limite_gemini.acquire(len(textos))
+        try:
+            with medir_etapa("embedding_gemini"):
+                vetores = google_embedding.embed_documents(textos, batch_size=len(textos))
+            EMBEDDING_TEXTOS.inc(len(textos))
+            return vetores
+        except Exception as e:
+            if not _eh_limite_de_taxa(e) or tentativa == EMBEDDING_MAX_TENTATIVAS - 1:
+                raise
+            espera = min(_BACKOFF_MAXIMO, _BACKOFF_INICIAL * 2 ** tentativa)
+            espera *= 0.5 + random.random() / 2  # jitter para os lotes não voltarem juntos
+            logger.warning(
+                "Cota do Gemini excedida, nova tentativa em %.1fs (%d/%d).", espera, tentativa + 1, EMBEDDING_MAX_TENTATIVAS
+            )
+            time.sleep(espera)
+
+
+def embed_batch(textos: List[str]) -> List[List[float]]:
+    """Embeddings de um lote, consultando o cache antes de chamar o Gemini."""
+    with medir_etapa("embedding_lote"):
+        return embedding_cache.embed_documents(textos, _embed_batch_gemini)
+
+
+def split_pages(pdf_pages, file_name) -> Iterator[Tuple[str, dict]]:
+    """Divide as páginas em chunks (chunk_split) e gera (chunk, metadados) de cada um."""
+    for idx, page in enumerate(pdf_pages):
+        conteudo = clean_text_data(page.page_content) or ""
+        page_number = page.metadata.get("page_number", idx + 1)
+        with medir_etapa("chunking"):
+            chunks = chunk_split(conteudo, with_offsets=True)
+        separadores = chunk_separators(conteudo, chunks)
+        for chunk_index, ((start_index, chunk), separador) in enumerate(zip(chunks, separadores)):
+            metadata = {
+                "page_number": page_number,
+                "chunk_index": chunk_index,
+                "start_index": start_index,
+                "file_name": file_name,
+                "chunk_hash": chunk_hash(chunk),
             }
+            if separador is not None:
+                # Espaço em branco antes do chunk, para a remontagem do texto (_remontar_paginas)
+                metadata["separator"] = separador
+            yield chunk, metadata
+
+
+def _gravar_lote(textos: List[str], metadatas: List[dict]) -> int:
+    """Embeddings de um lote de chunks e INSERT de todos eles no banco de vetores."""
+    embeddings = embed_batch(textos)
+    with medir_etapa("insercao_vetores"):
+        get_pg_vector().add_embeddings(texts=textos, embeddings=embeddings, metadatas=metadatas)
+    return len(textos)
+
+
+def create_embeddings(pdf_pages, file_name, on_progress: Optional[Callable[[int, Optional[int]], None]] = None) -> int:
+    """
+    Gera os embeddings das páginas e grava no banco de vetores. Retorna o total de chunks.
+
+    `pdf_pages` pode ser uma lista ou um gerador (ex: iter_pdf_documents): cada lote de
+    EMBEDDING_BATCH_SIZE chunks é enviado ao Gemini assim que fica completo, com até
+    EMBEDDING_CONCORRENCIA lotes simultâneos, e gravado com um único INSERT de várias
+    linhas assim que seus embeddings chegam. Com EMBEDDING_CONCORRENCIA * 2 lotes na fila,
+    a leitura das páginas espera um deles terminar: a memória não cresce com o tamanho do
+    PDF quando o Gemini é mais lento que a extração.
+    :param on_progress: Callback opcional on_progress(chunks_processados, total_chunks);
+        o total é None enquanto as páginas ainda estão sendo lidas.
+    """
+    tamanho_lote = max(1, min(EMBEDDING_BATCH_SIZE, 100))
+    concorrencia = max(1, EMBEDDING_CONCORRENCIA)
+    total = 0
+    lotes = 0
+    processados = 0
+    pendentes = set()
+
+    def coletar(concluidos, total_conhecido):
+        nonlocal processados
+        for futuro in concluidos:
+            pendentes.discard(futuro)
+            processados += futuro.result()
+            if on_progress:
+                on_progress(processados, total_conhecido)
+
+    with ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="embedding") as executor:
+        try:
+            textos, metadatas = [], []
+            for chunk, metadata in split_pages(pdf_pages, file_name):
+                textos.append(chunk)
+                metadatas.append(metadata)
+                total += 1
+                if len(textos) == tamanho_lote:
+                    pendentes.add(executor.submit(_gravar_lote, textos, metadatas))
+                    lotes += 1
+                    textos, metadatas = [], []
+                    # Contabiliza os lotes que já terminaram; só bloqueia a leitura das páginas
+                    # quando a fila de lotes enviados está cheia
+                    coletar([futuro for futuro in pendentes if futuro.done()], None)
+                    while len(pendentes) >= concorrencia * 2:
+                        concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                        coletar(concluidos, None)
+            if textos:
+                pendentes.add(executor.submit(_gravar_lote, textos, metadatas))
+                lotes += 1
+
+            if on_progress:
+                on_progress(processados, total)
+            coletar(as_completed(list(pendentes)), total)
+        except BaseException:
+            # Falhou um lote (ou a leitura do PDF): não adianta continuar enviando os demais
+            for futuro in pendentes:
+                futuro.cancel()
+            raise
+
+    logger.info("%d chunks de '%s' gravados em %d lotes.", total, file_name, lotes)
+    return total
+
+
+def _posicao(metadata: dict) -> tuple:
+    return metadata.get("page_number"), metadata.get("chunk_index"), metadata.get("start_index")
+
+
+def update_embeddings(
+    pdf_pages, file_name: str, version: int, on_progress: Optional[Callable[[int, Optional[int]], None]] = None
+) -> Dict[str, int]:
+    """
+    Reingestão incremental de uma nova versão do documento: compara os chunks da nova
+    versão com os vigentes pelo hash do conteúdo (chunk_hash) e só gera embeddings dos
+    chunks novos. Os que sumiram são marcados com superseded_in = version; os mantidos
+    que mudaram de posição (ex: uma página inserida antes deles) só têm os metadados
+    regravados.
+
+    Os chunks novos entram com pending_version = version, fora das buscas; a troca de
+    versão (publish_chunk_version) acontece numa única transação no fim, então o chat vê
+    a versão anterior inteira até lá, mesmo que a ingestão falhe no meio. Pode ser
+    repetida depois de uma falha: os chunks pendentes da tentativa anterior são reaproveitados.
+
+    Uma versão sem texto (ex: PDF só com imagens) remove todos os chunks da anterior: o
+    documento já aponta para o arquivo novo, e o chat não pode continuar respondendo com
+    o conteúdo antigo. Retorna {"total", "mantidos", "realocados", "inseridos", "removidos"}.
+    """
+    novos = list(split_pages(pdf_pages, file_name))
+
+    # Chunks gravados antes do metadado chunk_hash têm o hash calculado aqui
+    disponiveis: Dict[str, List[Tuple[str, dict]]] = defaultdict(list)
+    for id_, documento, metadata in list_current_chunks(file_name, pending_version=version):
+        disponiveis[metadata.get("chunk_hash") or chunk_hash(documento)].append((id_, metadata))
+
+    # Primeiro os chunks que continuam na mesma posição, depois os que só mudaram de lugar
+    # (um trecho repetido no contrato não "rouba" o par de outro que não se moveu)
+    correspondentes: Dict[int, Tuple[str, dict]] = {}
+    for mesma_posicao in (True, False):
+        for indice, (_, metadata) in enumerate(novos):
+            candidatos = disponiveis.get(metadata["chunk_hash"])
+            if indice in correspondentes or not candidatos:
+                continue
+            escolhido = next(
+                (c for c in candidatos if not mesma_posicao or _posicao(c[1]) == _posicao(metadata)), None
+            )
+            if escolhido is not None:
+                candidatos.remove(escolhido)
+                correspondentes[indice] = escolhido
+
+    # Mudaram de posição ou foram gravados antes do metadado chunk_hash
+    metadados_alterados = {
+        id_: novos[indice][1]
+        for indice, (id_, metadata) in correspondentes.items()
+        if _sem_pendencia(metadata) != novos[indice][1]
+    }
+    # Inseridos por uma tentativa anterior desta versão contam como inseridos
+    reaproveitados = sum(1 for _, metadata in correspondentes.values() if "pending_version" in metadata)
+    inserir = [chunk for indice, chunk in enumerate(novos) if indice not in correspondentes]
+    removidos = [id_ for candidatos in disponiveis.values() for id_, _ in candidatos]
+
+    total = len(novos)
+    processados = len(correspondentes)
+    if on_progress:
+        on_progress(processados, total)
+    tamanho_lote = max(1, min(EMBEDDING_BATCH_SIZE, 100))
+    for inicio in range(0, len(inserir), tamanho_lote):
+        lote = inserir[inicio:inicio + tamanho_lote]
+        processados += _gravar_lote(
+            [chunk for chunk, _ in lote], [{**metadata, "pending_version": version} for _, metadata in lote]
         )
-        for idx, page in enumerate(pdf_pages)
-    ]
+        if on_progress:
+            on_progress(processados, total)
+
+    publish_chunk_version(file_name, version, removidos, metadados_alterados)
+
+    resumo = {
+        "total": total,
+        "mantidos": len(correspondentes) - reaproveitados,
+        "realocados": len(metadados_alterados),
+        "inseridos": len(inserir) + reaproveitados,
+        "removidos": len(removidos),
+    }
+    logger.info("Versão %d de '%s': %s", version, file_name, resumo)
+    return resumo
+
 
-    pg_vector.add_documents(documents)
+def _sem_pendencia(metadata: dict) -> dict:
+    return {chave: valor for chave, valor in metadata.items() if chave != "pending_version"}
@@ -1,17 +1,31 @@
+import hashlib
+import logging
+from typing import AsyncIterator, List
+
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-from ..models import GEMINI_API_KEY
-from google.generativeai.types.safety_types import HarmCategory, HarmBlockThreshold
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_google_genai import ChatGoogleGenerativeAI, HarmCategory, HarmBlockThreshold
+from ..models import GEMINI_API_KEY, llm_gemini_flash
+from app.observability import metricas_llm
+from ..registry import componente
+from config import INSIGHTS_ORCAMENTO_TOKENS, INSIGHTS_TOKENS_POR_SECAO, INSIGHTS_CONCORRENCIA_SECOES
 
-def gerar_insights_proativos(texto_contrato: str) -> str:
-    """
-    Analisa o texto de um contrato e gera insights, riscos e dicas de forma proativa.
-    """
-    print("--- DEBUG: Entrou na função gerar_insights_proativos ---")
+logger = logging.getLogger(__name__)
 
-    # Instância do LLM com configurações de segurança personalizadas
-    llm_proativo_seguro = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash",
+# Aproximação de caracteres por token do Gemini em português (sem chamar a API de contagem)
+CARACTERES_POR_TOKEN = 4
+
+# Limite de rodadas de redução das seções (cada rodada encolhe o texto ~10x)
+_MAX_RODADAS_SECOES = 3
+
+# Modelo usado nos insights (faz parte da chave do cache de análises)
+MODELO_INSIGHTS = "gemini-1.5-flash"
+
+@componente
+def _build_llm_insights():
+    """Cliente do Gemini dos insights, com configurações de segurança personalizadas (um por processo)."""
+    return ChatGoogleGenerativeAI(
+        model=MODELO_INSIGHTS,
         google_api_key=GEMINI_API_KEY,
         safety_settings={
             HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
@@ -19,10 +33,141 @@ def gerar_insights_proativos(texto_contrato: str) -> str:
             HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
             HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
         },
+        callbacks=[metricas_llm],
     )
 
-    # --- PROMPT NOVO E MELHORADO ---
-    template = """
+
+@componente
+def _build_chain():
+    """Monta a cadeia prompt | LLM usada para gerar os insights proativos."""
+    prompt = PromptTemplate.from_template(TEMPLATE_INSIGHTS)
+
+    # Use a instância do LLM com as configurações de segurança
+    return prompt | _build_llm_insights()
+
+
+@componente
+def _build_section_chain():
+    """Cadeia do modo de documento longo: resume uma seção do contrato com o modelo flash."""
+    return PromptTemplate.from_template(TEMPLATE_SECAO) | llm_gemini_flash
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa de tokens do texto (~4 caracteres por token)."""
+    return len(texto) // CARACTERES_POR_TOKEN + 1
+
+
+def dividir_secoes(texto_contrato: str, tokens_por_secao: int = INSIGHTS_TOKENS_POR_SECAO) -> List[str]:
+    """Divide o contrato em seções de até `tokens_por_secao`, preferindo quebras de parágrafo e frase."""
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=tokens_por_secao * CARACTERES_POR_TOKEN,
+        chunk_overlap=0,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+    return splitter.split_text(texto_contrato)
+
+
+def _entradas_secoes(secoes: List[str]) -> List[dict]:
+    return [
+        {"secao": secao, "numero": numero, "total": len(secoes)}
+        for numero, secao in enumerate(secoes, start=1)
+    ]
+
+
+def _juntar_resumos(resumos) -> str:
+    return "\n\n".join(
+        f"### Seção {numero}\n{resumo.content}" for numero, resumo in enumerate(resumos, start=1)
+    )
+
+
+def _precisa_reduzir(texto: str, rodada: int) -> bool:
+    return estimar_tokens(texto) > INSIGHTS_ORCAMENTO_TOKENS and rodada < _MAX_RODADAS_SECOES
+
+
+def _condensar_contrato(texto_contrato: str) -> str:
+    """
+    Modo de documento longo (map): enquanto o texto passar do orçamento de tokens,
+    resume as seções em paralelo e substitui o texto pelos resumos concatenados.
+    Contratos dentro do orçamento passam direto, sem nenhuma chamada extra.
+    """
+    rodada = 0
+    while _precisa_reduzir(texto_contrato, rodada):
+        secoes = dividir_secoes(texto_contrato)
+        logger.info(
+            "Contrato com ~%d tokens: resumindo %d seções (rodada %d).",
+            estimar_tokens(texto_contrato), len(secoes), rodada + 1,
+        )
+        resumos = _build_section_chain().batch(
+            _entradas_secoes(secoes), config={"max_concurrency": INSIGHTS_CONCORRENCIA_SECOES}
+        )
+        texto_contrato = _juntar_resumos(resumos)
+        rodada += 1
+    return texto_contrato
+
+
+async def _acondensar_contrato(texto_contrato: str) -> str:
+    """Versão assíncrona de _condensar_contrato (abatch)."""
+    rodada = 0
+    while _precisa_reduzir(texto_contrato, rodada):
+        secoes = dividir_secoes(texto_contrato)
+        logger.info(
+            "Contrato com ~%d tokens: resumindo %d seções (rodada %d).",
+            estimar_tokens(texto_contrato), len(secoes), rodada + 1,
+        )
+        resumos = await _build_section_chain().abatch(
+            _entradas_secoes(secoes), config={"max_concurrency": INSIGHTS_CONCORRENCIA_SECOES}
+        )
+        texto_contrato = _juntar_resumos(resumos)
+        rodada += 1
+    return texto_contrato
+
+
+def gerar_insights_proativos(texto_contrato: str) -> str:
+    """
+    Analisa o texto de um contrato e gera insights, riscos e dicas de forma proativa.
+    Contratos acima de INSIGHTS_ORCAMENTO_TOKENS são resumidos por seção antes (map-reduce).
+    """
+    try:
+        texto_contrato = _condensar_contrato(texto_contrato)
+        chain = _build_chain()
+        logger.debug("Invocando o Gemini para os insights (~%d tokens).", estimar_tokens(texto_contrato))
+        response = chain.invoke({"contrato": texto_contrato})
+        return response.content
+
+    except Exception as e:
+        logger.exception("Erro em gerar_insights_proativos: %s", e)
+        raise e
+
+
+async def agerar_insights_proativos(texto_contrato: str) -> str:
+    """
+    Versão assíncrona de gerar_insights_proativos (usa ainvoke, sem ocupar uma thread).
+    """
+    try:
+        texto_contrato = await _acondensar_contrato(texto_contrato)
+        chain = _build_chain()
+        response = await chain.ainvoke({"contrato": texto_contrato})
+        return response.content
+
+    except Exception as e:
+        logger.exception("Erro em agerar_insights_proativos: %s", e)
+        raise e
+
+
+async def astream_insights_proativos(texto_contrato: str) -> AsyncIterator[str]:
+    """
+    Versão em streaming de agerar_insights_proativos: gera o resumo executivo em pedaços
+    de texto à medida que o modelo os produz (no modo de documento longo, depois do resumo
+    das seções).
+    """
+    texto_contrato = await _acondensar_contrato(texto_contrato)
+    async for trecho in _build_chain().astream({"contrato": texto_contrato}):
+        if trecho.content:
+            yield trecho.content
+
+
+# --- PROMPT NOVO E MELHORADO ---
+TEMPLATE_INSIGHTS = """
         Você é um consultor de contratos da AuditIA, um especialista em transformar documentos complexos em insights claros e acionáveis para executivos.
 
         **Objetivo:** Analisar o contrato fornecido e gerar um resumo executivo, elegante e conciso.
@@ -51,19 +196,30 @@ def gerar_insights_proativos(texto_contrato: str) -> str:
         {contrato}
         ---
     """
-    
-    try:
-        prompt = PromptTemplate.from_template(template)
-        
-        # Use a instância do LLM com as configurações de segurança
-        chain = prompt | llm_proativo_seguro
-        
-        print("--- DEBUG: Prestes a invocar a API do Gemini com o novo prompt... ---")
-        response = chain.invoke({"contrato": texto_contrato})
-        print("--- DEBUG: A API do Gemini respondeu com sucesso! ---")
-        
-        return response.content
 
-    except Exception as e:
-        print(f"--- ERRO CAPTURADO EM gerar_insights_proativos: {str(e)} ---")
-        raise e
\ No newline at end of file
+# Prompt do modo de documento longo: resumo de uma seção, preservando o que importa para os insights
+TEMPLATE_SECAO = """
+        Você é um analista de contratos da AuditIA. Abaixo está a seção {numero} de {total} de um contrato longo.
+
+        Resuma esta seção em português, em tópicos curtos, preservando com exatidão:
+        - Objeto, partes e obrigações principais.
+        - Valores, multas, reajustes e condições de pagamento.
+        - Prazos, datas, vigência, renovação e rescisão.
+        - Cláusulas de risco (responsabilidade, penalidades, confidencialidade, exclusividade).
+
+        Não invente informações; se a seção não tiver nada relevante, responda "Sem pontos relevantes".
+
+        ---
+        Seção {numero}/{total}:
+        {secao}
+        ---
+    """
+
+# Versão do prompt para o cache de análises: muda sempre que os templates, o modelo
+# das seções ou o orçamento de tokens forem alterados
+VERSAO_PROMPT_INSIGHTS = hashlib.sha256(
+    "|".join([
+        TEMPLATE_INSIGHTS, TEMPLATE_SECAO, llm_gemini_flash.model,
+        str(INSIGHTS_ORCAMENTO_TOKENS), str(INSIGHTS_TOKENS_POR_SECAO),
+    ]).encode("utf-8")
+).hexdigest()[:16]
@@ -1,6 +1,8 @@
+import logging
 import re
-from datetime import datetime, timedelta
-from typing import List, Dict, Union, Tuple, Optional
+import unicodedata
+from datetime import datetime
+from typing import List, Dict, Union, Tuple, Optional, Iterator, Iterable
 
 # Este arquivo de configuração conteria suas palavras-chave
 # Exemplo de REGRAS_RISCO em config.py:
@@ -10,16 +12,150 @@ from typing import List, Dict, Union, Tuple, Optional
 #     "CONFIDENCIALIDADE": ["confidencial", "sigilo", "não divulgar"],
 # }
 from config import REGRAS_RISCO
+from app.ia.prazos import CalendarioFeriados, ExtratorPrazos
+
+logger = logging.getLogger(__name__)
+
+# Separa o texto em sentenças (mesmo critério usado desde a primeira versão do agente)
+_RE_SEPARADOR_SENTENCA = re.compile(r'(?<=[.!?])\s+')
+
+# Tamanho máximo de uma sentença sem pontuação carregada entre páginas no modo streaming
+_LIMITE_SENTENCA_PENDENTE = 20_000
+
+
+def _montar_tabela_acentos() -> Dict[int, str]:
+    """Monta a tabela que troca letras acentuadas minúsculas pela letra base (ã -> a, ç -> c)."""
+    tabela = {}
+    for codigo in range(0xC0, 0x250):
+        caractere = chr(codigo).lower()
+        base = unicodedata.normalize("NFD", caractere)[0]
+        if base != caractere and base.isascii() and len(caractere) == 1:
+            tabela[codigo] = base
+    return tabela
+
+
+_TABELA_ACENTOS = _montar_tabela_acentos()
+# Mesma tabela em bytes para o caminho rápido (textos que cabem em latin-1)
+_TABELA_ACENTOS_LATIN1 = bytes(
+    ord(_TABELA_ACENTOS.get(codigo, chr(codigo))) for codigo in range(256)
+)
+_RE_NAO_ASCII = re.compile(r'[^\x00-\x7f]')
+
+
+def normalizar_texto(texto: str) -> str:
+    """
+    Remove acentos e converte para minúsculo mantendo o mesmo comprimento do texto,
+    de forma que os offsets encontrados no texto normalizado valem para o original.
+    """
+    texto_lower = texto.lower()
+    if texto_lower.isascii():
+        return texto_lower
+    try:
+        return texto_lower.encode("latin-1").translate(_TABELA_ACENTOS_LATIN1).decode("latin-1")
+    except UnicodeEncodeError:
+        return _RE_NAO_ASCII.sub(lambda m: _TABELA_ACENTOS.get(ord(m.group()), m.group()), texto_lower)
+
+
+def _regex_trie(chaves: List[str]) -> str:
+    """
+    Monta uma alternância fatorada em trie ("multa|mult" -> "mult(?:a)?"), para que o
+    motor de regex descarte a maioria das posições comparando um único caractere.
+    """
+    trie: Dict = {}
+    for chave in chaves:
+        no = trie
+        for caractere in chave:
+            no = no.setdefault(caractere, {})
+        no[""] = True
+
+    def _montar(no: Dict) -> str:
+        ramos = [re.escape(caractere) + _montar(filho) for caractere, filho in sorted(no.items()) if caractere]
+        if not ramos:
+            return ""
+        corpo = ramos[0] if len(ramos) == 1 else "(?:" + "|".join(ramos) + ")"
+        if "" in no:
+            # Gulosa: prefere sempre a palavra mais longa
+            return "(?:" + corpo + ")?"
+        return corpo
+
+    return _montar(trie)
+
+
+class MatcherRegrasRisco:
+    """
+    Compila todas as palavras-chave de REGRAS_RISCO em uma única expressão regular.
+
+    O texto é varrido uma única vez e cada ocorrência é devolvida como
+    (categoria, palavra_chave, offset), inclusive as que se sobrepõem ("comarcas" aciona
+    "comarca" e "marcas"). A comparação ignora acentos e maiúsculas, então "rescisao" e
+    "Rescisão" acionam a mesma regra.
+    """
+
+    def __init__(self, regras: Dict[str, List[str]]):
+        self.categorias = list(regras.keys())
+
+        # palavra normalizada -> lista de (categoria, palavra original)
+        ocorrencias: Dict[str, List[Tuple[str, str]]] = {}
+        for categoria, palavras_chave in regras.items():
+            for palavra in palavras_chave:
+                chave = normalizar_texto(palavra)
+                if chave and (categoria, palavra) not in ocorrencias.setdefault(chave, []):
+                    ocorrencias[chave].append((categoria, palavra))
+
+        # A regex é avaliada em todas as posições (lookahead de largura zero, que não consome
+        # o texto) e devolve a palavra mais longa que começa em cada uma; as palavras-chave
+        # que são prefixo dela (ex: "multa" em "multas") são resolvidas aqui, na compilação.
+        # As que começam mais adiante (ex: "marcas" em "comarcas") saem da sua própria posição.
+        self._acertos_por_chave: Dict[str, List[Tuple[str, str]]] = {
+            chave: [item for outra, itens in ocorrencias.items() if chave.startswith(outra) for item in itens]
+            for chave in ocorrencias
+        }
+
+        self._padrao = re.compile("(?=(" + _regex_trie(list(ocorrencias)) + "))") if ocorrencias else None
+
+    def varrer(self, texto: str, texto_normalizado: Optional[str] = None) -> Iterator[Tuple[str, str, int]]:
+        """Varre o texto em uma única passada e gera (categoria, palavra_chave, offset), em ordem de offset."""
+        if self._padrao is None:
+            return
+        if texto_normalizado is None:
+            texto_normalizado = normalizar_texto(texto)
+        for match in self._padrao.finditer(texto_normalizado):
+            inicio = match.start()
+            for categoria, palavra in self._acertos_por_chave[match.group(1)]:
+                yield categoria, palavra, inicio
+
+    def categorias_encontradas(self, texto: str) -> List[str]:
+        """Retorna as categorias presentes no texto, na ordem definida em REGRAS_RISCO."""
+        encontradas = {categoria for categoria, _, _ in self.varrer(texto)}
+        return [categoria for categoria in self.categorias if categoria in encontradas]
+
+
+def dividir_sentencas(texto: str) -> Tuple[List[str], List[int]]:
+    """Divide o texto em sentenças e devolve também o offset de início de cada uma."""
+    sentencas = []
+    inicios = []
+    inicio = 0
+    for separador in _RE_SEPARADOR_SENTENCA.finditer(texto):
+        sentencas.append(texto[inicio:separador.start()])
+        inicios.append(inicio)
+        inicio = separador.end()
+    sentencas.append(texto[inicio:])
+    inicios.append(inicio)
+    return sentencas, inicios
+
 
 class AgenteRiscoPrazos:
-    def __init__(self, dias_alerta_proximo: int = 30):
+    def __init__(self, dias_alerta_proximo: int = 30, calendario: Optional[CalendarioFeriados] = None):
         """
         Inicializa o agente.
         :param dias_alerta_proximo: Número de dias para considerar um prazo como "próximo do vencimento".
+        :param calendario: Calendário de feriados para prazos em dias úteis (padrão: FERIADOS_ARQUIVO).
         """
         self.regras_risco = REGRAS_RISCO
+        self.matcher_risco = MatcherRegrasRisco(self.regras_risco)
+        self.extrator_prazos = ExtratorPrazos(calendario)
         self.dias_alerta_proximo = dias_alerta_proximo
-        print("AgenteRiscoPrazos inicializado.")
+        logger.debug("AgenteRiscoPrazos inicializado.")
 
     def processar_contrato(self, texto_contrato: str, nome_arquivo: str) -> Dict[str, Union[str, List[Dict]]]:
         """
@@ -29,55 +165,168 @@ class AgenteRiscoPrazos:
         alertas_prazo = []
 
         # 1. Divide o texto em sentenças de forma mais inteligente
-        sentencas = re.split(r'(?<=[.!?])\s+', texto_contrato)
-        print(f"Contrato '{nome_arquivo}' dividido em {len(sentencas)} sentenças para análise.")
+        sentencas, inicios = dividir_sentencas(texto_contrato)
+        logger.info("Contrato '%s' dividido em %d sentenças para análise.", nome_arquivo, len(sentencas))
+
+        # 2. Analisa as sentenças (riscos e prazos)
+        for tipo, _, alerta in self._analisar_sentencas(texto_contrato, sentencas, inicios):
+            if tipo == "risco":
+                alertas_risco.append(alerta)
+            else:
+                alertas_prazo.append(alerta)
+
+        # 3. Ordena os prazos por data (do mais antigo para o mais novo)
+        alertas_prazo_ordenados = sorted(alertas_prazo, key=lambda p: p['deadline'])
+
+        return {
+            "nome_arquivo": nome_arquivo,
+            "alertas_risco": alertas_risco,
+            "alertas_prazo": alertas_prazo_ordenados
+        }
 
-        # 2. Itera sobre cada sentença para análise individual
-        for sentenca in sentencas:
-            if not sentenca.strip():
+    def processar_contrato_paginas(self, paginas: Iterable[str], nome_arquivo: str) -> Iterator[Dict]:
+        """
+        Versão em streaming de processar_contrato: consome as páginas uma a uma e gera
+        cada alerta assim que a sentença correspondente termina, com o número da página.
+
+        Só a página atual e a sentença incompleta que atravessa a quebra de página ficam
+        em memória. Cada alerta tem "tipo" ("risco" ou "prazo") e "pagina" (onde a sentença começa).
+        """
+        pendente = ""
+        pagina_pendente = 1
+        total_paginas = 0
+
+        for numero_pagina, texto_pagina in enumerate(paginas, start=1):
+            total_paginas = numero_pagina
+            if pendente:
+                texto = pendente + "\n" + texto_pagina
+            else:
+                texto = texto_pagina
+                pagina_pendente = numero_pagina
+
+            sentencas, inicios = dividir_sentencas(texto)
+
+            # A última sentença pode continuar na próxima página; ela fica pendente,
+            # a menos que cresça demais (página sem pontuação).
+            if len(sentencas[-1]) <= _LIMITE_SENTENCA_PENDENTE:
+                completas = len(sentencas) - 1
+            else:
+                completas = len(sentencas)
+
+            for tipo, indice, alerta in self._analisar_sentencas(texto, sentencas, inicios, completas):
+                alerta["tipo"] = tipo
+                alerta["pagina"] = pagina_pendente if indice == 0 else numero_pagina
+                yield alerta
+
+            if completas < len(sentencas):
+                if completas > 0:
+                    pagina_pendente = numero_pagina
+                pendente = sentencas[-1]
+            else:
+                pendente = ""
+
+        if pendente.strip():
+            sentencas, inicios = dividir_sentencas(pendente)
+            for tipo, _, alerta in self._analisar_sentencas(pendente, sentencas, inicios):
+                alerta["tipo"] = tipo
+                alerta["pagina"] = pagina_pendente
+                yield alerta
+
+        logger.info("Contrato '%s' processado em streaming (%d páginas).", nome_arquivo, total_paginas)
+
+    def _analisar_sentencas(
+        self, texto: str, sentencas: List[str], inicios: List[int], quantidade: Optional[int] = None
+    ) -> Iterator[Tuple[str, int, Dict]]:
+        """
+        Gera ("risco" | "prazo", índice da sentença, alerta) para as primeiras `quantidade`
+        sentenças de `texto` (todas, por padrão).
+        """
+        if quantidade is None:
+            quantidade = len(sentencas)
+        sentencas = sentencas[:quantidade]
+
+        # Varre o texto uma única vez e distribui as ocorrências por sentença
+        riscos_por_sentenca = self._riscos_por_sentenca(texto, inicios)
+
+        # Resolve todos os prazos de uma vez (dias úteis em uma única chamada vetorizada)
+        prazos = self.extrator_prazos.extrair_lote(sentencas)
+
+        for indice, sentenca in enumerate(sentencas):
+            fonte = sentenca.strip()
+            if not fonte:
                 continue
 
-            # Extrai riscos da sentença
-            riscos_encontrados = self._classificar_risco(sentenca)
-            if riscos_encontrados:
-                for risco in riscos_encontrados:
-                    alertas_risco.append({
-                        "tipo_risco": risco,
-                        "fonte": sentenca.strip(),
-                        "confianca": 0.9 # Placeholder para futura lógica de confiança
-                    })
-
-            # Extrai prazos da sentença
-            prazo_encontrado = self._extrair_prazo(sentenca)
+            # Riscos da sentença (os alertas compartilham a mesma string de fonte)
+            for risco in riscos_por_sentenca.get(indice, ()):
+                yield "risco", indice, {
+                    "tipo_risco": risco,
+                    "fonte": fonte,
+                    "confianca": 0.9 # Placeholder para futura lógica de confiança
+                }
+
+            # Prazo da sentença
+            prazo_encontrado = prazos[indice]
             if prazo_encontrado:
                 data_limite, evento = prazo_encontrado
                 status, dias_restantes = self._get_status_prazo(data_limite)
-                
-                alertas_prazo.append({
+
+                yield "prazo", indice, {
                     "evento": evento,
                     "deadline": data_limite.isoformat(),
                     "status": status,
                     "dias_restantes": dias_restantes,
-                    "fonte": sentenca.strip()
-                })
-        
-        # 3. Ordena os prazos por data (do mais antigo para o mais novo)
-        alertas_prazo_ordenados = sorted(alertas_prazo, key=lambda p: p['deadline'])
+                    "fonte": fonte
+                }
+
+    def atualizar_prazos(self, alertas_prazo: List[Dict], data_referencia: Optional[datetime] = None) -> List[Dict]:
+        """
+        Recalcula data limite, status e dias restantes de alertas de prazo já extraídos
+        (ex: vindos do cache de análises), a partir da sentença de origem de cada um.
+        Só as sentenças com prazo são reprocessadas, então o custo é desprezível.
+        """
+        prazos = self.extrator_prazos.extrair_lote([alerta["fonte"] for alerta in alertas_prazo], data_referencia)
+
+        atualizados = []
+        for alerta, prazo_encontrado in zip(alertas_prazo, prazos):
+            if not prazo_encontrado:
+                continue
+            data_limite, evento = prazo_encontrado
+            status, dias_restantes = self._get_status_prazo(data_limite)
+            atualizados.append({
+                **alerta,
+                "evento": evento,
+                "deadline": data_limite.isoformat(),
+                "status": status,
+                "dias_restantes": dias_restantes,
+            })
+        return sorted(atualizados, key=lambda p: p['deadline'])
+
+    def varrer_riscos(self, texto: str) -> Iterator[Tuple[str, str, int]]:
+        """Gera (categoria, palavra_chave, offset) para cada ocorrência de risco no texto."""
+        return self.matcher_risco.varrer(texto)
 
+    def _riscos_por_sentenca(self, texto_contrato: str, inicios: List[int]) -> Dict[int, List[str]]:
+        """
+        Faz uma única varredura no contrato e agrupa as categorias encontradas pelo
+        índice da sentença, a partir dos offsets de início devolvidos por dividir_sentencas.
+        """
+        encontrados: Dict[int, set] = {}
+        indice = 0
+        for categoria, _, offset in self.varrer_riscos(texto_contrato):
+            # As ocorrências chegam em ordem crescente de offset
+            while indice + 1 < len(inicios) and inicios[indice + 1] <= offset:
+                indice += 1
+            encontrados.setdefault(indice, set()).add(categoria)
+
+        ordem = self.matcher_risco.categorias
         return {
-            "nome_arquivo": nome_arquivo,
-            "alertas_risco": alertas_risco,
-            "alertas_prazo": alertas_prazo_ordenados
+            indice: [categoria for categoria in ordem if categoria in categorias]
+            for indice, categorias in encontrados.items()
         }
 
     def _classificar_risco(self, texto: str) -> List[str]:
         """Verifica uma sentença e retorna uma lista de todos os tipos de risco encontrados."""
-        riscos = []
-        texto_lower = texto.lower()
-        for tipo, palavras_chave in self.regras_risco.items():
-            if any(palavra in texto_lower for palavra in palavras_chave):
-                riscos.append(tipo)
-        return riscos
+        return self.matcher_risco.categorias_encontradas(texto)
 
     def _get_status_prazo(self, data_limite: datetime) -> Tuple[str, int]:
         """Determina o status de um prazo (Vencido, Alerta Próximo, OK)."""
@@ -93,53 +342,37 @@ class AgenteRiscoPrazos:
 
     def _extrair_prazo(self, texto: str) -> Optional[Tuple[datetime, str]]:
         """Extrai a primeira data ou prazo encontrado em uma sentença."""
-        texto_lower = texto.lower()
-        data_referencia = datetime.now()
-
-        # Padrão 1: "em até XX dias/meses (úteis/corridos)"
-        match = re.search(r'em até (\d+)\s*(?:\(.*\))?\s*(dias|meses)\s*(úteis|corridos)?', texto_lower)
-        if match:
-            quantidade = int(match.group(1))
-            unidade = match.group(2)
-            tipo_dias = match.group(3) if match.group(3) else "corridos"
-
-            if unidade == "meses":
-                data_limite = data_referencia + timedelta(days=quantidade * 30)
-                evento = f"Prazo de {quantidade} meses"
-            else: # dias
-                if tipo_dias == "úteis":
-                    data_limite = self._calcular_data_util(data_referencia, quantidade)
-                    evento = f"Prazo de {quantidade} dias úteis"
-                else:
-                    data_limite = data_referencia + timedelta(days=quantidade)
-                    evento = f"Prazo de {quantidade} dias corridos"
-            return data_limite, evento
-
-        # Padrão 2: "até o dia DD de MM de YYYY"
-        match_data = re.search(r'até (?:o dia )?(\d{1,2}) de (\w+) de (\d{4})', texto_lower)
-        if match_data:
-            dia, mes_str, ano = match_data.groups()
-            meses = {
-                'janeiro': 1, 'fevereiro': 2, 'março': 3, 'abril': 4, 'maio': 5, 'junho': 6,
-                'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12
-            }
-            mes = meses.get(mes_str)
-            if mes:
-                data_limite = datetime(int(ano), mes, int(dia))
-                evento = f"Data limite em {dia}/{mes}/{ano}"
-                return data_limite, evento
-
-        return None
+        return self.extrator_prazos.extrair(texto)
 
     def _calcular_data_util(self, data_inicial: datetime, dias: int) -> datetime:
-        """Calcula uma data futura considerando apenas dias úteis (Seg-Sex)."""
-        dias_adicionados = 0
-        data_atual = data_inicial
-        while dias_adicionados < dias:
-            data_atual += timedelta(days=1)
-            if data_atual.weekday() < 5: # 0=Segunda, 4=Sexta
-                dias_adicionados += 1
-        return data_atual
+        """Calcula uma data futura considerando apenas dias úteis (Seg-Sex, exceto feriados)."""
+        data_limite = self.extrator_prazos.calendario.somar_dias_uteis(data_inicial.date(), [dias])[0]
+        return datetime.combine(data_limite, data_inicial.time())
+
+# Agente reaproveitado pelos processos do pool de análise em lote (um por processo)
+# e pelo recálculo dos prazos vindos do cache de análises
+_agente_processo: Optional[AgenteRiscoPrazos] = None
+
+
+def analisar_texto_contrato(texto_contrato: str, nome_arquivo: str) -> Dict[str, Union[str, List[Dict]]]:
+    """
+    Ponto de entrada da análise por regras em um processo do pool (ver app.ia.executor).
+    Precisa ser uma função de módulo para poder ser enviada ao processo filho.
+    """
+    return _agente().processar_contrato(texto_contrato=texto_contrato, nome_arquivo=nome_arquivo)
+
+
+def atualizar_prazos(alertas_prazo: List[Dict]) -> List[Dict]:
+    """Recalcula os status dos prazos em relação à data atual (ver AgenteRiscoPrazos.atualizar_prazos)."""
+    return _agente().atualizar_prazos(alertas_prazo)
+
+
+def _agente() -> AgenteRiscoPrazos:
+    global _agente_processo
+    if _agente_processo is None:
+        _agente_processo = AgenteRiscoPrazos()
+    return _agente_processo
+
 
 # --- Exemplo de como usar o agente ---
 if __name__ == '__main__':
@@ -0,0 +1,76 @@
+import hashlib
+import json
+from typing import NamedTuple, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.ia.agents.agent_proativo import MODELO_INSIGHTS, VERSAO_PROMPT_INSIGHTS
+from app.schemas import AnalysisResult, Document
+from config import REGRAS_RISCO
+from database import async_engine, engine
+
+
+def versao_regras(regras=REGRAS_RISCO) -> str:
+    """Hash das regras de risco: qualquer palavra-chave nova invalida os resultados em cache."""
+    serializado = json.dumps(regras, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+VERSAO_REGRAS = versao_regras()
+
+
+class ChaveAnalise(NamedTuple):
+    content_hash: str
+    rules_version: str = VERSAO_REGRAS
+    model: str = MODELO_INSIGHTS
+    prompt_version: str = VERSAO_PROMPT_INSIGHTS
+
+
+def hash_texto(texto: str) -> str:
+    """Hash do texto remontado, usado quando o documento não tem content_hash (uploads antigos)."""
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+async def abuscar_documento(file_name: str):
+    """
+    (content_hash, status) do documento registrado no upload, ou None (documentos
+    ingeridos antes da tabela documents). content_hash é o SHA-256 do arquivo enviado.
+    """
+    async with async_engine.connect() as conn:
+        return (await conn.execute(
+            select(Document.content_hash, Document.status).where(Document.file_name == file_name)
+        )).one_or_none()
+
+
+async def abuscar_resultado(chave: ChaveAnalise) -> Optional[dict]:
+    async with async_engine.connect() as conn:
+        return (await conn.execute(
+            select(AnalysisResult.result).where(
+                AnalysisResult.content_hash == chave.content_hash,
+                AnalysisResult.rules_version == chave.rules_version,
+                AnalysisResult.model == chave.model,
+                AnalysisResult.prompt_version == chave.prompt_version,
+            )
+        )).scalar_one_or_none()
+
+
+async def agravar_resultado(chave: ChaveAnalise, file_name: str, resultado: dict):
+    """Grava (ou substitui, no caso de ?refresh=true) o resultado da análise."""
+    comando = insert(AnalysisResult).values(file_name=file_name, result=resultado, **chave._asdict())
+    comando = comando.on_conflict_do_update(
+        constraint="uq_analysis_results_chave",
+        set_={"result": comando.excluded.result, "file_name": file_name, "created_at": comando.excluded.created_at},
+    )
+    async with async_engine.begin() as conn:
+        await conn.execute(comando)
+
+
+def invalidar_analises(file_name: str) -> int:
+    """
+    Apaga os resultados gravados a partir do documento. Chamar sempre que ele for
+    (re)ingerido: uma nova versão troca o content_hash antes de os chunks ficarem prontos.
+    """
+    with engine.begin() as conn:
+        resultado = conn.execute(delete(AnalysisResult).where(AnalysisResult.file_name == file_name))
+    return resultado.rowcount
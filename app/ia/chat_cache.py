@@ -0,0 +1,101 @@
+"""
+Cache de respostas do chat (segundo nível; o primeiro, dos embeddings das perguntas,
+fica em app/ia/retrieval.py).
+
+As respostas ficam na tabela chat_answer_cache, compartilhada entre processos. Uma
+pergunta nova reaproveita a resposta de outra já feita sobre o mesmo conjunto de
+documentos quando a distância de cosseno entre as duas é até CHAT_CACHE_DISTANCIA_MAX.
+
+As respostas de um conjunto de documentos são apagadas quando qualquer um deles é
+(re)ingerido; as da coleção inteira (sem filtro), quando qualquer documento é.
+"""
+import datetime
+import hashlib
+import json
+from typing import List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.ia.agents.agent_conversation import VERSAO_PROMPT_CONVERSA
+from app.schemas import ChatAnswerCache
+from config import CHAT_CACHE_ATIVO, CHAT_CACHE_DISTANCIA_MAX, CHAT_CACHE_TTL_HORAS
+from database import async_engine, engine
+
+
+class RespostaEmCache(NamedTuple):
+    answer: str
+    sources: list
+    question: str  # pergunta que originou a resposta
+    distance: float
+
+
+def _escopo(file_names: Optional[Sequence[str]]) -> List[str]:
+    return sorted(set(file_names or []))
+
+
+def _hash_escopo(escopo: List[str]) -> str:
+    return hashlib.sha256(json.dumps(escopo, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _inicio_validade() -> datetime.datetime:
+    return datetime.datetime.utcnow() - datetime.timedelta(hours=CHAT_CACHE_TTL_HORAS)
+
+
+async def abuscar_resposta(embedding: Sequence[float], file_names: Optional[Sequence[str]]) -> Optional[RespostaEmCache]:
+    """Resposta já dada a uma pergunta próxima sobre os mesmos documentos, se houver."""
+    if not CHAT_CACHE_ATIVO:
+        return None
+    distancia = ChatAnswerCache.embedding.cosine_distance(list(embedding))
+    async with async_engine.connect() as conn:
+        linha = (await conn.execute(
+            select(ChatAnswerCache.answer, ChatAnswerCache.sources, ChatAnswerCache.question, distancia.label("distancia"))
+            .where(
+                ChatAnswerCache.scope_hash == _hash_escopo(_escopo(file_names)),
+                ChatAnswerCache.prompt_version == VERSAO_PROMPT_CONVERSA,
+                ChatAnswerCache.created_at > _inicio_validade(),
+            )
+            .order_by(distancia)
+            .limit(1)
+        )).one_or_none()
+    if linha is None or linha.distancia > CHAT_CACHE_DISTANCIA_MAX:
+        return None
+    return RespostaEmCache(linha.answer, linha.sources, linha.question, float(linha.distancia))
+
+
+async def agravar_resposta(
+    query: str, embedding: Sequence[float], file_names: Optional[Sequence[str]], answer: str, sources: list
+):
+    if not CHAT_CACHE_ATIVO:
+        return
+    escopo = _escopo(file_names)
+    async with async_engine.begin() as conn:
+        # Aproveita para descartar as respostas vencidas do mesmo escopo
+        await conn.execute(delete(ChatAnswerCache).where(
+            ChatAnswerCache.scope_hash == _hash_escopo(escopo),
+            ChatAnswerCache.created_at <= _inicio_validade(),
+        ))
+        await conn.execute(insert(ChatAnswerCache).values(
+            scope_hash=_hash_escopo(escopo),
+            file_names=escopo,
+            prompt_version=VERSAO_PROMPT_CONVERSA,
+            question=query,
+            embedding=list(embedding),
+            answer=answer,
+            sources=sources,
+        ))
+
+
+def invalidar_respostas(file_name: str) -> int:
+    """
+    Apaga as respostas em cache que dependem do documento: as restritas a conjuntos que
+    o incluem e as da coleção inteira. Chamar sempre que o documento for (re)ingerido.
+    """
+    with engine.begin() as conn:
+        resultado = conn.execute(
+            delete(ChatAnswerCache).where(or_(
+                ChatAnswerCache.file_names.contains([file_name]),
+                ChatAnswerCache.scope_hash == _hash_escopo([]),
+            ))
+        )
+    return resultado.rowcount
@@ -0,0 +1,154 @@
+"""
+Histórico do chat em tabelas relacionais (chat_messages / chat_summaries).
+
+Gravar um turno é um INSERT simples, sem embedding nem chamada externa. Na leitura,
+o histórico enviado ao LLM é a janela dos últimos CHAT_HISTORICO_TURNOS turnos
+limitada a CHAT_HISTORICO_TOKENS, precedida do resumo dos turnos mais antigos,
+quando CHAT_RESUMO_ATIVO está ligado.
+"""
+import asyncio
+import datetime
+import logging
+from typing import List, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
+
+from app.ia.agents.agent_conversation import asummarize_history
+from app.ia.agents.agent_proativo import estimar_tokens
+from app.schemas import ChatMessage, ChatSummary
+from config import CHAT_HISTORICO_TURNOS, CHAT_HISTORICO_TOKENS, CHAT_RESUMO_ATIVO, CHAT_RESUMO_A_CADA
+from database import async_engine
+
+logger = logging.getLogger(__name__)
+
+# Chats com resumo em andamento neste processo (evita dois resumos simultâneos do mesmo chat)
+_resumos_em_andamento: Set[str] = set()
+# Referências às tarefas em segundo plano, para não serem coletadas antes de terminar
+_tarefas: Set[asyncio.Task] = set()
+
+
+def formatar_turno(pergunta: str, resposta: str) -> str:
+    return f"Usuário: {pergunta}\nIA: {resposta}"
+
+
+async def asalvar_turno(chat_id: str, pergunta: str, resposta: str):
+    """Grava um turno do chat e, se configurado, agenda o resumo dos turnos antigos."""
+    async with async_engine.begin() as conn:
+        await conn.execute(insert(ChatMessage).values(
+            chat_id=chat_id,
+            user_message=pergunta,
+            ai_message=resposta,
+            tokens=estimar_tokens(formatar_turno(pergunta, resposta)),
+        ))
+    if CHAT_RESUMO_ATIVO:
+        agendar_resumo(chat_id)
+
+
+async def _abuscar_resumo(conn, chat_id: str) -> Optional[Row]:
+    return (await conn.execute(
+        select(ChatSummary.summary, ChatSummary.last_message_id).where(ChatSummary.chat_id == chat_id)
+    )).one_or_none()
+
+
+async def acarregar_historico(
+    chat_id: str, max_turnos: int = CHAT_HISTORICO_TURNOS, max_tokens: int = CHAT_HISTORICO_TOKENS
+) -> str:
+    """
+    Histórico formatado para o campo {history} do prompt: resumo dos turnos antigos (se houver)
+    e os últimos `max_turnos` turnos que couberem em `max_tokens`, do mais antigo ao mais novo.
+    """
+    async with async_engine.connect() as conn:
+        resumo = await _abuscar_resumo(conn, chat_id)
+        consulta = (
+            select(ChatMessage.user_message, ChatMessage.ai_message, ChatMessage.tokens)
+            .where(ChatMessage.chat_id == chat_id)
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(max_turnos)
+        )
+        if resumo is not None:
+            # Os turnos já resumidos não se repetem na janela
+            consulta = consulta.where(ChatMessage.id > resumo.last_message_id)
+        turnos = (await conn.execute(consulta)).all()
+
+    janela: List[str] = []
+    tokens = estimar_tokens(resumo.summary) if resumo is not None else 0
+    for pergunta, resposta, tokens_turno in turnos:
+        if tokens + tokens_turno > max_tokens:
+            break
+        janela.append(formatar_turno(pergunta, resposta))
+        tokens += tokens_turno
+    janela.reverse()
+
+    if resumo is not None:
+        janela.insert(0, f"Resumo da conversa anterior: {resumo.summary}")
+    return "\n\n".join(janela)
+
+
+def agendar_resumo(chat_id: str):
+    """Dispara o resumo dos turnos antigos em segundo plano (não atrasa a resposta ao usuário)."""
+    if chat_id in _resumos_em_andamento:
+        return
+    _resumos_em_andamento.add(chat_id)
+    tarefa = asyncio.get_running_loop().create_task(_aresumir_turnos_antigos(chat_id))
+    _tarefas.add(tarefa)
+    tarefa.add_done_callback(_tarefas.discard)
+
+
+async def _aresumir_turnos_antigos(chat_id: str):
+    """
+    Incorpora ao resumo do chat os turnos que já saíram da janela de CHAT_HISTORICO_TURNOS,
+    quando houver pelo menos CHAT_RESUMO_A_CADA deles ainda não resumidos.
+    """
+    try:
+        async with async_engine.connect() as conn:
+            resumo = await _abuscar_resumo(conn, chat_id)
+            ultimo_resumido = resumo.last_message_id if resumo is not None else 0
+
+            # Primeiro id da janela atual: tudo antes dele está fora do histórico enviado ao LLM
+            inicio_janela = (await conn.execute(
+                select(func.min(ChatMessage.id)).where(
+                    ChatMessage.id.in_(
+                        select(ChatMessage.id)
+                        .where(ChatMessage.chat_id == chat_id)
+                        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+                        .limit(CHAT_HISTORICO_TURNOS)
+                    )
+                )
+            )).scalar_one_or_none()
+            if inicio_janela is None:
+                return
+
+            antigos = (await conn.execute(
+                select(ChatMessage.id, ChatMessage.user_message, ChatMessage.ai_message)
+                .where(
+                    ChatMessage.chat_id == chat_id,
+                    ChatMessage.id > ultimo_resumido,
+                    ChatMessage.id < inicio_janela,
+                )
+                .order_by(ChatMessage.created_at, ChatMessage.id)
+            )).all()
+
+        if len(antigos) < CHAT_RESUMO_A_CADA:
+            return
+
+        novo_resumo = await asummarize_history(
+            resumo.summary if resumo is not None else "",
+            "\n\n".join(formatar_turno(pergunta, resposta) for _, pergunta, resposta in antigos),
+        )
+
+        comando = insert(ChatSummary).values(chat_id=chat_id, summary=novo_resumo, last_message_id=antigos[-1].id)
+        comando = comando.on_conflict_do_update(
+            index_elements=[ChatSummary.chat_id],
+            set_={"summary": comando.excluded.summary, "last_message_id": comando.excluded.last_message_id,
+                  "updated_at": datetime.datetime.utcnow()},
+        )
+        async with async_engine.begin() as conn:
+            await conn.execute(comando)
+        logger.info("Histórico do chat '%s': %d turnos incorporados ao resumo.", chat_id, len(antigos))
+    except Exception as e:
+        # O resumo é só uma otimização do contexto: falhas não afetam o chat
+        logger.warning("Erro ao resumir o histórico do chat '%s': %s", chat_id, e)
+    finally:
+        _resumos_em_andamento.discard(chat_id)
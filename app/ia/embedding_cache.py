@@ -0,0 +1,109 @@
+import hashlib
+import re
+import time
+import unicodedata
+from typing import Callable, Dict, List
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.observability import EMBEDDING_CACHE_GEMINI_SEGUNDOS, EMBEDDING_CACHE_TEXTOS, somar_contador
+from app.schemas import EmbeddingCache
+from database import engine
+
+_RE_ESPACOS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza o chunk antes do hash: forma NFC e espaços/quebras de linha colapsados."""
+    return _RE_ESPACOS.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class CachedEmbedder:
+    """
+    Cache persistente de embeddings no Postgres, por (hash do texto normalizado, modelo).
+
+    Como a maioria dos contratos sai dos mesmos modelos, as cláusulas repetidas deixam
+    de ir para o Gemini. Acertos, falhas e o tempo gasto no Gemini vão para os contadores
+    do Prometheus (app/observability.py), que stats resume com a economia estimada.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def _buscar(self, hashes: List[str]) -> Dict[str, List[float]]:
+        with engine.connect() as conn:
+            linhas = conn.execute(
+                select(EmbeddingCache.text_hash, EmbeddingCache.embedding)
+                .where(EmbeddingCache.model == self.model_name, EmbeddingCache.text_hash.in_(hashes))
+            ).all()
+        return {hash_: list(map(float, embedding)) for hash_, embedding in linhas}
+
+    def _gravar(self, novos: Dict[str, List[float]]):
+        with engine.begin() as conn:
+            conn.execute(
+                insert(EmbeddingCache)
+                .values([
+                    {"text_hash": hash_, "model": self.model_name, "embedding": embedding}
+                    for hash_, embedding in novos.items()
+                ])
+                .on_conflict_do_nothing()
+            )
+
+    def embed_documents(self, texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Devolve os embeddings de `texts` na mesma ordem, chamando embed_fn apenas para
+        os textos que ainda não estão no cache (e uma vez só para textos repetidos no lote).
+        """
+        hashes = [text_hash(texto) for texto in texts]
+        encontrados = self._buscar(list(set(hashes)))
+
+        # Textos ausentes, sem repetição
+        faltantes: Dict[str, str] = {}
+        for hash_, texto in zip(hashes, texts):
+            if hash_ not in encontrados and hash_ not in faltantes:
+                faltantes[hash_] = texto
+
+        tempo = 0.0
+        if faltantes:
+            inicio = time.perf_counter()
+            vetores = embed_fn(list(faltantes.values()))
+            tempo = time.perf_counter() - inicio
+            novos = dict(zip(faltantes.keys(), vetores))
+            self._gravar(novos)
+            encontrados.update(novos)
+
+        EMBEDDING_CACHE_TEXTOS.labels(self.model_name, "miss").inc(len(faltantes))
+        EMBEDDING_CACHE_TEXTOS.labels(self.model_name, "hit").inc(len(texts) - len(faltantes))
+        EMBEDDING_CACHE_GEMINI_SEGUNDOS.labels(self.model_name).inc(tempo)
+
+        return [encontrados[hash_] for hash_ in hashes]
+
+    def stats(self) -> dict:
+        """
+        Acertos e falhas desde a inicialização: deste processo ou, com PROMETHEUS_MULTIPROC_DIR,
+        de todos os que o compartilham (API e fila de ingestão). `entries` vem da tabela.
+        """
+        hits = int(somar_contador("auditia_embedding_cache_textos_total", modelo=self.model_name, resultado="hit"))
+        misses = int(somar_contador("auditia_embedding_cache_textos_total", modelo=self.model_name, resultado="miss"))
+        tempo = somar_contador("auditia_embedding_cache_gemini_segundos_total", modelo=self.model_name)
+        with engine.connect() as conn:
+            entradas = conn.execute(
+                select(func.count()).select_from(EmbeddingCache).where(EmbeddingCache.model == self.model_name)
+            ).scalar_one()
+        total = hits + misses
+        tempo_medio = tempo / misses if misses else 0.0
+        return {
+            "model": self.model_name,
+            "entries": entradas,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "gemini_seconds": round(tempo, 3),
+            # Estimativa: cada hit economizou o tempo médio de um texto embedado pelo Gemini
+            "estimated_seconds_saved": round(hits * tempo_medio, 3),
+        }
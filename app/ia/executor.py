@@ -0,0 +1,35 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from config import ANALISE_MAX_WORKERS
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Retorna o pool de processos compartilhado para o trabalho pesado de CPU
+    (análise por regras), criado no primeiro uso com ANALISE_MAX_WORKERS processos.
+    """
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                # "spawn" evita herdar threads e canais gRPC do processo do servidor
+                _pool = ProcessPoolExecutor(
+                    max_workers=ANALISE_MAX_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def shutdown_process_pool():
+    """Encerra o pool de processos (chamado no desligamento da aplicação)."""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
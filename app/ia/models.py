@@ -1,17 +1,20 @@
 from dotenv import load_dotenv
 from config import GEMINI_API_KEY
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from app.observability import metricas_llm
 
 llm_gemini_flash = ChatGoogleGenerativeAI(
     model="gemini-2.0-flash",
     api_key=GEMINI_API_KEY,
     temperature=0.6,
+    callbacks=[metricas_llm],
 )
 
 llm_gemini_pro = ChatGoogleGenerativeAI(
     model="gemini-2.5-pro",
     api_key=GEMINI_API_KEY,
     temperature=1,
+    callbacks=[metricas_llm],
 )
 
 google_embedding = GoogleGenerativeAIEmbeddings(
@@ -0,0 +1,99 @@
+"""
+Extração de texto de PDFs em paralelo, por faixas de páginas.
+
+Fica separado de app/ia/utils.py porque as funções daqui rodam nos processos do pool
+(app/ia/executor.py), que não devem abrir conexões com banco/S3 ao importar o módulo.
+"""
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+from config import PDF_PAGINAS_POR_TAREFA, ANALISE_MAX_WORKERS
+
+
+def clean_text_data(text):
+    if text is not None:
+        return text.replace('\x00', '').encode('utf-8').decode('utf-8')
+    return text
+
+
+def count_pdf_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def extract_page_range(file_path: str, inicio: int, fim: int) -> List[str]:
+    """Extrai o texto das páginas [inicio, fim) (base 0). Executada nos processos do pool."""
+    reader = PdfReader(file_path)
+    return [clean_text_data(reader.pages[indice].extract_text()) or "" for indice in range(inicio, fim)]
+
+
+def _extrair_faixa_medida(file_path: str, inicio: int, fim: int) -> Tuple[List[str], float]:
+    """extract_page_range com o tempo gasto no processo do pool (a espera na fila não conta)."""
+    comeco = time.perf_counter()
+    textos = extract_page_range(file_path, inicio, fim)
+    return textos, time.perf_counter() - comeco
+
+
+def iter_pdf_pages_parallel(
+    file_path: str,
+    executor: Optional[Executor] = None,
+    pages_per_task: int = PDF_PAGINAS_POR_TAREFA,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Gera (número da página, texto) em ordem, assim que cada faixa de páginas fica pronta.
+
+    As faixas são extraídas em paralelo no pool de processos; no máximo `max_in_flight`
+    faixas ficam em andamento ou prontas sem terem sido consumidas, o que limita a memória.
+    PDFs com uma única faixa são lidos no próprio processo.
+
+    O tempo de extração de cada faixa vai para a etapa "pdf_parse" das métricas.
+    """
+    # Importado aqui: os processos do pool importam este módulo e não precisam das métricas
+    from app.observability import observar_etapa
+
+    total = count_pdf_pages(file_path)
+    faixas = [(inicio, min(inicio + pages_per_task, total)) for inicio in range(0, total, pages_per_task)]
+
+    if len(faixas) <= 1:
+        for inicio, fim in faixas:
+            textos, segundos = _extrair_faixa_medida(file_path, inicio, fim)
+            observar_etapa("pdf_parse", segundos)
+            for deslocamento, texto in enumerate(textos):
+                yield inicio + deslocamento + 1, texto
+        return
+
+    if executor is None:
+        from app.ia.executor import get_process_pool
+        executor = get_process_pool()
+    max_in_flight = max_in_flight or ANALISE_MAX_WORKERS * 2
+
+    pendentes = deque()
+    proximas = iter(faixas)
+    try:
+        for inicio, fim in proximas:
+            pendentes.append((inicio, executor.submit(_extrair_faixa_medida, file_path, inicio, fim)))
+            if len(pendentes) >= max_in_flight:
+                break
+
+        while pendentes:
+            inicio, futuro = pendentes.popleft()
+            textos, segundos = futuro.result()
+            observar_etapa("pdf_parse", segundos)
+            # Repõe a janela antes de entregar as páginas, para o pool não ficar ocioso
+            for proximo_inicio, proximo_fim in proximas:
+                pendentes.append((proximo_inicio, executor.submit(_extrair_faixa_medida, file_path, proximo_inicio, proximo_fim)))
+                break
+            for deslocamento, texto in enumerate(textos):
+                yield inicio + deslocamento + 1, texto
+    finally:
+        for _, futuro in pendentes:
+            futuro.cancel()
+
+
+def extract_pdf_pages_parallel(file_path: str, executor: Optional[Executor] = None) -> List[Tuple[int, str]]:
+    """Versão não-streaming: lista com (número da página, texto) de todas as páginas, em ordem."""
+    return list(iter_pdf_pages_parallel(file_path, executor=executor, max_in_flight=10**9))
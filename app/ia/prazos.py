@@ -0,0 +1,135 @@
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import FERIADOS_ARQUIVO
+
+# Padrão 1: "em até XX dias/meses (úteis/corridos)"
+RE_PRAZO_RELATIVO = re.compile(r'em até (\d+)\s*(?:\(.*\))?\s*(dias|meses)\s*(úteis|corridos)?')
+
+# Padrão 2: "até o dia DD de MM de YYYY"
+RE_DATA_EXTENSO = re.compile(r'até (?:o dia )?(\d{1,2}) de (\w+) de (\d{4})')
+
+MESES = {
+    'janeiro': 1, 'fevereiro': 2, 'março': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12
+}
+
+# Segunda a sexta
+_SEMANA_UTIL = "1111100"
+
+
+class CalendarioFeriados:
+    """
+    Calendário de dias úteis (Seg-Sex, exceto feriados) com aritmética vetorizada
+    via numpy.busday_offset: somar N dias úteis custa o mesmo para N=5 ou N=900.
+    """
+
+    def __init__(self, feriados: Iterable[date] = ()):
+        self.feriados = np.array(sorted(set(feriados)), dtype="datetime64[D]")
+        self._calendario = np.busdaycalendar(weekmask=_SEMANA_UTIL, holidays=self.feriados)
+
+    @classmethod
+    def carregar(cls, caminho: str) -> "CalendarioFeriados":
+        """Lê um arquivo com uma data por linha (AAAA-MM-DD;Descrição). Linhas com '#' são comentários."""
+        feriados = []
+        with open(caminho, encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                linha = linha.strip()
+                if not linha or linha.startswith("#"):
+                    continue
+                feriados.append(date.fromisoformat(linha.split(";", 1)[0].strip()))
+        return cls(feriados)
+
+    def eh_dia_util(self, dia: date) -> bool:
+        return bool(np.is_busday(np.datetime64(dia, "D"), busdaycal=self._calendario))
+
+    def somar_dias_uteis(self, inicio: date, dias: Sequence[int]) -> List[date]:
+        """
+        Soma cada quantidade de `dias` úteis à data de início, em uma única chamada vetorizada.
+        Segue a regra do cálculo anterior: os dias úteis são contados a partir do dia
+        seguinte ao início, mesmo que o início caia em fim de semana ou feriado.
+        """
+        if len(dias) == 0:
+            return []
+        quantidades = np.asarray(dias, dtype=np.int64)
+        # roll='backward' leva um início não útil para o último dia útil anterior,
+        # de modo que "+1" cai no primeiro dia útil seguinte.
+        resultado = np.busday_offset(
+            np.datetime64(inicio, "D"), quantidades, roll="backward", busdaycal=self._calendario
+        )
+        resultado = np.where(quantidades == 0, np.datetime64(inicio, "D"), resultado)
+        return [dia.item() for dia in resultado]
+
+
+@lru_cache(maxsize=None)
+def carregar_calendario_padrao() -> CalendarioFeriados:
+    """Calendário de feriados configurado em FERIADOS_ARQUIVO, carregado uma vez por processo."""
+    return CalendarioFeriados.carregar(FERIADOS_ARQUIVO)
+
+
+class ExtratorPrazos:
+    """Extrai prazos de sentenças de contrato e resolve as datas limite."""
+
+    def __init__(self, calendario: Optional[CalendarioFeriados] = None):
+        self.calendario = calendario or carregar_calendario_padrao()
+
+    def extrair(self, texto: str, data_referencia: Optional[datetime] = None) -> Optional[Tuple[datetime, str]]:
+        """Extrai a primeira data ou prazo encontrado em uma sentença."""
+        return self.extrair_lote([texto], data_referencia)[0]
+
+    def extrair_lote(
+        self, textos: Sequence[str], data_referencia: Optional[datetime] = None
+    ) -> List[Optional[Tuple[datetime, str]]]:
+        """
+        Resolve os prazos de todas as sentenças de um contrato de uma vez.
+        Os prazos em dias úteis são acumulados e calculados em uma única chamada ao calendário.
+        """
+        data_referencia = data_referencia or datetime.now()
+        resultados: List[Optional[Tuple[datetime, str]]] = [None] * len(textos)
+        pendentes_uteis: List[Tuple[int, int]] = []
+
+        for indice, texto in enumerate(textos):
+            texto_lower = texto.lower()
+
+            match = RE_PRAZO_RELATIVO.search(texto_lower)
+            if match:
+                quantidade = int(match.group(1))
+                unidade = match.group(2)
+                tipo_dias = match.group(3) if match.group(3) else "corridos"
+
+                if unidade == "meses":
+                    resultados[indice] = (data_referencia + timedelta(days=quantidade * 30), f"Prazo de {quantidade} meses")
+                elif tipo_dias == "úteis":
+                    pendentes_uteis.append((indice, quantidade))
+                else:
+                    resultados[indice] = (data_referencia + timedelta(days=quantidade), f"Prazo de {quantidade} dias corridos")
+                continue
+
+            match_data = RE_DATA_EXTENSO.search(texto_lower)
+            if match_data:
+                dia, mes_str, ano = match_data.groups()
+                mes = MESES.get(mes_str)
+                if mes:
+                    try:
+                        data_limite = datetime(int(ano), mes, int(dia))
+                    except ValueError:
+                        # Datas inexistentes (ex: 31 de fevereiro) são ignoradas
+                        continue
+                    resultados[indice] = (data_limite, f"Data limite em {dia}/{mes}/{ano}")
+
+        if pendentes_uteis:
+            datas = self.calendario.somar_dias_uteis(
+                data_referencia.date(), [quantidade for _, quantidade in pendentes_uteis]
+            )
+            for (indice, quantidade), data_limite in zip(pendentes_uteis, datas):
+                # Mantém o horário da referência, como no cálculo dia a dia anterior
+                resultados[indice] = (
+                    datetime.combine(data_limite, data_referencia.time()),
+                    f"Prazo de {quantidade} dias úteis",
+                )
+
+        return resultados
@@ -0,0 +1,35 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Limitador de taxa (token bucket) compartilhado entre threads.
+
+    Enche `rate_per_second` fichas por segundo até `capacity`; acquire(n) bloqueia até
+    haver n fichas. Usado para manter as chamadas ao Gemini dentro da cota por minuto.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        agora = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (agora - self._updated_at) * self.rate_per_second)
+        self._updated_at = agora
+
+    def acquire(self, amount: float = 1):
+        # Pedidos maiores que a capacidade esperam o balde encher por completo
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                espera = (amount - self._tokens) / self.rate_per_second
+            time.sleep(espera)
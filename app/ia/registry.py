@@ -0,0 +1,32 @@
+"""
+Registro dos clientes de LLM, retrievers e cadeias do LangChain.
+
+Cada componente é construído na primeira chamada e reaproveitado pelo processo todo
+(o cliente do Gemini mantém o canal gRPC aberto entre requisições). As cadeias não
+guardam estado por requisição: só as entradas do invoke/astream variam.
+"""
+from functools import lru_cache
+from typing import Callable, Dict, List
+
+_componentes: List[Callable] = []
+
+
+def componente(construtor: Callable) -> Callable:
+    """Decorator: memoriza o resultado do construtor (por argumentos) e o registra."""
+    memorizado = lru_cache(maxsize=None)(construtor)
+    _componentes.append(memorizado)
+    return memorizado
+
+
+def limpar_componentes():
+    """Descarta os componentes construídos (ex: depois de trocar a configuração ou em testes)."""
+    for memorizado in _componentes:
+        memorizado.cache_clear()
+
+
+def componentes_carregados() -> Dict[str, int]:
+    """Quantas instâncias de cada componente já foram construídas neste processo."""
+    return {
+        f"{memorizado.__module__}.{memorizado.__qualname__}": memorizado.cache_info().currsize
+        for memorizado in _componentes
+    }
@@ -0,0 +1,237 @@
+"""
+Recuperação híbrida para o chat: busca lexical (full-text do Postgres, dicionário
+portuguese) e busca vetorial (pgvector) combinadas por Reciprocal Rank Fusion.
+
+Tudo roda numa única consulta SQL: cada busca traz seus BUSCA_CANDIDATOS melhores
+trechos, já restritos à coleção e, quando pedido, aos arquivos informados, e a fusão
+acontece no próprio banco. Os índices usados são criados por `python manage.py migrate`
+(ver create_document_indexes em app/ia/utils.py e app/ia/vector_index.py).
+
+Sem filtro de arquivos, a busca vetorial usa o índice HNSW parcial da coleção, com
+hnsw.ef_search ajustado por consulta (SET LOCAL). Com filtro, ela é exata: o índice por
+file_name já reduz a busca aos trechos dos arquivos pedidos, e o HNSW filtraria depois
+de escolher os vizinhos, podendo devolver menos trechos que o pedido.
+
+Chunks substituídos por uma nova versão do documento (metadado superseded_in) ficam de
+fora das duas buscas. No HNSW eles também são descartados depois da busca no índice, mas
+são poucos (uma emenda costuma mudar uma ou duas páginas) e BUSCA_CANDIDATOS cobre a folga.
+"""
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cachetools import TTLCache
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from sqlalchemy import text
+
+from config import (
+    BUSCA_CANDIDATOS, BUSCA_LEXICAL_MAX_RANQUEADOS, BUSCA_RRF_K, CHAT_EMBEDDING_CACHE_MAX,
+    CHAT_EMBEDDING_CACHE_TTL_SEGUNDOS,
+)
+from database import async_engine, engine
+from app.observability import medir_etapa
+from .embedding_cache import normalize_text
+from .models import google_embedding
+from .utils import COLLECTION_NAME, FILTRO_CHUNKS_VIGENTES
+from .vector_index import (
+    aid_colecao, ef_search_para, expressao_embedding, id_colecao, literal_colecao, sql_ef_search, tipo_vetor
+)
+
+# Embeddings das perguntas (primeiro nível do cache do chat; o segundo, de respostas, fica
+# em app/ia/chat_cache.py): LRU com TTL por processo, pela pergunta normalizada
+_embeddings_consulta = TTLCache(maxsize=CHAT_EMBEDDING_CACHE_MAX, ttl=CHAT_EMBEDDING_CACHE_TTL_SEGUNDOS)
+_embeddings_consulta_lock = threading.Lock()
+
+
+def _chave_consulta(query: str) -> str:
+    return normalize_text(query).casefold()
+
+
+def _embedding_em_cache(query: str) -> Optional[List[float]]:
+    with _embeddings_consulta_lock:
+        return _embeddings_consulta.get(_chave_consulta(query))
+
+
+def _guardar_embedding(query: str, embedding: List[float]):
+    with _embeddings_consulta_lock:
+        _embeddings_consulta[_chave_consulta(query)] = embedding
+
+
+def embed_consulta(query: str) -> List[float]:
+    """Embedding da pergunta, do cache em memória quando possível."""
+    embedding = _embedding_em_cache(query)
+    if embedding is None:
+        with medir_etapa("embedding_consulta"):
+            embedding = google_embedding.embed_query(query)
+        _guardar_embedding(query, embedding)
+    return embedding
+
+
+async def aembed_consulta(query: str) -> List[float]:
+    """Versão assíncrona de embed_consulta."""
+    embedding = _embedding_em_cache(query)
+    if embedding is None:
+        with medir_etapa("embedding_consulta"):
+            embedding = await google_embedding.aembed_query(query)
+        _guardar_embedding(query, embedding)
+    return embedding
+
+
+# Coluna gerada com o tsvector de cada trecho (create_document_indexes em app/ia/utils.py)
+COLUNA_TSVECTOR = "e.document_tsv"
+
+_FILTRO_ARQUIVOS = "AND e.cmetadata->>'file_name' = ANY(:file_names)"
+
+# Busca lexical: primeiro os trechos com todos os termos da pergunta (plainto_tsquery, E),
+# depois os que têm só alguns (os termos com OU: numa pergunta em linguagem natural nem
+# todas as palavras aparecem no mesmo trecho). Palavras comuns ("contrato", "prazo")
+# casam com quase toda a coleção, então cada grupo é limitado a :max_ranqueados trechos
+# antes do ts_rank_cd: o custo por consulta não cresce com o corpus.
+_SQL_BUSCA_HIBRIDA = """
+    WITH consulta AS MATERIALIZED (
+        SELECT plainto_tsquery('portuguese', :query) AS todos,
+               replace(plainto_tsquery('portuguese', :query)::text, ' & ', ' | ')::tsquery AS algum
+    ),
+    vetorial AS (
+        SELECT id, row_number() OVER (ORDER BY distancia) AS posicao
+        FROM (
+            SELECT e.id, {distancia} AS distancia
+            FROM langchain_pg_embedding e
+            WHERE e.collection_id = {colecao}
+              AND {vigentes}
+              {filtro}
+            ORDER BY distancia
+            LIMIT :candidatos
+        ) melhores
+    ),
+    encontrados AS (
+        (
+            SELECT e.id, {tsvector} AS tsv, true AS todos_termos
+            FROM langchain_pg_embedding e, consulta
+            WHERE e.collection_id = {colecao}
+              AND {tsvector} @@ consulta.todos
+              AND {vigentes}
+              {filtro}
+            LIMIT :max_ranqueados
+        )
+        UNION ALL
+        (
+            SELECT e.id, {tsvector} AS tsv, false AS todos_termos
+            FROM langchain_pg_embedding e, consulta
+            WHERE e.collection_id = {colecao}
+              AND {tsvector} @@ consulta.algum
+              AND NOT {tsvector} @@ consulta.todos
+              AND {vigentes}
+              {filtro}
+            LIMIT :max_ranqueados
+        )
+    ),
+    lexical AS (
+        SELECT id, row_number() OVER (ORDER BY todos_termos DESC, relevancia DESC) AS posicao
+        FROM (
+            SELECT encontrados.id, encontrados.todos_termos, ts_rank_cd(encontrados.tsv, consulta.algum) AS relevancia
+            FROM encontrados, consulta
+            ORDER BY todos_termos DESC, relevancia DESC
+            LIMIT :candidatos
+        ) melhores
+    ),
+    fusao AS (
+        SELECT id, sum(1.0 / (:rrf_k + posicao)) AS pontuacao
+        FROM (SELECT id, posicao FROM vetorial UNION ALL SELECT id, posicao FROM lexical) posicoes
+        GROUP BY id
+        ORDER BY pontuacao DESC
+        LIMIT :k
+    )
+    SELECT e.id, e.document, e.cmetadata, fusao.pontuacao
+    FROM fusao
+    JOIN langchain_pg_embedding e ON e.id = fusao.id
+    ORDER BY fusao.pontuacao DESC
+"""
+
+
+# Uma consulta compilada por (coleção, com/sem filtro): o id da coleção entra como literal
+# para casar com o predicado do índice HNSW parcial
+_consultas: Dict[Tuple[str, bool], object] = {}
+
+
+def _consulta_sql(colecao: str, filtrar_arquivos: bool):
+    chave = (colecao, filtrar_arquivos)
+    if chave not in _consultas:
+        if filtrar_arquivos:
+            distancia = "e.embedding <=> CAST(:embedding AS vector)"
+        else:
+            distancia = f"{expressao_embedding('e.embedding')} <=> CAST(:embedding AS {tipo_vetor()})"
+        _consultas[chave] = text(_SQL_BUSCA_HIBRIDA.format(
+            colecao=literal_colecao(colecao),
+            distancia=distancia,
+            filtro=_FILTRO_ARQUIVOS if filtrar_arquivos else "",
+            tsvector=COLUNA_TSVECTOR,
+            vigentes=FILTRO_CHUNKS_VIGENTES,
+        ))
+    return _consultas[chave]
+
+
+def _vetor_sql(embedding: Sequence[float]) -> str:
+    """Literal do pgvector ('[x, y, ...]'), convertido com CAST na consulta."""
+    return "[" + ",".join(repr(float(valor)) for valor in embedding) + "]"
+
+
+def _parametros(query: str, embedding: Sequence[float], k: int, file_names: Optional[List[str]]) -> Dict[str, object]:
+    parametros: Dict[str, object] = {
+        "query": query,
+        "embedding": _vetor_sql(embedding),
+        "candidatos": max(BUSCA_CANDIDATOS, k),
+        "rrf_k": BUSCA_RRF_K,
+        "max_ranqueados": max(BUSCA_LEXICAL_MAX_RANQUEADOS, BUSCA_CANDIDATOS, k),
+        "k": k,
+    }
+    if file_names:
+        parametros["file_names"] = list(file_names)
+    return parametros
+
+
+def _documentos(linhas) -> List[Document]:
+    documentos = []
+    for id_, conteudo, metadados, pontuacao in linhas:
+        metadados = dict(metadados or {})
+        metadados["rrf_score"] = float(pontuacao)
+        documentos.append(Document(id=str(id_), page_content=conteudo or "", metadata=metadados))
+    return documentos
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever do chat: lexical + vetorial com fusão por RRF. `file_names` restringe a
+    busca a um conjunto de documentos (None = coleção inteira).
+    """
+
+    k: int = 10
+    file_names: Optional[List[str]] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        parametros = _parametros(query, embed_consulta(query), self.k, self.file_names)
+        with medir_etapa("recuperacao"), engine.begin() as conn:
+            colecao = id_colecao(conn, COLLECTION_NAME)
+            if colecao is None:
+                return []
+            if not self.file_names:
+                conn.execute(sql_ef_search(ef_search_para(parametros["candidatos"])))
+            return _documentos(conn.execute(_consulta_sql(colecao, bool(self.file_names)), parametros).all())
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        embedding = await aembed_consulta(query)
+        parametros = _parametros(query, embedding, self.k, self.file_names)
+        with medir_etapa("recuperacao"):
+            return await self._abuscar(parametros)
+
+    async def _abuscar(self, parametros: Dict[str, object]) -> List[Document]:
+        async with async_engine.begin() as conn:
+            colecao = await aid_colecao(conn, COLLECTION_NAME)
+            if colecao is None:
+                return []
+            if not self.file_names:
+                await conn.execute(sql_ef_search(ef_search_para(parametros["candidatos"])))
+            return _documentos((await conn.execute(_consulta_sql(colecao, bool(self.file_names)), parametros)).all())
@@ -1,97 +1,523 @@
+import hashlib
+import json
+import logging
 import os
+import threading
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
 
-import boto3
-from botocore.exceptions import ClientError
-from config import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_S3_REGION, AWS_S3_BUCKET, DATABASE_URL
-from pypdf import PdfReader
+from cachetools import LRUCache
+from sqlalchemy import text
+from config import (
+    AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_S3_REGION, AWS_S3_BUCKET, DATABASE_URL, TEXTO_CACHE_MAX_CARACTERES,
+    UPLOAD_MAX_BYTES, UPLOAD_CHUNK_BYTES, S3_PART_BYTES,
+)
+from database import engine, async_engine
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from app.observability import medir_etapa
 from .models import google_embedding
+from .pdf import iter_pdf_pages_parallel
+from .registry import componente
 from langchain_postgres.vectorstores import PGVector
-from langchain_community.document_loaders import PyPDFLoader
+
+# Os clientes abaixo são criados no primeiro uso, não na importação: o processo sobe
+# sem tocar a rede, mesmo com o Postgres ou o S3 fora do ar. O schema (extensão
+# vector, tabelas, coleção e índices) é criado por `python manage.py migrate`.
+
+COLLECTION_NAME = "auditia_docs"
+
+logger = logging.getLogger(__name__)
+
+
+@componente
+def get_s3():
+    """Cliente do S3 (boto3 é importado só aqui, no primeiro uso)."""
+    import boto3
+
+    return boto3.client(
+        "s3",
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        region_name=AWS_S3_REGION
+    )
+
+
+@componente
+def get_pg_vector() -> PGVector:
+    """Coleção de documentos no PGVector (modo síncrono, usada pela ingestão)."""
+    return PGVector(
+        embeddings=google_embedding,
+        collection_name=COLLECTION_NAME,
+        connection=DATABASE_URL,
+        use_jsonb=True,
+        create_extension=False  # a extensão vector é criada pela migração
+    )
 
 
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_S3_REGION
+def create_document_indexes():
+    """
+    Cria o índice por (coleção, file_name) usado para remontar um documento direto do
+    Postgres e para filtrar a busca do chat por arquivo. O índice GIN padrão do PGVector
+    (jsonb_path_ops) não atende ao operador ->>.
+
+    Cria também a coluna gerada document_tsv (tsvector do trecho, dicionário portuguese) e
+    o índice GIN da busca lexical do chat (app/ia/retrieval.py): o ranking lê o tsvector
+    gravado em vez de recalculá-lo para cada trecho encontrado. Adicionar a coluna reescreve
+    a tabela uma vez, na primeira migração.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_file_name "
+            "ON langchain_pg_embedding (collection_id, (cmetadata->>'file_name'))"
+        ))
+        conn.execute(text(
+            "ALTER TABLE langchain_pg_embedding ADD COLUMN IF NOT EXISTS document_tsv tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('portuguese', coalesce(document, ''))) STORED"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_tsv "
+            "ON langchain_pg_embedding USING gin (document_tsv)"
+        ))
+        # Índice sobre a expressão, usado antes da coluna gerada
+        conn.execute(text("DROP INDEX IF EXISTS ix_langchain_pg_embedding_fts"))
+
+
+# Cache LRU dos textos completos reconstruídos, limitado pelo total de caracteres.
+# É por processo: cada worker do servidor mantém o seu. A chave inclui a versão e o
+# content_hash do documento, então uma reingestão feita em outro processo (o worker da
+# fila, outro worker do uvicorn) troca a chave sem depender de invalidate_text_cache; e
+# só entram textos de documentos COMPLETED (durante a ingestão o texto está incompleto).
+_texto_cache = LRUCache(maxsize=TEXTO_CACHE_MAX_CARACTERES, getsizeof=len)
+_texto_cache_lock = threading.Lock()
+
+_SQL_VERSAO_DOCUMENTO = text(
+    "SELECT version, content_hash, status FROM documents WHERE file_name = :file_name"
 )
 
-pg_vector = PGVector(
-    embeddings=google_embedding,
-    collection_name="auditia_docs",
-    connection=DATABASE_URL,
-    use_jsonb=True
+# Chunks de versões anteriores de um documento ficam na coleção com o metadado
+# superseded_in (versão que os substituiu), e os de uma nova versão ainda em ingestão
+# entram com pending_version; toda leitura usa só os vigentes.
+FILTRO_CHUNKS_VIGENTES = (
+    "(e.cmetadata->>'superseded_in' IS NULL AND e.cmetadata->>'pending_version' IS NULL)"
 )
 
-pg_vector.create_tables_if_not_exists()
+_SQL_CHUNKS_DO_ARQUIVO = text(f"""
+    SELECT e.document,
+           (e.cmetadata->>'page_number')::int AS page_number,
+           (e.cmetadata->>'start_index')::int AS start_index,
+           e.cmetadata->>'separator' AS separator
+    FROM langchain_pg_embedding e
+    JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+    WHERE c.name = :collection_name
+      AND e.cmetadata->>'file_name' = :file_name
+      AND {FILTRO_CHUNKS_VIGENTES}
+    ORDER BY (e.cmetadata->>'page_number')::int,
+             COALESCE((e.cmetadata->>'chunk_index')::int, 0)
+""")
 
 
-def check_s3(s3):
+def check_s3(s3=None) -> bool:
+    from botocore.exceptions import BotoCoreError, ClientError
+
     try:
-        s3.head_bucket(Bucket=AWS_S3_BUCKET)
-        print("S3 está online e funcional")
-    except ClientError as e:
-        print("Erro ao conectar ao S3:", e)
+        (s3 or get_s3()).head_bucket(Bucket=AWS_S3_BUCKET)
+        logger.info("S3 está online e funcional")
+        return True
+    except (BotoCoreError, ClientError) as e:
+        logger.error("Erro ao conectar ao S3: %s", e)
+        return False
 
-def upload_file(file_path, key):
-    s3.upload_file(file_path, AWS_S3_BUCKET, key)
+def s3_url_for(key):
     return f"https://{AWS_S3_BUCKET}.s3.{AWS_S3_REGION}.amazonaws.com/{key}"
 
+def upload_file(file_path, key):
+    with medir_etapa("s3_upload"):
+        get_s3().upload_file(file_path, AWS_S3_BUCKET, key)
+    return s3_url_for(key)
+
+
+class UploadTooLargeError(ValueError):
+    """O arquivo enviado passou do limite configurado (UPLOAD_MAX_BYTES)."""
+
+
+class _S3MultipartWriter:
+    """
+    Envia um arquivo ao S3 em partes de S3_PART_BYTES à medida que os bytes chegam.
+    Arquivos menores que uma parte vão em um único put_object.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    def write(self, data):
+        self._buffer.extend(data)
+        while len(self._buffer) >= S3_PART_BYTES:
+            self._send_part(bytes(self._buffer[:S3_PART_BYTES]))
+            del self._buffer[:S3_PART_BYTES]
+
+    def _send_part(self, body):
+        if self._upload_id is None:
+            self._upload_id = get_s3().create_multipart_upload(Bucket=AWS_S3_BUCKET, Key=self.key)["UploadId"]
+        numero = len(self._parts) + 1
+        resposta = get_s3().upload_part(
+            Bucket=AWS_S3_BUCKET, Key=self.key, UploadId=self._upload_id, PartNumber=numero, Body=body
+        )
+        self._parts.append({"ETag": resposta["ETag"], "PartNumber": numero})
+
+    def complete(self):
+        if self._upload_id is None:
+            get_s3().put_object(Bucket=AWS_S3_BUCKET, Key=self.key, Body=bytes(self._buffer))
+        else:
+            if self._buffer:
+                self._send_part(bytes(self._buffer))
+            get_s3().complete_multipart_upload(
+                Bucket=AWS_S3_BUCKET, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        self._buffer = bytearray()
+
+    def abort(self):
+        # botocore é importado no primeiro uso, como o boto3 em get_s3
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        if self._upload_id is not None:
+            try:
+                get_s3().abort_multipart_upload(Bucket=AWS_S3_BUCKET, Key=self.key, UploadId=self._upload_id)
+            except (BotoCoreError, ClientError) as e:
+                logger.error("Erro ao abortar o upload multipart de '%s': %s", self.key, e)
+        self._buffer = bytearray()
+
+
+def stream_upload(fileobj, s3_key=None, local_path=None, max_bytes=UPLOAD_MAX_BYTES):
+    """
+    Lê o upload em blocos de UPLOAD_CHUNK_BYTES, sem carregar o arquivo inteiro em memória,
+    e repassa cada bloco para o hash SHA-256 e, se informados, para um arquivo local e
+    para um upload multipart no S3. O limite de tamanho é verificado durante a leitura.
+
+    Retorna {"sha256", "size", "s3_url"}. Em caso de erro nada fica no S3 nem em disco.
+    Com s3_key, o tempo total (leitura do upload + envio das partes) vai para a etapa
+    "s3_upload" das métricas.
+    """
+    with medir_etapa("s3_upload") if s3_key else nullcontext():
+        return _stream_upload(fileobj, s3_key, local_path, max_bytes)
+
+
+def _stream_upload(fileobj, s3_key, local_path, max_bytes):
+    sha256 = hashlib.sha256()
+    size = 0
+    s3_writer = _S3MultipartWriter(s3_key) if s3_key else None
+    local_file = open(local_path, "wb") if local_path else None
+    try:
+        while True:
+            bloco = fileobj.read(UPLOAD_CHUNK_BYTES)
+            if not bloco:
+                break
+            size += len(bloco)
+            if max_bytes is not None and size > max_bytes:
+                raise UploadTooLargeError(f"O arquivo excede o limite de {max_bytes // (1024 * 1024)} MB.")
+            sha256.update(bloco)
+            if local_file:
+                local_file.write(bloco)
+            if s3_writer:
+                s3_writer.write(bloco)
+
+        if s3_writer:
+            s3_writer.complete()
+    except BaseException:
+        if s3_writer:
+            s3_writer.abort()
+        if local_file:
+            local_file.close()
+            os.remove(local_path)
+            local_file = None
+        raise
+    finally:
+        if local_file:
+            local_file.close()
+
+    return {
+        "sha256": sha256.hexdigest(),
+        "size": size,
+        "s3_url": s3_url_for(s3_key) if s3_key else None,
+    }
+
+def download_file(key, file_path):
+    with medir_etapa("s3_download"):
+        get_s3().download_file(AWS_S3_BUCKET, key, file_path)
+    return file_path
+
+def iter_pdf_documents(file_path):
+    """
+    Gera uma página por vez (Document com page_number), em ordem, assim que a extração
+    paralela de cada faixa de páginas termina. Permite começar os embeddings antes de
+    o PDF inteiro ter sido lido.
+    """
+    for page_number, texto in iter_pdf_pages_parallel(file_path):
+        yield Document(
+            page_content=texto,
+            metadata={"source": file_path, "page": page_number - 1, "page_number": page_number}
+        )
+
 def read_pdf(file_path):
-    loader = PyPDFLoader(file_path)
-    pages = loader.load_and_split()
+    """Extrai todas as páginas do PDF em paralelo (uma Document por página, em ordem)."""
     # A remoção do arquivo foi movida para o bloco 'finally' nos routers para mais segurança
-    return pages
+    return list(iter_pdf_documents(file_path))
 
-def chunk_split(text, chunk_size=500, chunk_overlap=50):
+def iter_pdf_pages(file_path):
+    """
+    Gera o texto de cada página em ordem, sem montar o documento inteiro em uma lista
+    (usado na análise em streaming). A extração é paralela, com janela limitada.
+    """
+    for _, texto in iter_pdf_pages_parallel(file_path):
+        yield texto
 
+def chunk_split(text, chunk_size=500, chunk_overlap=50, with_offsets=False):
+    """
+    Divide o texto em chunks. Com with_offsets=True retorna [(start_index, chunk)],
+    o que permite remontar o texto original descontando a sobreposição.
+    """
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
+        chunk_overlap=chunk_overlap,
+        add_start_index=with_offsets
     )
 
+    if with_offsets:
+        return [(doc.metadata["start_index"], doc.page_content) for doc in splitter.create_documents([text])]
     return splitter.split_text(text)
 
-def query_chat_history():
-    return PGVector(
-        embeddings=google_embedding,
-        collection_name="chat_history",
-        connection=DATABASE_URL,
-        use_jsonb=True
-    )
+def iter_document_chunks(file_name: str, batch_size: int = 500):
+    """
+    Gera (page_number, start_index, conteúdo, separator) dos chunks de um documento direto
+    do Postgres, filtrando pelo metadado file_name, em ordem de página e de chunk.
+    As linhas são lidas em streaming (cursor no servidor), sem passar pela busca vetorial.
+    start_index é None para documentos ingeridos com uma página inteira por chunk.
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            _SQL_CHUNKS_DO_ARQUIVO,
+            {"collection_name": COLLECTION_NAME, "file_name": file_name},
+        )
+        for document, page_number, start_index, separator in result:
+            yield page_number, start_index, document or "", separator
 
-def clean_text_data(text):
-    if text is not None:
-        return text.replace('\x00', '').encode('utf-8').decode('utf-8')
-    return text
+def chunk_separators(conteudo: str, chunks: List[Tuple[int, str]]) -> List[Optional[str]]:
+    """
+    Para cada (start_index, chunk) de chunk_split, o trecho da página entre o fim do chunk
+    anterior e o início dele (antes do primeiro, o início da página): o espaço em branco que
+    o splitter descarta ("\n\n" entre parágrafos, por exemplo). None quando não há
+    intervalo (chunks sobrepostos) ou quando ele é um único espaço entre dois chunks, o que
+    _remontar_paginas assume na falta do metadado.
+    """
+    separadores = []
+    fim_anterior = 0
+    for start_index, chunk in chunks:
+        separador = conteudo[fim_anterior:start_index] if start_index > fim_anterior else ""
+        padrao = not separador or (separador == " " and separadores)
+        separadores.append(None if padrao else separador)
+        fim_anterior = max(fim_anterior, start_index + len(chunk))
+    return separadores
 
-# --- NOVA FUNÇÃO ADICIONADA ---
-def get_full_text_by_filename(file_name: str) -> str:
+def _remontar_paginas(chunks):
     """
-    Busca todos os chunks de um documento no banco de vetores pelo nome do arquivo,
-    ordena-os e remonta o texto completo.
+    Junta os chunks de cada página descontando a sobreposição entre chunks vizinhos
+    (pelo start_index gravado na ingestão) e gera o texto de cada página.
+
+    Os intervalos entre chunks voltam com o espaço em branco original (metadado
+    separator, ver chunk_separators), então as quebras de parágrafo usadas na divisão em
+    sentenças e cláusulas são preservadas; só o espaço no fim da página se perde. Chunks
+    gravados antes do metadado têm os intervalos trocados por um espaço.
     """
-    if not pg_vector:
-        raise ConnectionError("A conexão com o banco de vetores não está disponível.")
+    pagina_atual = None
+    partes = []
+    fim_anterior = 0
+    for page_number, start_index, document, separator in chunks:
+        if page_number != pagina_atual:
+            if partes:
+                yield "".join(partes)
+            pagina_atual, partes, fim_anterior = page_number, [], 0
+        if start_index is None:
+            partes.append(document if not partes else "\n" + document)
+            continue
+        if start_index > fim_anterior and (partes or separator):
+            partes.append(separator or " ")
+        partes.append(document[max(fim_anterior - start_index, 0):] if partes else document)
+        fim_anterior = max(fim_anterior, start_index + len(document))
+    if partes:
+        yield "".join(partes)
 
-    retriever = pg_vector.as_retriever(
-        search_kwargs={
-            'filter': {'file_name': file_name},
-            'k': 1000  # Pega um número grande de chunks para garantir que todos venham
-        }
-    )
+def delete_document_chunks(file_name: str):
+    """Apaga todos os chunks de um documento na coleção (usado antes de reprocessar uma ingestão)."""
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                DELETE FROM langchain_pg_embedding e
+                USING langchain_pg_collection c
+                WHERE c.uuid = e.collection_id
+                  AND c.name = :collection_name
+                  AND e.cmetadata->>'file_name' = :file_name
+            """),
+            {"collection_name": COLLECTION_NAME, "file_name": file_name},
+        )
+    invalidate_text_cache(file_name)
 
-    docs_encontrados = retriever.invoke(" ")
+def chunk_hash(chunk: str) -> str:
+    """Hash do conteúdo exato do chunk (metadado chunk_hash), usado para comparar versões."""
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
 
-    documentos_do_arquivo = [doc for doc in docs_encontrados if doc.metadata.get("file_name") == file_name]
+def list_current_chunks(file_name: str, pending_version: Optional[int] = None) -> List[Tuple[str, str, dict]]:
+    """
+    (id, conteúdo, metadados) dos chunks vigentes de um documento na coleção e, com
+    pending_version, também dos já inseridos para essa versão (tentativa anterior).
+    """
+    with engine.connect() as conn:
+        linhas = conn.execute(
+            text(f"""
+                SELECT e.id, e.document, e.cmetadata
+                FROM langchain_pg_embedding e
+                JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+                WHERE c.name = :collection_name
+                  AND e.cmetadata->>'file_name' = :file_name
+                  AND ({FILTRO_CHUNKS_VIGENTES}
+                       OR (e.cmetadata->>'superseded_in' IS NULL
+                           AND e.cmetadata->>'pending_version' = CAST(:pending_version AS text)))
+            """),
+            {"collection_name": COLLECTION_NAME, "file_name": file_name, "pending_version": pending_version},
+        ).all()
+    return [(id_, document or "", dict(cmetadata or {})) for id_, document, cmetadata in linhas]
+
+def publish_chunk_version(file_name: str, version: int, removed_ids: List[str], new_metadata: Dict[str, dict]):
+    """
+    Troca a versão do documento nas buscas numa única transação: regrava os metadados dos
+    chunks mantidos que mudaram de posição, marca os removidos com superseded_in = version
+    (ficam na coleção, fora das buscas) e tira o pending_version dos inseridos para ela.
+    """
+    with engine.begin() as conn:
+        if new_metadata:
+            conn.execute(
+                text("UPDATE langchain_pg_embedding SET cmetadata = CAST(:cmetadata AS jsonb) WHERE id = :id"),
+                [{"id": id_, "cmetadata": json.dumps(metadata)} for id_, metadata in new_metadata.items()],
+            )
+        if removed_ids:
+            conn.execute(
+                text("""
+                    UPDATE langchain_pg_embedding
+                    SET cmetadata = cmetadata || jsonb_build_object('superseded_in', CAST(:version AS int))
+                    WHERE id = ANY(:ids)
+                """),
+                {"version": version, "ids": list(removed_ids)},
+            )
+        conn.execute(
+            text("""
+                UPDATE langchain_pg_embedding e
+                SET cmetadata = e.cmetadata - 'pending_version'
+                FROM langchain_pg_collection c
+                WHERE c.uuid = e.collection_id
+                  AND c.name = :collection_name
+                  AND e.cmetadata->>'file_name' = :file_name
+                  AND e.cmetadata->>'pending_version' = CAST(:version AS text)
+            """),
+            {"collection_name": COLLECTION_NAME, "file_name": file_name, "version": version},
+        )
+
+
+def delete_pending_chunks(file_name: str):
+    """Apaga os chunks de uma nova versão que não chegou a ser publicada (ingestão falhou de vez)."""
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                DELETE FROM langchain_pg_embedding e
+                USING langchain_pg_collection c
+                WHERE c.uuid = e.collection_id
+                  AND c.name = :collection_name
+                  AND e.cmetadata->>'file_name' = :file_name
+                  AND e.cmetadata->>'pending_version' IS NOT NULL
+            """),
+            {"collection_name": COLLECTION_NAME, "file_name": file_name},
+        )
+
+def invalidate_text_cache(file_name: str):
+    """Remove o texto de um documento do cache (chamar sempre que o documento for (re)ingerido)."""
+    with _texto_cache_lock:
+        for chave in [chave for chave in _texto_cache if chave[0] == file_name]:
+            _texto_cache.pop(chave, None)
+
+async def aiter_document_chunks(file_name: str):
+    """Versão assíncrona de iter_document_chunks (asyncpg, cursor no servidor)."""
+    async with async_engine.connect() as conn:
+        result = await conn.stream(
+            _SQL_CHUNKS_DO_ARQUIVO,
+            {"collection_name": COLLECTION_NAME, "file_name": file_name},
+        )
+        async for document, page_number, start_index, separator in result:
+            yield page_number, start_index, document or "", separator
+
+def _chave_texto(file_name: str, linha) -> Optional[tuple]:
+    """
+    Chave do cache de texto: (file_name, version, content_hash), ou None se o documento não
+    puder ser cacheado (ainda em ingestão). Documentos sem linha em documents (ingeridos
+    antes da tabela) usam só o nome.
+    """
+    if linha is None:
+        return file_name, None, None
+    version, content_hash, status = linha
+    if status != "COMPLETED":
+        return None
+    return file_name, version, content_hash
 
-    if not documentos_do_arquivo:
+def _cache_get(chave: Optional[tuple]):
+    if chave is None:
+        return None
+    with _texto_cache_lock:
+        return _texto_cache.get(chave)
+
+def _cache_put(chave: Optional[tuple], texto_completo: str):
+    if chave is not None and len(texto_completo) <= _texto_cache.maxsize:
+        with _texto_cache_lock:
+            _texto_cache[chave] = texto_completo
+
+def get_full_text_by_filename(file_name: str) -> str:
+    """
+    Busca todos os chunks de um documento no Postgres pelo nome do arquivo,
+    em ordem de página, e remonta o texto completo.
+    """
+    with engine.connect() as conn:
+        linha = conn.execute(_SQL_VERSAO_DOCUMENTO, {"file_name": file_name}).one_or_none()
+    chave = _chave_texto(file_name, linha)
+    texto_completo = _cache_get(chave)
+    if texto_completo is not None:
+        return texto_completo
+
+    paginas = list(_remontar_paginas(iter_document_chunks(file_name)))
+    if not paginas:
         return ""
 
-    documentos_ordenados = sorted(documentos_do_arquivo, key=lambda doc: doc.metadata.get('page_number', 0))
+    texto_completo = "\n".join(paginas)
+    _cache_put(chave, texto_completo)
+
+    logger.info("Texto completo para '%s' reconstruído com sucesso a partir de %d páginas.", file_name, len(paginas))
+    return texto_completo
+
+async def aget_full_text_by_filename(file_name: str) -> str:
+    """Versão assíncrona de get_full_text_by_filename (compartilha o mesmo cache)."""
+    async with async_engine.connect() as conn:
+        linha = (await conn.execute(_SQL_VERSAO_DOCUMENTO, {"file_name": file_name})).one_or_none()
+    chave = _chave_texto(file_name, linha)
+    texto_completo = _cache_get(chave)
+    if texto_completo is not None:
+        return texto_completo
+
+    chunks = [chunk async for chunk in aiter_document_chunks(file_name)]
+    paginas = list(_remontar_paginas(chunks))
+    if not paginas:
+        return ""
 
-    texto_completo = "\n".join([doc.page_content for doc in documentos_ordenados])
+    texto_completo = "\n".join(paginas)
+    _cache_put(chave, texto_completo)
 
-    print(f"Texto completo para '{file_name}' reconstruído com sucesso a partir de {len(documentos_ordenados)} chunks.")
-    return texto_completo
\ No newline at end of file
+    logger.info("Texto completo para '%s' reconstruído com sucesso a partir de %d páginas.", file_name, len(paginas))
+    return texto_completo
@@ -0,0 +1,242 @@
+"""
+Índices ANN (HNSW) das coleções do PGVector.
+
+A coluna embedding do langchain_pg_embedding não tem dimensão fixa, e o HNSW exige
+uma. Por isso o índice é sobre a expressão `embedding::vector(N)` (ou halfvec(N),
+obrigatório acima de 2000 dimensões) e parcial por coleção (WHERE collection_id =
+'<uuid>'). As consultas só usam o índice se repetirem a mesma expressão e o mesmo
+collection_id literal: ver expressao_embedding e a busca vetorial em app/ia/retrieval.py.
+
+O índice é criado por `python manage.py migrate` e mantido por `python manage.py indexes`;
+`python manage.py recall` compara a busca pelo índice com a busca exata no corpus.
+"""
+import asyncio
+import logging
+import random
+import statistics
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+
+from config import BUSCA_EF_SEARCH, EMBEDDING_DIMENSOES, HNSW_EF_CONSTRUCTION, HNSW_M
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+# Limite de dimensões do HNSW para vector; halfvec (pgvector >= 0.7) vai até 4000
+_MAX_DIMENSOES_VECTOR = 2000
+
+# id da coleção por nome (não muda depois de criada)
+_ids_colecao: Dict[str, str] = {}
+
+
+def tipo_vetor(dimensoes: int = EMBEDDING_DIMENSOES) -> str:
+    """Tipo usado no índice e nas consultas: vector(N) ou, acima de 2000 dimensões, halfvec(N)."""
+    tipo = "vector" if dimensoes <= _MAX_DIMENSOES_VECTOR else "halfvec"
+    return f"{tipo}({dimensoes})"
+
+
+def expressao_embedding(coluna: str = "embedding") -> str:
+    """Expressão indexada; a consulta precisa usar exatamente a mesma para o índice ser usado."""
+    return f"CAST({coluna} AS {tipo_vetor()})"
+
+
+def nome_indice(id_colecao: str) -> str:
+    return f"ix_langchain_pg_embedding_hnsw_{id_colecao.replace('-', '')[:12]}"
+
+
+def literal_colecao(id_colecao: str) -> str:
+    """uuid da coleção como literal SQL (validado), para casar com o predicado do índice parcial."""
+    return f"'{uuid.UUID(str(id_colecao))}'::uuid"
+
+
+_SQL_ID_COLECAO = text("SELECT uuid FROM langchain_pg_collection WHERE name = :nome")
+
+
+def id_colecao(conn, nome: str) -> Optional[str]:
+    if nome not in _ids_colecao:
+        valor = conn.execute(_SQL_ID_COLECAO, {"nome": nome}).scalar()
+        if valor is None:
+            return None
+        _ids_colecao[nome] = str(valor)
+    return _ids_colecao[nome]
+
+
+async def aid_colecao(conn, nome: str) -> Optional[str]:
+    if nome not in _ids_colecao:
+        valor = (await conn.execute(_SQL_ID_COLECAO, {"nome": nome})).scalar()
+        if valor is None:
+            return None
+        _ids_colecao[nome] = str(valor)
+    return _ids_colecao[nome]
+
+
+def sql_ef_search(ef_search: int):
+    """SET LOCAL hnsw.ef_search (vale só até o fim da transação corrente)."""
+    return text("SELECT set_config('hnsw.ef_search', :ef_search, true)").bindparams(ef_search=str(int(ef_search)))
+
+
+def ef_search_para(candidatos: int) -> int:
+    # O HNSW devolve no máximo ef_search linhas: abaixo do LIMIT, a busca voltaria incompleta
+    return max(BUSCA_EF_SEARCH, candidatos)
+
+
+def _versao_pgvector(conn) -> tuple:
+    versao = conn.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+    return tuple(int(parte) for parte in (versao or "0").split(".")[:2])
+
+
+def _indices_existentes(conn) -> set:
+    return set(conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = 'langchain_pg_embedding'"
+    )).scalars())
+
+
+def criar_indices_ann(recriar: bool = False) -> List[str]:
+    """
+    Cria (ou, com recriar=True, reconstrói) o índice HNSW de cada coleção. Retorna os
+    nomes dos índices criados. Com recriar=True os parâmetros atuais de HNSW_M e
+    HNSW_EF_CONSTRUCTION passam a valer para os índices existentes.
+    """
+    if tipo_vetor().startswith("halfvec"):
+        with engine.connect() as conn:
+            if _versao_pgvector(conn) < (0, 7):
+                raise RuntimeError(
+                    f"Embeddings de {EMBEDDING_DIMENSOES} dimensões precisam de halfvec no índice HNSW "
+                    "(pgvector >= 0.7). Atualize a extensão: ALTER EXTENSION vector UPDATE."
+                )
+
+    criados = []
+    with engine.connect() as conn:
+        colecoes = conn.execute(text("SELECT uuid, name FROM langchain_pg_collection")).all()
+        existentes = _indices_existentes(conn)
+
+    for id_, nome in colecoes:
+        indice = nome_indice(str(id_))
+        if indice in existentes and not recriar:
+            continue
+        # CREATE/DROP INDEX CONCURRENTLY não rodam dentro de transação
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if indice in existentes:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {indice}"))
+            inicio = time.perf_counter()
+            conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY {indice} ON langchain_pg_embedding "
+                f"USING hnsw (({expressao_embedding()}) {tipo_vetor().split('(')[0]}_cosine_ops) "
+                f"WITH (m = {int(HNSW_M)}, ef_construction = {int(HNSW_EF_CONSTRUCTION)}) "
+                f"WHERE collection_id = {literal_colecao(str(id_))}"
+            ))
+        logger.info("Índice HNSW '%s' da coleção '%s' criado em %.1fs.", indice, nome, time.perf_counter() - inicio)
+        criados.append(indice)
+
+    if criados:
+        # Estatísticas atualizadas: sem elas o planner pode preferir varrer a coleção inteira
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE langchain_pg_embedding"))
+    return criados
+
+
+def indices_ann_pendentes() -> List[str]:
+    """Coleções sem índice HNSW (ou com índice inválido, ex: CREATE CONCURRENTLY interrompido)."""
+    with engine.connect() as conn:
+        colecoes = conn.execute(text("SELECT uuid, name FROM langchain_pg_collection")).all()
+        validos = set(conn.execute(text("""
+            SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = 'langchain_pg_embedding'::regclass AND i.indisvalid
+        """)).scalars())
+    return [nome for id_, nome in colecoes if nome_indice(str(id_)) not in validos]
+
+
+async def averificar_indices_ann():
+    """Verificação feita na subida da API, em segundo plano: só avisa, não impede a subida."""
+    try:
+        pendentes = await asyncio.get_running_loop().run_in_executor(None, indices_ann_pendentes)
+        if pendentes:
+            logger.warning(
+                "Coleções sem índice HNSW (%s); a busca vetorial fará varredura sequencial. "
+                "Rode `python manage.py indexes`.", ", ".join(pendentes),
+            )
+    except Exception as e:
+        logger.warning("Não foi possível verificar os índices HNSW: %s", e)
+
+
+def relatorio_recall(
+    nome_colecao: str, amostras: int = 50, k: int = 10, valores_ef: Sequence[int] = (40, 80, 160), semente: int = 0
+) -> List[dict]:
+    """
+    Recall@k e latência da busca pelo índice HNSW em relação à busca exata, usando como
+    consultas embeddings de trechos sorteados da própria coleção. Uma linha por ef_search,
+    mais a linha da busca exata (ef_search=None).
+    """
+    with engine.connect() as conn:
+        colecao = id_colecao(conn, nome_colecao)
+        if colecao is None:
+            raise ValueError(f"Coleção '{nome_colecao}' não encontrada.")
+        ids = conn.execute(
+            text("SELECT id FROM langchain_pg_embedding WHERE collection_id = CAST(:colecao AS uuid)"),
+            {"colecao": colecao},
+        ).scalars().all()
+    consultas = random.Random(semente).sample(ids, min(amostras, len(ids)))
+
+    filtro = f"e.collection_id = {literal_colecao(colecao)}"
+    sql_consulta = text("SELECT embedding::text FROM langchain_pg_embedding WHERE id = :id")
+    # Mesma expressão do índice (pode usá-lo) e a coluna sem cast (nunca usa: busca exata).
+    # As duas devolvem a distância exata de cada trecho, para o recall tratar empates.
+    distancia = "e.embedding <=> CAST(:q AS vector)"
+    sql_ann = text(
+        f"SELECT {distancia} FROM langchain_pg_embedding e WHERE {filtro} "
+        f"ORDER BY {expressao_embedding('e.embedding')} <=> CAST(:q AS {tipo_vetor()}) LIMIT :k"
+    )
+    sql_exata = text(
+        f"SELECT {distancia} FROM langchain_pg_embedding e WHERE {filtro} "
+        f"ORDER BY {distancia} LIMIT :k"
+    )
+
+    def medir(conn, sql, vetor):
+        inicio = time.perf_counter()
+        resultado = conn.execute(sql, {"q": vetor, "k": k}).scalars().all()
+        return resultado, (time.perf_counter() - inicio) * 1000
+
+    exatos, latencias_exatas = {}, []
+    with engine.connect() as conn:
+        vetores = {id_: conn.execute(sql_consulta, {"id": id_}).scalar() for id_ in consultas}
+        for id_, vetor in vetores.items():
+            exatos[id_], ms = medir(conn, sql_exata, vetor)
+            latencias_exatas.append(ms)
+
+    linhas = [_linha_relatorio(None, 1.0, latencias_exatas)]
+    for ef in valores_ef:
+        recalls, latencias = [], []
+        with engine.connect() as conn:
+            for id_, vetor in vetores.items():
+                with conn.begin():
+                    conn.execute(sql_ef_search(ef))
+                    aproximados, ms = medir(conn, sql_ann, vetor)
+                recalls.append(_recall(aproximados, exatos[id_]))
+                latencias.append(ms)
+        linhas.append(_linha_relatorio(ef, statistics.mean(recalls), latencias))
+    return linhas
+
+
+def _recall(distancias_aproximadas: List[float], distancias_exatas: List[float]) -> float:
+    """
+    Fração dos k vizinhos exatos encontrada pelo índice. Compara distâncias, não ids:
+    com trechos empatados (ex: textos repetidos), qualquer um deles é uma resposta certa.
+    """
+    if not distancias_exatas:
+        return 1.0
+    limite = distancias_exatas[-1] + 1e-9
+    acertos = sum(1 for distancia in distancias_aproximadas if distancia <= limite)
+    return min(acertos, len(distancias_exatas)) / len(distancias_exatas)
+
+
+def _linha_relatorio(ef_search: Optional[int], recall: float, latencias: List[float]) -> dict:
+    latencias = sorted(latencias)
+    return {
+        "ef_search": ef_search,
+        "recall": recall,
+        "p50_ms": statistics.median(latencias),
+        "p95_ms": latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))],
+    }
@@ -0,0 +1,45 @@
+"""
+Criação e atualização do schema do banco (rodada por `python manage.py migrate`,
+não na subida da aplicação).
+
+Base.metadata.create_all só cria tabelas que ainda não existem; as colunas novas de
+tabelas já existentes entram aqui como ALTERs idempotentes.
+"""
+from sqlalchemy import text
+
+from app.schemas import Base
+
+# Colunas adicionadas depois da criação original das tabelas
+ALTERACOES = [
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS size_bytes INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS previous_versions JSONB NOT NULL DEFAULT '[]'::jsonb",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS chunk_diff JSONB",
+    # ingestion_batches é criada pelo create_all, antes destes comandos
+    "ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS batch_id INTEGER "
+    "REFERENCES ingestion_batches (id) ON DELETE CASCADE",
+    "CREATE INDEX IF NOT EXISTS ix_ingestion_jobs_batch_id ON ingestion_jobs (batch_id)",
+    "ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS claim_token VARCHAR(36)",
+]
+
+
+def apply_migrations(engine):
+    """Cria as tabelas que faltam, aplica as alterações pendentes e prepara a coleção do PGVector."""
+    # A coluna Vector de embedding_cache depende da extensão
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for comando in ALTERACOES:
+            conn.execute(text(comando))
+
+    # Tabelas do langchain_postgres, coleção de documentos e índices sobre elas
+    from app.ia.utils import create_document_indexes, get_pg_vector
+    from app.ia.vector_index import criar_indices_ann
+
+    get_pg_vector()
+    create_document_indexes()
+    criar_indices_ann()
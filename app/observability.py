@@ -0,0 +1,253 @@
+"""
+Observabilidade: logs com trace_id por requisição e métricas no formato do Prometheus.
+
+- Logs: cada módulo usa logging.getLogger(__name__). configurar_logs() instala um
+  handler com o trace_id da requisição corrente em cada linha (texto ou JSON, conforme
+  LOG_FORMATO). As mensagens usam formatação preguiçosa (logger.debug("... %s", x)):
+  abaixo de LOG_NIVEL nada é formatado.
+- Trace: MiddlewareObservabilidade gera (ou aceita do header X-Request-ID) um id por
+  requisição, guardado num ContextVar e devolvido no header X-Trace-Id.
+- Métricas: histogramas por etapa do pipeline e por rota HTTP, gauges de etapas e
+  requisições em andamento, tokens do LLM e acertos do cache de embeddings, expostos em
+  /metrics (app/routers/health.py). Com vários workers (gunicorn) ou a fila de ingestão
+  num processo próprio na mesma máquina, defina o mesmo PROMETHEUS_MULTIPROC_DIR em todos
+  para agregá-los.
+"""
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+
+from config import LOG_FORMATO, LOG_NIVEL
+
+logger = logging.getLogger(__name__)
+
+_trace_id: ContextVar[str] = ContextVar("trace_id", default="-")
+
+# Buckets de 5 ms a 2 min: cobrem de um INSERT a uma análise de contrato longo
+_BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+ETAPA_SEGUNDOS = Histogram(
+    "auditia_etapa_segundos", "Duração das etapas do pipeline.", ["etapa"], buckets=_BUCKETS_SEGUNDOS
+)
+ETAPAS_EM_ANDAMENTO = Gauge(
+    "auditia_etapas_em_andamento", "Etapas do pipeline em execução.", ["etapa"], multiprocess_mode="livesum"
+)
+ETAPA_ERROS = Counter("auditia_etapa_erros_total", "Etapas do pipeline que terminaram com exceção.", ["etapa"])
+HTTP_SEGUNDOS = Histogram(
+    "auditia_http_requisicao_segundos", "Duração das requisições HTTP (até o fim do corpo da resposta).",
+    ["metodo", "rota", "status"], buckets=_BUCKETS_SEGUNDOS,
+)
+HTTP_EM_ANDAMENTO = Gauge(
+    "auditia_http_requisicoes_em_andamento", "Requisições HTTP em andamento.", ["metodo"],
+    multiprocess_mode="livesum",
+)
+LLM_TOKENS = Counter("auditia_llm_tokens_total", "Tokens enviados e recebidos do LLM.", ["modelo", "tipo"])
+EMBEDDING_TEXTOS = Counter("auditia_embedding_textos_total", "Textos enviados ao modelo de embeddings.")
+EMBEDDING_CACHE_TEXTOS = Counter(
+    "auditia_embedding_cache_textos_total", "Textos consultados no cache de embeddings, por resultado (hit ou miss).",
+    ["modelo", "resultado"],
+)
+EMBEDDING_CACHE_GEMINI_SEGUNDOS = Counter(
+    "auditia_embedding_cache_gemini_segundos_total",
+    "Tempo gasto no modelo de embeddings com os textos que não estavam no cache.", ["modelo"],
+)
+
+
+def trace_id() -> str:
+    """Trace id da requisição corrente ("-" fora de uma requisição)."""
+    return _trace_id.get()
+
+
+@contextmanager
+def contexto_trace(trace: str):
+    """Define o trace id fora de uma requisição HTTP (ex: um job da fila de ingestão)."""
+    token = _trace_id.set(trace)
+    try:
+        yield
+    finally:
+        _trace_id.reset(token)
+
+
+class _FiltroTrace(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = _trace_id.get()
+        return True
+
+
+class _FormatoJson(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        registro = {
+            "ts": self.formatTime(record),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "mensagem": record.getMessage(),
+        }
+        if record.exc_info:
+            registro["exc"] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False)
+
+
+_LOGGERS_DA_APLICACAO = ("app", "main", "database", "manage")
+
+
+def configurar_logs(nivel: str = LOG_NIVEL, formato: str = LOG_FORMATO):
+    """Configura os loggers da aplicação (idempotente: pode ser chamada mais de uma vez)."""
+    handler = logging.StreamHandler()
+    handler.addFilter(_FiltroTrace())
+    if formato == "json":
+        handler.setFormatter(_FormatoJson())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"))
+
+    for nome in _LOGGERS_DA_APLICACAO:
+        logger_aplicacao = logging.getLogger(nome)
+        logger_aplicacao.handlers = [handler]
+        logger_aplicacao.setLevel(nivel.upper())
+        logger_aplicacao.propagate = False
+
+
+@contextmanager
+def medir_etapa(etapa: str):
+    """Mede uma etapa do pipeline: histograma de duração, gauge de em andamento e erros."""
+    em_andamento = ETAPAS_EM_ANDAMENTO.labels(etapa)
+    em_andamento.inc()
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        ETAPA_ERROS.labels(etapa).inc()
+        raise
+    finally:
+        duracao = time.perf_counter() - inicio
+        em_andamento.dec()
+        ETAPA_SEGUNDOS.labels(etapa).observe(duracao)
+        logger.debug("etapa %s: %.3fs", etapa, duracao)
+
+
+def observar_etapa(etapa: str, segundos: float):
+    """Registra a duração de uma etapa medida em outro lugar (ex: num processo do pool)."""
+    ETAPA_SEGUNDOS.labels(etapa).observe(segundos)
+
+
+class MetricasLLM(BaseCallbackHandler):
+    """
+    Callback do LangChain para os clientes do Gemini: duração de cada chamada (etapa
+    "llm"), chamadas em andamento e tokens de entrada/saída (usage_metadata).
+    """
+
+    run_inline = True  # só atualiza contadores: roda no próprio loop, sem thread
+
+    def __init__(self):
+        self._inicios: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs: Any):
+        self._inicios[run_id] = time.perf_counter()
+        ETAPAS_EM_ANDAMENTO.labels("llm").inc()
+
+    def _terminar(self, run_id: UUID, erro: bool):
+        inicio = self._inicios.pop(run_id, None)
+        if inicio is None:
+            return
+        ETAPAS_EM_ANDAMENTO.labels("llm").dec()
+        ETAPA_SEGUNDOS.labels("llm").observe(time.perf_counter() - inicio)
+        if erro:
+            ETAPA_ERROS.labels("llm").inc()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        self._terminar(run_id, erro=False)
+        for geracoes in response.generations:
+            for geracao in geracoes:
+                mensagem = getattr(geracao, "message", None)
+                uso = getattr(mensagem, "usage_metadata", None)
+                if not uso:
+                    continue
+                modelo = (mensagem.response_metadata or {}).get("model_name", "desconhecido")
+                LLM_TOKENS.labels(modelo, "entrada").inc(uso.get("input_tokens", 0))
+                LLM_TOKENS.labels(modelo, "saida").inc(uso.get("output_tokens", 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._terminar(run_id, erro=True)
+
+
+# Um único handler para todos os clientes (os contadores são globais)
+metricas_llm = MetricasLLM()
+
+
+class MiddlewareObservabilidade:
+    """
+    Middleware ASGI: trace id por requisição, histograma por rota (o template, ex:
+    /analysis/{file_name}) e gauge de requisições em andamento. O tempo vai até o fim
+    do corpo da resposta, o que inclui a duração inteira das rotas em streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cabecalhos = dict(scope.get("headers") or [])
+        trace = (cabecalhos.get(b"x-request-id") or b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        token = _trace_id.set(trace)
+        status = {"codigo": 500}
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status["codigo"] = mensagem["status"]
+                mensagem.setdefault("headers", [])
+                mensagem["headers"] = list(mensagem["headers"]) + [(b"x-trace-id", trace.encode("latin-1"))]
+            await send(mensagem)
+
+        em_andamento = HTTP_EM_ANDAMENTO.labels(scope["method"])
+        em_andamento.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            em_andamento.dec()
+            rota = getattr(scope.get("route"), "path", None) or "desconhecida"
+            HTTP_SEGUNDOS.labels(scope["method"], rota, str(status["codigo"])).observe(duracao)
+            logger.debug("%s %s -> %s em %.3fs", scope["method"], rota, status["codigo"], duracao)
+            _trace_id.reset(token)
+
+
+def _registro_agregado() -> CollectorRegistry:
+    """Registro das métricas, agregando os workers em modo multiprocesso."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return registro
+    return REGISTRY
+
+
+def metricas_prometheus() -> tuple:
+    """(conteúdo, content-type) das métricas, agregando os workers em modo multiprocesso."""
+    return generate_latest(_registro_agregado()), CONTENT_TYPE_LATEST
+
+
+def somar_contador(nome: str, **labels: str) -> float:
+    """Valor de um contador (ex: "auditia_embedding_textos_total") somado entre os labels e os workers."""
+    return sum((
+        amostra.value
+        for metrica in _registro_agregado().collect()
+        for amostra in metrica.samples
+        if amostra.name == nome and all(amostra.labels.get(chave) == valor for chave, valor in labels.items())
+    ), 0.0)
@@ -1,49 +1,302 @@
-from fastapi import APIRouter, HTTPException, Path
+import asyncio
+import json
+import logging
+from typing import List, Optional, Tuple
 
-from app.ia.agents.agent_risco_prazos import AgenteRiscoPrazos
-from app.ia.agents.agent_proativo import gerar_insights_proativos
-from app.ia.utils import get_full_text_by_filename
+from fastapi import APIRouter, HTTPException, Path, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.ia.agents.agent_risco_prazos import analisar_texto_contrato, atualizar_prazos
+from app.ia.agents.agent_proativo import agerar_insights_proativos, astream_insights_proativos
+from app.ia.analysis_cache import ChaveAnalise, abuscar_documento, abuscar_resultado, agravar_resultado, hash_texto
+from app.ia.executor import get_process_pool
+from app.ia.utils import aget_full_text_by_filename
+from app.observability import medir_etapa
+from app.schemas import DocumentStatus
+from app.sse import evento_sse, resposta_sse
+from config import ANALISE_LOTE_CONCORRENCIA, ANALISE_TIMEOUT_REGRAS_SEGUNDOS, ANALISE_TIMEOUT_INSIGHTS_SEGUNDOS
 
 router = APIRouter(prefix="/analysis", tags=["2. Análise de Documentos"])
 
+logger = logging.getLogger(__name__)
+
+
+class AnaliseLoteRequest(BaseModel):
+    file_names: List[str] = Field(..., min_length=1, description="Nomes dos arquivos já enviados via /upload.")
+
+
+@router.post("/batch")
+async def analyze_documents_batch(request: AnaliseLoteRequest):
+    """
+    Executa a análise automática (riscos e prazos, sem IA generativa) em vários
+    documentos da base, distribuindo o trabalho em um pool de processos.
+
+    A resposta é NDJSON: uma linha por documento, na ordem em que cada análise termina.
+    """
+    nomes = list(dict.fromkeys(request.file_names))  # remove duplicados mantendo a ordem
+    pool = get_process_pool()
+    limite = asyncio.Semaphore(ANALISE_LOTE_CONCORRENCIA)
+
+    async def analisar(file_name: str) -> dict:
+        async with limite:
+            try:
+                texto_completo = await aget_full_text_by_filename(file_name)
+                if not texto_completo:
+                    return {"file_name": file_name, "status": "nao_encontrado"}
+
+                loop = asyncio.get_running_loop()
+                with medir_etapa("analise_regras"):
+                    analise = await loop.run_in_executor(pool, analisar_texto_contrato, texto_completo, file_name)
+                return {"file_name": file_name, "status": "ok", "analise_automatica": analise}
+            except Exception as e:
+                logger.exception("Erro na análise em lote de '%s': %s", file_name, e)
+                return {"file_name": file_name, "status": "erro", "detail": str(e)}
+
+    async def gerar_linhas():
+        tarefas = [asyncio.create_task(analisar(nome)) for nome in nomes]
+        try:
+            for proxima in asyncio.as_completed(tarefas):
+                resultado = await proxima
+                yield json.dumps(resultado, ensure_ascii=False) + "\n"
+        finally:
+            # Se o cliente desconectar, não deixa análises órfãs na fila
+            for tarefa in tarefas:
+                tarefa.cancel()
+
+    return StreamingResponse(gerar_linhas(), media_type="application/x-ndjson")
+
+
 @router.post("/{file_name}")
-def analyze_existing_document(file_name: str = Path(..., description="O nome do arquivo exato (ex: contrato_servico.pdf) que foi previamente enviado via /upload.")):
+async def analyze_existing_document(
+    response: Response,
+    file_name: str = Path(..., description="O nome do arquivo exato (ex: contrato_servico.pdf) que foi previamente enviado via /upload."),
+    refresh: bool = Query(False, description="Ignora o resultado em cache e refaz a análise."),
+    parcial: bool = Query(True, description="Se os insights da IA falharem ou excederem o tempo limite, devolve só a análise por regras."),
+):
     """
     Inicia uma análise completa (riscos, prazos e insights) em um documento
     que JÁ EXISTE na base de conhecimento.
+
+    O resultado fica em cache no Postgres por (conteúdo do documento, versão das regras,
+    modelo, versão do prompt); os status dos prazos são sempre recalculados para a data atual.
+    O header X-Analysis-Cache indica "hit" ou "miss".
+
+    A análise por regras (pool de processos) e os insights da IA rodam ao mesmo tempo,
+    cada um com seu tempo limite. Com `parcial=true` (padrão), uma falha nos insights não
+    derruba a requisição: a resposta traz `insights_proativos_ia: null` e o motivo em
+    `erros`, e não é gravada no cache.
     """
-    
-    # --- LINHA DE DEPURAÇÃO ADICIONADA ---
-    # Isto irá imprimir no terminal do backend o nome EXATO do arquivo que o frontend enviou.
-    print(f"--- DEBUG: Rota de análise recebida para o arquivo: '{file_name}' ---")
-    
+    # Nome EXATO do arquivo que o frontend enviou (útil para depurar 404)
+    logger.debug("Rota de análise recebida para o arquivo: %r", file_name)
+
     try:
-        # O resto do seu código continua igual...
-        print(f"Iniciando análise para o arquivo: {file_name}")
-        texto_completo = get_full_text_by_filename(file_name)
-
-        if not texto_completo:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Documento '{file_name}' não encontrado na base de dados. Verifique o nome ou faça o upload primeiro."
-            )
-
-        agente_riscos = AgenteRiscoPrazos()
-        analise_riscos_prazos = agente_riscos.processar_contrato(
-            texto_contrato=texto_completo,
-            nome_arquivo=file_name
-        )
+        logger.info("Iniciando análise para o arquivo: %s", file_name)
+
+        resultado, texto_completo, chave = await _preparar_analise(file_name, refresh)
+        if resultado is not None:
+            response.headers["X-Analysis-Cache"] = "hit"
+            return resultado
+
+        # As duas etapas são independentes e rodam ao mesmo tempo. A análise por regras é
+        # CPU-bound: roda no pool de processos para não travar o event loop.
+        tarefa_regras = asyncio.ensure_future(_analisar_regras(texto_completo, file_name))
+        tarefa_insights = asyncio.ensure_future(asyncio.wait_for(
+            agerar_insights_proativos(texto_contrato=texto_completo),
+            timeout=ANALISE_TIMEOUT_INSIGHTS_SEGUNDOS,
+        ))
+
+        try:
+            analise_riscos_prazos = await tarefa_regras
+        except BaseException as e:
+            # Sem a análise por regras não há resultado útil: não espera pelos insights
+            tarefa_insights.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise HTTPException(status_code=504, detail=_descrever_falha("análise por regras", e, ANALISE_TIMEOUT_REGRAS_SEGUNDOS))
+            raise
 
-        insights_proativos = gerar_insights_proativos(texto_contrato=texto_completo)
+        try:
+            insights_proativos = await tarefa_insights
+        except Exception as e:
+            motivo = _descrever_falha("insights da IA", e, ANALISE_TIMEOUT_INSIGHTS_SEGUNDOS)
+            logger.warning(motivo)
+            if not parcial:
+                raise HTTPException(status_code=504 if isinstance(e, asyncio.TimeoutError) else 502, detail=motivo)
+            response.headers["X-Analysis-Cache"] = "miss"
+            return {
+                "analise_automatica": analise_riscos_prazos,
+                "insights_proativos_ia": None,
+                "erros": {"insights_proativos_ia": motivo},
+            }
 
-        return {
+        resultado = {
             "analise_automatica": analise_riscos_prazos,
             "insights_proativos_ia": insights_proativos
         }
+        await agravar_resultado(chave, file_name, resultado)
+        response.headers["X-Analysis-Cache"] = "miss"
+        return resultado
 
     except HTTPException as e:
         raise e
     except Exception as e:
-        # Adicionando um print aqui também para vermos o erro exato no terminal
-        print(f"--- ERRO 500 DETALHADO: {str(e)} ---")
-        raise HTTPException(status_code=500, detail=f"Ocorreu um erro inesperado durante a análise: {str(e)}")
\ No newline at end of file
+        logger.exception("Erro inesperado na análise de '%s': %s", file_name, e)
+        raise HTTPException(status_code=500, detail=f"Ocorreu um erro inesperado durante a análise: {str(e)}")
+
+
+@router.post("/{file_name}/stream")
+async def analyze_existing_document_stream(
+    file_name: str = Path(..., description="O nome do arquivo exato (ex: contrato_servico.pdf) que foi previamente enviado via /upload."),
+    refresh: bool = Query(False, description="Ignora o resultado em cache e refaz a análise."),
+):
+    """
+    Versão em streaming (SSE) de /analysis/{file_name}. Eventos:
+
+    - `analise_automatica`: riscos e prazos, assim que a análise por regras termina;
+    - `token`: pedaços do resumo executivo da IA à medida que são gerados ({"text": ...});
+    - `error`: falha ou tempo limite de uma etapa ({"etapa": ..., "detail": ...});
+    - `done`: fim ({"cache": "hit" | "miss", "insights_proativos_ia": texto completo ou null}).
+
+    Com resultado em cache, os eventos `analise_automatica` e `token` (texto inteiro) saem de uma vez.
+    Só resultados completos são gravados no cache.
+    """
+    logger.info("Iniciando análise em streaming para o arquivo: %s", file_name)
+    resultado, texto_completo, chave = await _preparar_analise(file_name, refresh)
+
+    async def eventos_do_cache():
+        yield evento_sse("analise_automatica", resultado["analise_automatica"])
+        yield evento_sse("token", {"text": resultado["insights_proativos_ia"]})
+        yield evento_sse("done", {"cache": "hit", "insights_proativos_ia": resultado["insights_proativos_ia"]})
+
+    async def gerar_eventos():
+        fila: asyncio.Queue = asyncio.Queue()
+        resultados, erros = {}, {}
+
+        async def regras():
+            analise = await _analisar_regras(texto_completo, file_name)
+            fila.put_nowait(evento_sse("analise_automatica", analise))
+            return analise
+
+        async def insights():
+            partes = []
+            async for trecho in astream_insights_proativos(texto_completo):
+                partes.append(trecho)
+                fila.put_nowait(evento_sse("token", {"text": trecho}))
+            return "".join(partes)
+
+        async def etapa(nome: str, descricao: str, corrotina, timeout: float):
+            try:
+                resultados[nome] = await asyncio.wait_for(corrotina, timeout=timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                erros[nome] = _descrever_falha(descricao, e, timeout)
+                logger.warning(erros[nome])
+            finally:
+                fila.put_nowait(None)  # sinaliza o fim da etapa
+
+        # As duas etapas rodam ao mesmo tempo e publicam seus eventos na mesma fila
+        tarefas = {
+            "analise_automatica": asyncio.ensure_future(
+                etapa("analise_automatica", "análise por regras", regras(), ANALISE_TIMEOUT_REGRAS_SEGUNDOS)
+            ),
+            "insights_proativos_ia": asyncio.ensure_future(
+                etapa("insights_proativos_ia", "insights da IA", insights(), ANALISE_TIMEOUT_INSIGHTS_SEGUNDOS)
+            ),
+        }
+        try:
+            finalizadas = 0
+            while finalizadas < len(tarefas):
+                evento = await fila.get()
+                if evento is not None:
+                    yield evento
+                    continue
+                finalizadas += 1
+                if "analise_automatica" in erros:
+                    # Sem a análise por regras não há resultado útil: não espera pelos insights
+                    break
+        finally:
+            # Cliente desconectou ou a análise por regras falhou: cancela o que ainda estiver rodando
+            for tarefa in tarefas.values():
+                tarefa.cancel()
+
+        for nome, motivo in erros.items():
+            yield evento_sse("error", {"etapa": nome, "detail": motivo})
+        if "analise_automatica" in erros:
+            return
+
+        insights_proativos = resultados.get("insights_proativos_ia")
+        if not erros:
+            await agravar_resultado(chave, file_name, {
+                "analise_automatica": resultados["analise_automatica"],
+                "insights_proativos_ia": insights_proativos,
+            })
+        yield evento_sse("done", {"cache": "miss", "insights_proativos_ia": insights_proativos})
+
+    return resposta_sse(eventos_do_cache() if resultado is not None else gerar_eventos())
+
+
+async def _preparar_analise(file_name: str, refresh: bool) -> Tuple[Optional[dict], Optional[str], Optional[ChaveAnalise]]:
+    """
+    Retorna (resultado em cache, None, None) ou, se for preciso analisar,
+    (None, texto completo, chave do cache). Levanta 404 se o documento não existir e 409
+    se ele ainda estiver sendo ingerido (o texto estaria incompleto ou seria o da versão
+    anterior, e o resultado ficaria gravado sob o hash do arquivo novo).
+    """
+    documento = await abuscar_documento(file_name)
+    if documento is not None and documento.status != DocumentStatus.COMPLETED:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Documento '{file_name}' ainda não está disponível para análise (status {documento.status.value}).",
+        )
+
+    # Documentos enviados pelo /upload têm o hash do arquivo: o cache é consultado sem remontar o texto
+    content_hash = documento.content_hash if documento is not None else None
+    if content_hash and not refresh:
+        resultado = await _resultado_em_cache(ChaveAnalise(content_hash), file_name)
+        if resultado is not None:
+            return resultado, None, None
+
+    texto_completo = await aget_full_text_by_filename(file_name)
+
+    if not texto_completo:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Documento '{file_name}' não encontrado na base de dados. Verifique o nome ou faça o upload primeiro."
+        )
+
+    chave = ChaveAnalise(content_hash or hash_texto(texto_completo))
+    if not content_hash and not refresh:
+        resultado = await _resultado_em_cache(chave, file_name)
+        if resultado is not None:
+            return resultado, None, None
+
+    return None, texto_completo, chave
+
+
+async def _resultado_em_cache(chave: ChaveAnalise, file_name: str):
+    """Resultado em cache com os prazos recalculados para hoje, ou None se não houver."""
+    resultado = await abuscar_resultado(chave)
+    if resultado is None:
+        return None
+
+    analise = resultado["analise_automatica"]
+    analise["nome_arquivo"] = file_name
+    analise["alertas_prazo"] = atualizar_prazos(analise["alertas_prazo"])
+    return resultado
+
+
+async def _analisar_regras(texto_completo: str, file_name: str) -> dict:
+    """Análise por regras no pool de processos (CPU-bound, fora do event loop), com tempo limite."""
+    loop = asyncio.get_running_loop()
+    with medir_etapa("analise_regras"):
+        return await asyncio.wait_for(
+            loop.run_in_executor(get_process_pool(), analisar_texto_contrato, texto_completo, file_name),
+            timeout=ANALISE_TIMEOUT_REGRAS_SEGUNDOS,
+        )
+
+
+def _descrever_falha(etapa: str, erro: Exception, timeout: float) -> str:
+    if isinstance(erro, asyncio.TimeoutError):
+        return f"Etapa '{etapa}' excedeu o tempo limite de {timeout:g}s."
+    return f"Etapa '{etapa}' falhou: {str(erro)}"
@@ -1,56 +1,154 @@
+import asyncio
+import logging
 import time
-from datetime import datetime
-from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
 from langchain_core.documents import Document
 
 # <<< CORREÇÃO: Importa a função corrigida de agent_conversation
-from app.ia.agents.agent_conversation import generate_embedding_response
-# <<< CORREÇÃO: Importa os bancos de dados de vetores
-from app.ia.utils import pg_vector, query_chat_history
+from app.ia.agents.agent_conversation import (
+    agenerate_embedding_response, aretrieve_documents, astream_embedding_response, build_retriever
+)
+from app.ia.chat_cache import abuscar_resposta, agravar_resposta
+from app.ia.chat_history import acarregar_historico, asalvar_turno
+from app.ia.retrieval import aembed_consulta
+from app.sse import evento_sse, resposta_sse
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
+logger = logging.getLogger(__name__)
+
 class QueryRequest(BaseModel):
     query: str
     chat_id: str
+    # Restringe a busca a um documento (file_name) ou a um conjunto deles (file_names)
+    file_name: Optional[str] = None
+    file_names: Optional[List[str]] = None
+
+    def arquivos(self) -> Optional[List[str]]:
+        """Arquivos aos quais a busca se restringe (None = todos os documentos)."""
+        arquivos = list(self.file_names or [])
+        if self.file_name:
+            arquivos.append(self.file_name)
+        return arquivos or None
 
 @router.post("/question")
-def query_document(request: QueryRequest):
+async def query_document(request: QueryRequest, response: Response):
+    """
+    Responde à pergunta com base nos documentos (todos ou os de file_name/file_names).
+    Perguntas próximas de outras já respondidas sobre os mesmos documentos saem do cache
+    de respostas; o header X-Chat-Cache indica "hit" ou "miss". O cache só vale para a
+    primeira pergunta de uma conversa: com histórico, a resposta depende dele.
+    """
     start_time = time.time()
-    
-    chat_history_db = query_chat_history()
-    # TODO: Implementar a lógica para buscar e formatar o histórico da conversa
-    # Por enquanto, usaremos uma string vazia como placeholder
-    formatted_history = ""
-
-    # <<< CORREÇÃO: Chama a função corrigida, passando o banco de vetores principal (pg_vector)
-    response = generate_embedding_response(
-        db_retriever=pg_vector, 
+
+    # Embedding da pergunta (cache em memória), usado na busca do cache e na recuperação, e
+    # os últimos turnos da conversa (e resumo dos antigos), do histórico relacional
+    embedding, formatted_history = await asyncio.gather(
+        aembed_consulta(request.query), acarregar_historico(request.chat_id)
+    )
+    cacheada = None if formatted_history else await abuscar_resposta(embedding, request.arquivos())
+    if cacheada is not None:
+        response.headers["X-Chat-Cache"] = "hit"
+        await _salvar_historico(request, cacheada.answer)
+        logger.info("Tempo (cache): %.3f segundos", time.time() - start_time)
+        return {"answer": cacheada.answer}
+    response.headers["X-Chat-Cache"] = "miss"
+
+    # Busca híbrida (full-text + vetorial), restrita aos arquivos pedidos, e resposta via ainvoke
+    result = await agenerate_embedding_response(
+        retriever=build_retriever(request.arquivos()), 
         query=request.query, 
         history=formatted_history
     )
 
     # <<< CORREÇÃO CRÍTICA: Verifica se a resposta é válida antes de usá-la
-    if not response or 'answer' not in response:
+    if not result or 'answer' not in result:
         raise HTTPException(status_code=500, detail="Erro ao obter resposta da IA.")
 
     # Se a verificação passar, podemos usar a resposta com segurança
-    answer = response['answer']
-    print(f"Resposta: {answer}")
-
-    # Salva a interação no histórico
-    chat_history_doc = Document(
-        page_content=f"Usuário: {request.query}\nIA: {answer}",
-        metadata={
-            "chat_id": request.chat_id, 
-            "user": request.query, 
-            "ai": answer,
-            "timestamp": datetime.now().isoformat()
-        }
-    )
-    chat_history_db.add_documents([chat_history_doc])
+    answer = result['answer']
+    logger.debug("Resposta: %s", answer)
+
+    # Salva a interação no histórico e a resposta no cache
+    await _salvar_historico(request, answer)
+    if not formatted_history:
+        await _guardar_no_cache(request, embedding, answer, result.get("context", []))
+
+    logger.info("Tempo: %.3f segundos", time.time() - start_time)
+
+    return {"answer": answer}
+
+
+@router.post("/question/stream")
+async def query_document_stream(request: QueryRequest):
+    """
+    Versão em streaming (SSE) de /chat/question. Eventos, em ordem:
+
+    - `sources`: trechos recuperados (arquivo, página e conteúdo), antes da resposta;
+    - `token`: cada pedaço da resposta assim que o LLM o produz ({"text": ...});
+    - `done`: resposta completa ({"answer": ..., "cache": "hit" | "miss"}), já salva no histórico;
+    - `error`: falha no meio do caminho ({"detail": ...}); nada é salvo no histórico.
+
+    Quando a resposta vem do cache (só na primeira pergunta da conversa), `sources` traz
+    os trechos da resposta original e a resposta inteira chega num único `token`.
+    """
+    async def gerar_eventos():
+        start_time = time.time()
+        try:
+            embedding, formatted_history = await asyncio.gather(
+                aembed_consulta(request.query), acarregar_historico(request.chat_id)
+            )
+            cacheada = None if formatted_history else await abuscar_resposta(embedding, request.arquivos())
+            if cacheada is not None:
+                yield evento_sse("sources", cacheada.sources)
+                yield evento_sse("token", {"text": cacheada.answer})
+                await _salvar_historico(request, cacheada.answer)
+                yield evento_sse("done", {"answer": cacheada.answer, "cache": "hit"})
+                return
+
+            documentos = await aretrieve_documents(build_retriever(request.arquivos()), request.query)
+            yield evento_sse("sources", [_fonte(documento) for documento in documentos])
+
+            partes = []
+            async for trecho in astream_embedding_response(documentos, request.query, formatted_history):
+                partes.append(trecho)
+                yield evento_sse("token", {"text": trecho})
+
+            answer = "".join(partes)
+            # O histórico só é gravado quando a resposta termina
+            await _salvar_historico(request, answer)
+            if not formatted_history:
+                await _guardar_no_cache(request, embedding, answer, documentos)
+            yield evento_sse("done", {"answer": answer, "cache": "miss"})
+            logger.info("Tempo (stream): %.3f segundos", time.time() - start_time)
+        except Exception as e:
+            logger.exception("Erro ao gerar a resposta em streaming: %s", e)
+            yield evento_sse("error", {"detail": "Erro ao obter resposta da IA."})
+
+    return resposta_sse(gerar_eventos())
+
+
+def _fonte(documento: Document) -> dict:
+    return {
+        "file_name": documento.metadata.get("file_name"),
+        "page_number": documento.metadata.get("page_number"),
+        "content": documento.page_content,
+    }
+
+
+async def _salvar_historico(request: QueryRequest, answer: str):
+    # Um INSERT na tabela chat_messages: sem embedding nem chamada ao Gemini
+    await asalvar_turno(request.chat_id, request.query, answer)
+
 
-    print(f"Tempo: {time.time() - start_time} segundos")
-    
-    return {"answer": answer}
\ No newline at end of file
+async def _guardar_no_cache(request: QueryRequest, embedding: List[float], answer: str, documentos: List[Document]):
+    try:
+        await agravar_resposta(
+            request.query, embedding, request.arquivos(), answer, [_fonte(documento) for documento in documentos]
+        )
+    except Exception as e:
+        # O cache é só uma otimização: a resposta já foi gerada e salva no histórico
+        logger.warning("Erro ao gravar a resposta no cache do chat: %s", e)
@@ -0,0 +1,75 @@
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import text
+
+from app.ia.utils import check_s3
+from app.observability import metricas_prometheus
+from config import GEMINI_API_KEY
+from database import async_engine
+
+router = APIRouter(tags=["0. Saúde"])
+
+# Tempo máximo (segundos) de cada verificação do /ready
+_TIMEOUT_VERIFICACAO = 3
+
+# Tabelas criadas por `python manage.py migrate`
+_TABELAS_OBRIGATORIAS = ("documents", "ingestion_jobs", "langchain_pg_embedding", "langchain_pg_collection")
+
+
+async def _verificar_postgres() -> dict:
+    async with async_engine.connect() as conn:
+        faltando = [
+            tabela for tabela in _TABELAS_OBRIGATORIAS
+            if (await conn.execute(text("SELECT to_regclass(:tabela)"), {"tabela": tabela})).scalar() is None
+        ]
+    if faltando:
+        return {"ok": False, "detail": f"Tabelas ausentes: {', '.join(faltando)}. Rode `python manage.py migrate`."}
+    return {"ok": True}
+
+
+async def _verificar_s3() -> dict:
+    return {"ok": await run_in_threadpool(check_s3)}
+
+
+async def _verificar(verificacao) -> dict:
+    try:
+        return await asyncio.wait_for(verificacao(), timeout=_TIMEOUT_VERIFICACAO)
+    except asyncio.TimeoutError:
+        return {"ok": False, "detail": f"Sem resposta em {_TIMEOUT_VERIFICACAO}s."}
+    except Exception as e:
+        return {"ok": False, "detail": str(e)}
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    Readiness probe: verifica o Postgres (conexão e schema migrado), o bucket do S3 e a
+    configuração do Gemini. Responde 200 quando tudo está pronto e 503 caso contrário.
+    """
+    postgres, s3 = await asyncio.gather(_verificar(_verificar_postgres), _verificar(_verificar_s3))
+    verificacoes = {
+        "postgres": postgres,
+        "s3": s3,
+        # Sem chamada à API (custaria cota): só confere se a chave está configurada
+        "gemini": {"ok": bool(GEMINI_API_KEY)},
+    }
+    pronto = all(verificacao["ok"] for verificacao in verificacoes.values())
+    return JSONResponse(
+        status_code=200 if pronto else 503,
+        content={"status": "ready" if pronto else "not_ready", "checks": verificacoes},
+    )
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Métricas no formato do Prometheus: duração das etapas do pipeline (upload ao S3,
+    leitura do PDF, chunking, embeddings, gravação dos vetores, recuperação, LLM e análise
+    por regras), duração das requisições por rota, etapas e requisições em andamento e
+    tokens do LLM.
+    """
+    conteudo, tipo = metricas_prometheus()
+    return Response(content=conteudo, media_type=tipo)
@@ -1,14 +1,32 @@
+import json
 import os
 import uuid
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import StreamingResponse
 
 # Importa o seu agente e a função para ler PDF
 from app.ia.agents.agent_risco_prazos import AgenteRiscoPrazos
-from app.ia.utils import read_pdf # Supondo que você tenha essa função em utils.py
+from app.ia.utils import iter_pdf_pages, stream_upload, UploadTooLargeError
 
 # Cria um novo router para este endpoint
 router = APIRouter(prefix="/analysis", tags=["Análise de Riscos e Prazos"])
 
+TMP_DIR = "/tmp/audit_ia_risks"
+
+
+def _salvar_temporario(file: UploadFile) -> str:
+    """Salva o PDF recebido em um arquivo temporário e retorna o caminho."""
+    # É necessário salvar para que a biblioteca de leitura de PDF possa abri-lo
+    os.makedirs(TMP_DIR, exist_ok=True)
+    temp_path = os.path.join(TMP_DIR, f"{uuid.uuid4()}_{file.filename}")
+    try:
+        # Copia em blocos, sem carregar o arquivo inteiro em memória
+        stream_upload(file.file, local_path=temp_path)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return temp_path
+
+
 @router.post("/process-contract")
 def process_contract_endpoint(file: UploadFile = File(...)):
     """
@@ -21,34 +39,39 @@ def process_contract_endpoint(file: UploadFile = File(...)):
     temp_path = None
     try:
         # --- ETAPA 1: Salvar o arquivo PDF temporariamente ---
-        # É necessário salvar para que a biblioteca de leitura de PDF possa abri-lo
-        tmp_dir = "/tmp/audit_ia_risks"
-        os.makedirs(tmp_dir, exist_ok=True)
-        temp_path = os.path.join(tmp_dir, f"{uuid.uuid4()}_{file.filename}")
-        
-        with open(temp_path, "wb") as f:
-            f.write(file.file.read())
-
-        # --- ETAPA 2: Extrair o texto do PDF ---
-        # Usamos uma função auxiliar para converter o PDF em texto
-        pdf_pages = read_pdf(file_path=temp_path)
-        if not pdf_pages:
-            raise HTTPException(status_code=400, detail="Não foi possível extrair texto do PDF.")
-        
-        # Concatena o texto de todas as páginas em uma única string
-        texto_completo_contrato = "\n".join([page.page_content for page in pdf_pages])
+        temp_path = _salvar_temporario(file)
 
-        # --- ETAPA 3: Processar o texto com o Agente ---
-        # Instancia o agente e chama o método de processamento
+        # --- ETAPA 2 e 3: Ler o PDF página a página e processar com o Agente ---
+        # As páginas são consumidas em streaming, sem montar o texto completo em memória
         agente = AgenteRiscoPrazos(dias_alerta_proximo=30)
-        resultado_analise = agente.processar_contrato(
-            texto_contrato=texto_completo_contrato,
-            nome_arquivo=file.filename
-        )
+        alertas_risco = []
+        alertas_prazo = []
+        paginas_lidas = 0
+
+        def paginas():
+            nonlocal paginas_lidas
+            for texto_pagina in iter_pdf_pages(temp_path):
+                paginas_lidas += 1
+                yield texto_pagina
+
+        for alerta in agente.processar_contrato_paginas(paginas(), nome_arquivo=file.filename):
+            if alerta.pop("tipo") == "risco":
+                alertas_risco.append(alerta)
+            else:
+                alertas_prazo.append(alerta)
+
+        if not paginas_lidas:
+            raise HTTPException(status_code=400, detail="Não foi possível extrair texto do PDF.")
 
         # --- ETAPA 4: Retornar o resultado ---
-        return resultado_analise
+        return {
+            "nome_arquivo": file.filename,
+            "alertas_risco": alertas_risco,
+            "alertas_prazo": sorted(alertas_prazo, key=lambda p: p['deadline'])
+        }
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         # Captura qualquer erro inesperado durante o processo
         raise HTTPException(status_code=500, detail=f"Ocorreu um erro inesperado: {str(e)}")
@@ -58,3 +81,29 @@ def process_contract_endpoint(file: UploadFile = File(...)):
         # Garante que o arquivo temporário seja sempre excluído
         if temp_path and os.path.exists(temp_path):
             os.remove(temp_path)
+
+
+@router.post("/process-contract/stream")
+def process_contract_stream_endpoint(file: UploadFile = File(...)):
+    """
+    Igual a /process-contract, mas devolve os alertas em NDJSON (um JSON por linha)
+    à medida que as páginas são processadas. Cada alerta traz "tipo" e "pagina".
+    """
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="O arquivo deve ser um PDF.")
+
+    temp_path = _salvar_temporario(file)
+    agente = AgenteRiscoPrazos(dias_alerta_proximo=30)
+
+    def gerar_linhas():
+        try:
+            for alerta in agente.processar_contrato_paginas(iter_pdf_pages(temp_path), nome_arquivo=file.filename):
+                yield json.dumps(alerta, ensure_ascii=False) + "\n"
+        except Exception as e:
+            # Depois que o streaming começou não dá mais para mudar o status HTTP
+            yield json.dumps({"tipo": "erro", "detail": f"Ocorreu um erro inesperado: {str(e)}"}, ensure_ascii=False) + "\n"
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    return StreamingResponse(gerar_linhas(), media_type="application/x-ndjson")
@@ -1,15 +1,22 @@
+import datetime
 import os
 import uuid
+import zipfile
 from typing import List
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, HTTPException, Depends
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text, select
 
 # Importações do projeto
-from app.ia.agents.agent_embedding import create_embeddings
-from app.ia.utils import upload_file, read_pdf
-from database import SessionLocal
-from app.schemas import Document, DocumentStatus # <--- NOVA IMPORTAÇÃO
+from app.ia.agents.agent_embedding import embedding_cache
+from app.ia.utils import get_s3, stream_upload, UploadTooLargeError
+from app.workers.ingestao import TMP_DIR, enqueue_ingestion
+from app.workers.ingestao_lote import criar_lote, registrar_zip
+from config import AWS_S3_BUCKET, LOTE_ZIP_MAX_BYTES
+from database import SessionLocal, AsyncSessionLocal
+from app.schemas import Document, DocumentStatus, IngestionBatch, IngestionJob
 
 router = APIRouter(prefix="/documents", tags=["1. Gestão de Documentos"])
 
@@ -20,76 +27,232 @@ def get_db():
     finally:
         db.close()
 
-@router.post("/upload")
-def upload_document(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    # 1. Verificar se o documento já existe para evitar duplicatas
-    existing_document = db.execute(select(Document).where(Document.file_name == file.filename)).scalar_one_or_none()
-    if existing_document:
-        raise HTTPException(status_code=409, detail=f"Documento '{file.filename}' já existe.")
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
-    # 2. Salvar o arquivo temporariamente
-    temp_path = None
-    try:
-        tmp_dir = "/tmp/audit_ia"
-        os.makedirs(tmp_dir, exist_ok=True)
-        temp_path = os.path.join(tmp_dir, f"{uuid.uuid4()}_{file.filename}")
-        with open(temp_path, "wb") as f:
-            f.write(file.file.read())
-
-        # 3. Fazer o upload para o S3
-        s3_key = f"documents/{os.path.basename(temp_path)}"
-        s3_url = upload_file(temp_path, s3_key)
-
-        # 4. Criar o registro no banco de dados com status PENDING
-        db_document = Document(
-            file_name=file.filename,
-            s3_url=s3_url,
-            status=DocumentStatus.PROCESSING
-        )
-        db.add(db_document)
-        db.commit()
-        db.refresh(db_document)
+@router.post("/upload", status_code=202)
+def upload_document(file: UploadFile = File(...), new_version: bool = False, db: Session = Depends(get_db)):
+    """
+    Recebe o PDF, grava no S3 e enfileira a ingestão (leitura + embeddings).
+    Retorna imediatamente com o documento em PENDING; o andamento pode ser
+    acompanhado em /documents/{document_id}/status.
 
-        # 5. Processar o PDF e criar os embeddings
-        pdf_pages = read_pdf(file_path=temp_path)
-        if not pdf_pages:
-            raise HTTPException(status_code=400, detail="Não foi possível extrair texto do PDF.")
+    Com `new_version=true`, um arquivo com o nome de um documento existente é tratado
+    como nova versão dele (ex: um aditivo): o documento mantém o id e o file_name, a
+    versão anterior vai para `previous_versions` e a ingestão só refaz os chunks que
+    mudaram. Sem o parâmetro, um nome repetido continua sendo recusado com 409.
+    """
+    # 1. Verificar se o documento já existe para evitar duplicatas
+    consulta = select(Document).where(Document.file_name == file.filename)
+    if new_version:
+        # Trava a linha: dois envios simultâneos da mesma nova versão não geram dois jobs
+        consulta = consulta.with_for_update()
+    existing_document = db.execute(consulta).scalar_one_or_none()
+    if existing_document and not new_version:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Documento '{file.filename}' já existe. Para enviar uma nova versão, use new_version=true.",
+        )
+    if existing_document and existing_document.status in (DocumentStatus.PENDING, DocumentStatus.PROCESSING):
+        raise HTTPException(
+            status_code=409,
+            detail=f"A versão atual de '{file.filename}' ainda está em processamento; envie a nova versão depois.",
+        )
 
-        create_embeddings(pdf_pages=pdf_pages, file_name=file.filename)
+    try:
+        # 2. Enviar o arquivo ao S3 em streaming (multipart), calculando o SHA-256 no caminho
+        s3_key = f"documents/{uuid.uuid4()}_{file.filename}"
+        upload = stream_upload(file.file, s3_key=s3_key)
 
-        # 6. Atualizar o status para COMPLETED
-        db_document.status = DocumentStatus.COMPLETED
+        if existing_document:
+            if upload["sha256"] == existing_document.content_hash:
+                get_s3().delete_object(Bucket=AWS_S3_BUCKET, Key=s3_key)
+                db.rollback()
+                return JSONResponse(status_code=200, content={
+                    "message": "O arquivo é idêntico à versão atual; nada a reprocessar.",
+                    "document_id": existing_document.id,
+                    "filename": existing_document.file_name,
+                    "version": existing_document.version,
+                    "status": existing_document.status.value,
+                })
+            db_document = _nova_versao(existing_document, upload)
+        else:
+            # 3. Criar o registro no banco de dados com status PENDING e enfileirar a ingestão
+            db_document = Document(
+                file_name=file.filename,
+                s3_url=upload["s3_url"],
+                status=DocumentStatus.PENDING,
+                content_hash=upload["sha256"],
+                size_bytes=upload["size"],
+            )
+            db.add(db_document)
+        db.flush()
+        job = enqueue_ingestion(db, db_document, s3_key)
         db.commit()
 
         return {
-            "message": "Documento processado e salvo com sucesso!",
+            "message": "Documento recebido e enfileirado para processamento.",
             "document_id": db_document.id,
             "filename": db_document.file_name,
+            "version": db_document.version,
+            "status": db_document.status,
+            "job_id": job.id,
         }
 
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        # Se ocorrer um erro, atualiza o status para FAILED
-        if 'db_document' in locals() and db_document:
-            db_document.status = DocumentStatus.FAILED
-            db.commit()
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Ocorreu um erro no processamento: {str(e)}")
 
-    finally:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+
+def _nova_versao(document: Document, upload: dict) -> Document:
+    """Registra a versão atual em previous_versions e aponta o documento para o novo arquivo."""
+    document.previous_versions = list(document.previous_versions or []) + [{
+        "version": document.version,
+        "content_hash": document.content_hash,
+        "s3_url": document.s3_url,
+        "size_bytes": document.size_bytes,
+        "uploaded_at": document.uploaded_at.isoformat() if document.uploaded_at else None,
+        "chunk_diff": document.chunk_diff,
+    }]
+    document.version += 1
+    document.s3_url = upload["s3_url"]
+    document.content_hash = upload["sha256"]
+    document.size_bytes = upload["size"]
+    document.uploaded_at = datetime.datetime.utcnow()
+    document.status = DocumentStatus.PENDING
+    document.chunk_diff = None
+    return document
+
+
+@router.post("/upload-zip", status_code=202)
+def upload_zip(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    """
+    Ingestão em massa: recebe um ZIP com PDFs (em qualquer pasta) e cria um lote. Cada PDF
+    é enviado ao S3 e vira um documento PENDING; o lote é processado pelo pipeline de
+    ingestão em massa (leitura, chunking, embeddings e gravação em paralelo).
+
+    O registro dos arquivos continua depois da resposta; o andamento (por arquivo) fica em
+    /documents/batches/{batch_id}/status. Arquivos que não são PDF ou cujo nome já existe
+    na base são ignorados e listados em `skipped`.
+    """
+    os.makedirs(TMP_DIR, exist_ok=True)
+    caminho_zip = os.path.join(TMP_DIR, f"{uuid.uuid4()}.zip")
+    try:
+        stream_upload(file.file, local_path=caminho_zip, max_bytes=LOTE_ZIP_MAX_BYTES)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    if not zipfile.is_zipfile(caminho_zip):
+        os.remove(caminho_zip)
+        raise HTTPException(status_code=400, detail="O arquivo enviado não é um ZIP válido.")
+
+    batch_id = criar_lote(file.filename or "upload.zip")
+    background_tasks.add_task(registrar_zip, batch_id, caminho_zip)
+    return {
+        "message": "ZIP recebido; os documentos serão registrados e enfileirados para processamento.",
+        "batch_id": batch_id,
+        "status": DocumentStatus.PENDING,
+    }
+
+
+@router.get("/batches/{batch_id}/status")
+async def get_batch_status(batch_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Status de um lote de ingestão em massa, com o status e o progresso de cada arquivo."""
+    lote = await db.get(IngestionBatch, batch_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail=f"Lote {batch_id} não encontrado.")
+
+    linhas = (await db.execute(
+        select(Document.id, Document.file_name, Document.status, IngestionJob)
+        .join(IngestionJob, IngestionJob.document_id == Document.id)
+        .where(IngestionJob.batch_id == batch_id)
+        .order_by(Document.file_name)
+    )).all()
+
+    contagem = {}
+    for linha in linhas:
+        contagem[linha.status] = contagem.get(linha.status, 0) + 1
+
+    return {
+        "batch_id": lote.id,
+        "source": lote.source,
+        "status": lote.status,
+        "total_files": lote.total_files,
+        "counts": contagem,
+        "skipped": lote.skipped,
+        "files": [
+            {
+                "document_id": linha.id,
+                "filename": linha.file_name,
+                "status": linha.status,
+                "attempts": linha.IngestionJob.attempts,
+                "progress": linha.IngestionJob.progress,
+                "total": linha.IngestionJob.total,
+                "last_error": linha.IngestionJob.last_error,
+            }
+            for linha in linhas
+        ],
+    }
+
+
+@router.get("/embedding-cache/stats")
+def get_embedding_cache_stats():
+    """
+    Tamanho do cache de embeddings e acertos/falhas com a economia estimada de tempo. Os
+    acertos da fila de ingestão num processo próprio só entram aqui com o mesmo
+    PROMETHEUS_MULTIPROC_DIR na API e nos workers (também estão em /metrics).
+    """
+    return embedding_cache.stats()
+
+
+@router.get("/{document_id}/status")
+async def get_document_status(document_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Retorna o status de ingestão de um documento e o progresso do job (chunks processados)."""
+    document = await db.get(Document, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail=f"Documento {document_id} não encontrado.")
+
+    job = (await db.execute(
+        select(IngestionJob)
+        .where(IngestionJob.document_id == document_id)
+        .order_by(IngestionJob.id.desc())
+        .limit(1)
+    )).scalar_one_or_none()
+
+    return {
+        "document_id": document.id,
+        "filename": document.file_name,
+        "status": document.status,
+        "version": document.version,
+        "chunk_diff": document.chunk_diff,
+        "previous_versions": document.previous_versions,
+        "job": None if job is None else {
+            "job_id": job.id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "progress": job.progress,
+            "total": job.total,
+            "last_error": job.last_error,
+            "next_attempt_at": job.available_at if job.status == DocumentStatus.PENDING else None,
+        },
+    }
 
 
 @router.get("/", response_model=List[str])
-def get_all_documents(db: Session = Depends(get_db)):
+async def get_all_documents(db: AsyncSession = Depends(get_async_db)):
     """
     Retorna uma lista com os nomes de todos os documentos que foram
     processados com sucesso (status COMPLETED).
     """
     # Agora a consulta é muito mais simples, rápida e na tabela correta
-    documents = db.execute(
+    documents = (await db.execute(
         select(Document.file_name)
         .where(Document.status == DocumentStatus.COMPLETED)
         .order_by(Document.file_name)
-    ).scalars().all()
+    )).scalars().all()
     
     return documents
\ No newline at end of file
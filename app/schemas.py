@@ -1,6 +1,8 @@
 import datetime
-from sqlalchemy import Column, String, DateTime, Integer, Enum
+from sqlalchemy import Column, String, DateTime, Integer, Enum, Text, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.ext.declarative import declarative_base
+from pgvector.sqlalchemy import Vector
 import enum
 
 Base = declarative_base()
@@ -19,4 +21,141 @@ class Document(Base):
     file_name = Column(String, unique=True, index=True, nullable=False)
     s3_url = Column(String, nullable=False)
     status = Column(Enum(DocumentStatus), nullable=False, default=DocumentStatus.PENDING)
-    uploaded_at = Column(DateTime, default=datetime.datetime.utcnow)
\ No newline at end of file
+    uploaded_at = Column(DateTime, default=datetime.datetime.utcnow)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 do arquivo enviado
+    size_bytes = Column(Integer, nullable=True)
+    # Versões: um reenvio com ?new_version=true substitui o arquivo mantendo o file_name e
+    # só reprocessa os chunks que mudaram (ver update_embeddings em app/ia/agents/agent_embedding.py)
+    version = Column(Integer, nullable=False, default=1)
+    previous_versions = Column(JSONB, nullable=False, default=list)  # [{"version", "content_hash", "s3_url", ...}]
+    chunk_diff = Column(JSONB, nullable=True)  # chunks mantidos/inseridos/removidos em relação à versão anterior
+
+
+class IngestionBatch(Base):
+    """
+    Lote de ingestão em massa (ZIP ou diretório): os jobs do lote são processados juntos
+    pelo pipeline de app/workers/ingestao_lote.py, reservado como um job (locked_at).
+    """
+    __tablename__ = "ingestion_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, nullable=False)  # nome do ZIP ou caminho do diretório
+    status = Column(Enum(DocumentStatus), nullable=False, default=DocumentStatus.PENDING)
+    total_files = Column(Integer, nullable=False, default=0)
+    skipped = Column(JSONB, nullable=False, default=list)  # [{"file_name", "motivo"}] não registrados
+    available_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_ingestion_batches_fila", "status", "available_at"),
+    )
+
+
+class IngestionJob(Base):
+    """Fila de ingestão (leitura do PDF + embeddings) consumida pelos workers em app/workers/ingestao.py."""
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Jobs de um lote são processados pelo pipeline do lote, não pela fila de um em um
+    batch_id = Column(Integer, ForeignKey("ingestion_batches.id", ondelete="CASCADE"), nullable=True, index=True)
+    s3_key = Column(String, nullable=False)
+    status = Column(Enum(DocumentStatus), nullable=False, default=DocumentStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    progress = Column(Integer, nullable=False, default=0)  # chunks já gravados no banco de vetores
+    total = Column(Integer, nullable=True)  # total de chunks (conhecido após a leitura do PDF)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    # Gerado a cada reserva: um worker cujo job foi retomado por outro não grava mais nada nele
+    claim_token = Column(String(36), nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_ingestion_jobs_fila", "status", "available_at"),
+    )
+
+
+class EmbeddingCache(Base):
+    """Embeddings já calculados, por hash do texto normalizado e modelo (ver app/ia/embedding_cache.py)."""
+    __tablename__ = "embedding_cache"
+
+    text_hash = Column(String(64), primary_key=True)
+    model = Column(String, primary_key=True)
+    embedding = Column(Vector(), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+
+class AnalysisResult(Base):
+    """
+    Resultado de /analysis/{file_name} (regras + insights), por conteúdo do documento e
+    versão das regras, do modelo e do prompt (ver app/ia/analysis_cache.py).
+    """
+    __tablename__ = "analysis_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)
+    rules_version = Column(String(64), nullable=False)
+    model = Column(String, nullable=False)
+    prompt_version = Column(String(64), nullable=False)
+    file_name = Column(String, nullable=True)  # documento que originou o resultado (informativo)
+    result = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("content_hash", "rules_version", "model", "prompt_version", name="uq_analysis_results_chave"),
+    )
+
+
+class ChatMessage(Base):
+    """Um turno do chat (pergunta + resposta). O histórico é lido por chat_id, em ordem de criação."""
+    __tablename__ = "chat_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(String, nullable=False)
+    user_message = Column(Text, nullable=False)
+    ai_message = Column(Text, nullable=False)
+    tokens = Column(Integer, nullable=False, default=0)  # estimativa de tokens do turno
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_chat_messages_chat_id_created_at", "chat_id", "created_at"),
+    )
+
+
+class ChatSummary(Base):
+    """Resumo dos turnos antigos de um chat, até a mensagem last_message_id (ver app/ia/chat_history.py)."""
+    __tablename__ = "chat_summaries"
+
+    chat_id = Column(String, primary_key=True)
+    summary = Column(Text, nullable=False)
+    last_message_id = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+
+class ChatAnswerCache(Base):
+    """
+    Respostas do chat reaproveitadas para perguntas semanticamente próximas sobre o mesmo
+    conjunto de documentos (ver app/ia/chat_cache.py). file_names vazio = coleção inteira.
+    """
+    __tablename__ = "chat_answer_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope_hash = Column(String(64), nullable=False)  # hash dos file_names ordenados
+    file_names = Column(ARRAY(String), nullable=False, default=list)
+    prompt_version = Column(String(64), nullable=False)
+    question = Column(Text, nullable=False)
+    embedding = Column(Vector(), nullable=False)
+    answer = Column(Text, nullable=False)
+    sources = Column(JSONB, nullable=False, default=list)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_chat_answer_cache_escopo", "scope_hash", "prompt_version"),
+        # Invalidação por documento (file_name = ANY(file_names))
+        Index("ix_chat_answer_cache_file_names", "file_names", postgresql_using="gin"),
+    )
@@ -0,0 +1,25 @@
+"""
+Server-Sent Events (text/event-stream) para as rotas com resposta em streaming.
+
+Cada evento tem um nome e um JSON em `data`, por exemplo:
+
+    event: token
+    data: {"text": "O contrato"}
+
+"""
+import json
+
+from fastapi.responses import StreamingResponse
+
+# Headers que evitam buffering em proxies (nginx) e cache da resposta
+_HEADERS_SSE = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def evento_sse(evento: str, dados) -> str:
+    """Formata um evento SSE; `dados` é serializado em JSON (uma linha só)."""
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False, default=str)}\n\n"
+
+
+def resposta_sse(eventos) -> StreamingResponse:
+    """StreamingResponse de um gerador (assíncrono) de eventos já formatados com evento_sse."""
+    return StreamingResponse(eventos, media_type="text/event-stream", headers=_HEADERS_SSE)
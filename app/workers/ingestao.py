@@ -0,0 +1,377 @@
+"""
+Fila de ingestão de documentos com Postgres (SELECT ... FOR UPDATE SKIP LOCKED).
+
+O endpoint /documents/upload só grava o arquivo no S3 e enfileira um IngestionJob;
+os workers daqui fazem a parte demorada (leitura do PDF e embeddings) e levam o
+Document de PENDING para PROCESSING e depois COMPLETED ou FAILED. Numa nova versão de
+um documento (version > 1) a ingestão é incremental: só os chunks alterados são refeitos.
+
+Os workers sobem junto com a API (INGESTAO_WORKERS > 0) ou em um processo próprio:
+    python -m app.workers.ingestao
+
+Jobs de um lote (ZIP ou diretório) ficam de fora da fila de um em um: os workers reservam
+o lote inteiro e o processam no pipeline de app/workers/ingestao_lote.py.
+"""
+import datetime
+import logging
+import os
+import threading
+import uuid
+from typing import List, Optional
+
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import Session
+
+from app.ia.agents.agent_embedding import create_embeddings, update_embeddings
+from app.ia.analysis_cache import invalidar_analises
+from app.ia.chat_cache import invalidar_respostas
+from app.ia.utils import (
+    download_file, iter_pdf_documents, delete_document_chunks, delete_pending_chunks, invalidate_text_cache,
+)
+from app.observability import configurar_logs, contexto_trace, medir_etapa
+from app.schemas import Document, DocumentStatus, IngestionJob
+from config import (
+    INGESTAO_WORKERS, INGESTAO_MAX_TENTATIVAS, INGESTAO_INTERVALO_SEGUNDOS,
+    INGESTAO_BACKOFF_SEGUNDOS, INGESTAO_TIMEOUT_MINUTOS,
+)
+from database import SessionLocal
+
+TMP_DIR = "/tmp/audit_ia_ingestao"
+
+logger = logging.getLogger(__name__)
+
+
+class ReservaPerdidaError(Exception):
+    """O job foi retomado por outro worker (a reserva expirou): quem o processava para sem gravar o resultado."""
+
+
+def enqueue_ingestion(db: Session, document: Document, s3_key: str, batch_id: Optional[int] = None) -> IngestionJob:
+    """Cria o job de ingestão de um documento (o commit fica a cargo de quem chama)."""
+    job = IngestionJob(
+        document_id=document.id,
+        batch_id=batch_id,
+        s3_key=s3_key,
+        status=DocumentStatus.PENDING,
+        max_attempts=INGESTAO_MAX_TENTATIVAS,
+    )
+    db.add(job)
+    return job
+
+
+def _agora() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def claim_next_job(batch_id: Optional[int] = None) -> Optional[int]:
+    """
+    Reserva o próximo job disponível (fora de lotes) e o marca como PROCESSING.
+    Jobs travados em PROCESSING além de INGESTAO_TIMEOUT_MINUTOS (worker que caiu) também são
+    retomados enquanto tiverem tentativas; os que já as esgotaram viram FAILED
+    (encerrar_jobs_abandonados), para um PDF que derruba o worker não ser reprocessado para sempre.
+
+    Com batch_id, reserva o próximo job PENDING do lote (usado pelo pipeline do lote, que já
+    tem a reserva do lote inteiro).
+
+    Cada reserva grava um claim_token novo. atualizar_progresso, concluir_job e registrar_falha
+    conferem o token: um worker lento cujo job foi retomado (ex: preso no backoff do Gemini)
+    recebe ReservaPerdidaError no próximo lote de chunks e para, sem concluir o job nem apagar
+    os chunks que o novo worker está gravando.
+    """
+    agora = _agora()
+    limite_travado = agora - datetime.timedelta(minutes=INGESTAO_TIMEOUT_MINUTOS)
+
+    if batch_id is None:
+        encerrar_jobs_abandonados(limite_travado)
+        filtro = and_(
+            IngestionJob.batch_id.is_(None),
+            or_(
+                and_(IngestionJob.status == DocumentStatus.PENDING, IngestionJob.available_at <= agora),
+                and_(
+                    IngestionJob.status == DocumentStatus.PROCESSING,
+                    IngestionJob.locked_at < limite_travado,
+                    IngestionJob.attempts < IngestionJob.max_attempts,
+                ),
+            ),
+        )
+    else:
+        filtro = and_(
+            IngestionJob.batch_id == batch_id,
+            IngestionJob.status == DocumentStatus.PENDING,
+            IngestionJob.available_at <= agora,
+            IngestionJob.attempts < IngestionJob.max_attempts,
+        )
+
+    with SessionLocal() as db:
+        job = db.execute(
+            select(IngestionJob)
+            .where(filtro)
+            .order_by(IngestionJob.available_at, IngestionJob.id)
+            .with_for_update(skip_locked=True)
+            .limit(1)
+        ).scalar_one_or_none()
+
+        if job is None:
+            return None
+
+        job.status = DocumentStatus.PROCESSING
+        job.locked_at = agora
+        job.claim_token = str(uuid.uuid4())
+        job.attempts += 1
+        job.progress = 0
+
+        document = db.get(Document, job.document_id)
+        if document:
+            document.status = DocumentStatus.PROCESSING
+
+        db.commit()
+        return job.id
+
+
+def encerrar_jobs_abandonados(limite_travado: datetime.datetime):
+    """
+    Marca como FAILED (job e documento) os jobs fora de lotes travados em PROCESSING desde
+    antes de limite_travado que já usaram todas as tentativas, e apaga os chunks que eles deixaram.
+    """
+    falhas = []
+    with SessionLocal() as db:
+        jobs = db.execute(
+            select(IngestionJob)
+            .where(
+                IngestionJob.batch_id.is_(None),
+                IngestionJob.status == DocumentStatus.PROCESSING,
+                IngestionJob.locked_at < limite_travado,
+                IngestionJob.attempts >= IngestionJob.max_attempts,
+            )
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        for job in jobs:
+            job.status = DocumentStatus.FAILED
+            job.locked_at = job.claim_token = None
+            job.last_error = "O processamento foi interrompido (o worker caiu ou travou) e as tentativas acabaram."
+            document = db.get(Document, job.document_id)
+            if document:
+                document.status = DocumentStatus.FAILED
+                falhas.append((document.file_name, document.version))
+        db.commit()
+
+    for file_name, version in falhas:
+        logger.error("Ingestão de '%s' abandonada: tentativas esgotadas.", file_name)
+        descartar_chunks_da_falha(file_name, version, DocumentStatus.FAILED)
+
+
+def _job_reservado(db: Session, job_id: int, reserva: Optional[str]) -> IngestionJob:
+    """Trava a linha do job e confere se a reserva ainda é de quem chama (claim_token)."""
+    job = db.get(IngestionJob, job_id, with_for_update=True)
+    if job is None or job.claim_token != reserva:
+        raise ReservaPerdidaError(f"O job {job_id} foi retomado por outro worker ou apagado.")
+    return job
+
+
+def atualizar_progresso(job_id: int, reserva: Optional[str], processados: int, total: Optional[int]):
+    """Grava o progresso e renova a reserva; ReservaPerdidaError se o job foi retomado por outro worker."""
+    with SessionLocal() as db:
+        job = _job_reservado(db, job_id, reserva)
+        job.progress = processados
+        job.total = total
+        # Renova a reserva para o job não ser considerado abandonado durante o processamento
+        job.locked_at = _agora()
+        db.commit()
+
+
+def process_job(job_id: int):
+    """Executa um job reservado: baixa o PDF do S3, extrai as páginas e gera os embeddings."""
+    with SessionLocal() as db:
+        job = db.get(IngestionJob, job_id)
+        document = db.get(Document, job.document_id) if job else None
+        if document is None:
+            # Documento (e com ele o job) apagado depois da reserva
+            logger.warning("Job %s ignorado: o job ou o documento não existe mais.", job_id)
+            return
+        file_name = document.file_name
+        version = document.version
+        s3_key = job.s3_key
+        reserva = job.claim_token
+
+    temp_path = None
+    try:
+        os.makedirs(TMP_DIR, exist_ok=True)
+        temp_path = os.path.join(TMP_DIR, f"{uuid.uuid4()}_{os.path.basename(s3_key)}")
+        download_file(s3_key, temp_path)
+
+        def on_progress(processados, total):
+            atualizar_progresso(job_id, reserva, processados, total)
+
+        chunk_diff = None
+        if version > 1:
+            # Nova versão: só os chunks que mudaram ganham embeddings; os da versão anterior
+            # continuam respondendo ao chat até a troca
+            chunk_diff = update_embeddings(iter_pdf_documents(temp_path), file_name, version, on_progress)
+            total_chunks = chunk_diff["total"]
+            if not total_chunks:
+                # Versão sem texto: os chunks da anterior já saíram das buscas; o que foi
+                # respondido ou analisado com eles sai também, e o documento fica FAILED abaixo
+                invalidate_text_cache(file_name)
+                invalidar_respostas(file_name)
+                invalidar_analises(file_name)
+        else:
+            preparar_ingestao(file_name)
+            # As páginas são extraídas em paralelo e os embeddings começam antes do fim da leitura
+            total_chunks = create_embeddings(
+                pdf_pages=iter_pdf_documents(temp_path),
+                file_name=file_name,
+                on_progress=on_progress,
+            )
+        if not total_chunks:
+            raise ValueError("Não foi possível extrair texto do PDF.")
+        concluir_job(job_id, reserva, file_name, chunk_diff)
+
+    except ReservaPerdidaError as e:
+        # O job é de outro worker agora: o resultado (ou a falha) desta tentativa é descartado
+        logger.warning("Ingestão de '%s' interrompida: %s", file_name, e)
+    except Exception as e:
+        logger.exception("Erro na ingestão de '%s' (job %s): %s", file_name, job_id, e)
+        registrar_falha(job_id, reserva, str(e))
+
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def preparar_ingestao(file_name: str):
+    """
+    Antes de (re)ingerir: remove os chunks de uma tentativa anterior e as respostas do
+    chat e as análises que os usaram.
+    """
+    delete_document_chunks(file_name)
+    invalidar_respostas(file_name)
+    invalidar_analises(file_name)
+
+
+def concluir_job(job_id: int, reserva: Optional[str], file_name: str, chunk_diff: Optional[dict] = None):
+    """
+    Marca o job e o documento como COMPLETED e descarta os caches do documento.
+    chunk_diff: resumo da comparação com a versão anterior (só em novas versões).
+    ReservaPerdidaError se o job foi retomado por outro worker.
+    """
+    with SessionLocal() as db:
+        job = _job_reservado(db, job_id, reserva)
+        invalidate_text_cache(file_name)
+        # Descarta o que foi respondido ou analisado com o documento pela metade, durante a ingestão
+        invalidar_respostas(file_name)
+        invalidar_analises(file_name)
+
+        job.status = DocumentStatus.COMPLETED
+        job.locked_at = job.claim_token = None
+        job.last_error = None
+        document = db.get(Document, job.document_id)
+        document.status = DocumentStatus.COMPLETED
+        if chunk_diff is not None:
+            document.chunk_diff = chunk_diff
+        db.commit()
+    logger.info("Ingestão de '%s' concluída (job %s).", file_name, job_id)
+
+
+def registrar_falha(job_id: int, reserva: Optional[str], erro: str):
+    """
+    Reagenda o job com backoff exponencial ou marca como FAILED quando acabarem as tentativas.
+
+    Os lotes de chunks são gravados à medida que ficam prontos: os que a tentativa deixou
+    na coleção são apagados para não aparecerem no chat com o documento pela metade (uma
+    nova tentativa recomeça do zero de qualquer forma). Se o job foi retomado por outro
+    worker, nada é alterado: os chunks agora são os dele.
+    """
+    with SessionLocal() as db:
+        try:
+            job = _job_reservado(db, job_id, reserva)
+        except ReservaPerdidaError as e:
+            logger.warning("Falha do job %s não registrada (%s): %s", job_id, e, erro)
+            return
+        document = db.get(Document, job.document_id)
+        file_name, version = document.file_name, document.version
+        job.last_error = erro
+        job.locked_at = job.claim_token = None
+
+        if job.attempts < job.max_attempts:
+            espera = INGESTAO_BACKOFF_SEGUNDOS * (2 ** (job.attempts - 1))
+            job.status = DocumentStatus.PENDING
+            job.available_at = _agora() + datetime.timedelta(seconds=espera)
+            document.status = DocumentStatus.PENDING
+        else:
+            job.status = DocumentStatus.FAILED
+            document.status = DocumentStatus.FAILED
+        status_final = job.status
+        db.commit()
+
+    descartar_chunks_da_falha(file_name, version, status_final)
+
+
+def descartar_chunks_da_falha(file_name: str, version: int, status: DocumentStatus):
+    """Apaga os chunks que uma tentativa interrompida deixou na coleção (status: o do job depois da falha)."""
+    # Numa nova versão (ingestão incremental) os chunks vigentes são os da versão anterior:
+    # os pendentes ficam para a próxima tentativa e só são apagados quando ela não vier
+    if version == 1:
+        delete_document_chunks(file_name)
+    elif status == DocumentStatus.FAILED:
+        delete_pending_chunks(file_name)
+
+
+class IngestionWorkerPool:
+    """Conjunto de threads que consomem a fila de ingestão."""
+
+    def __init__(self, concurrency: int = INGESTAO_WORKERS, poll_interval: float = INGESTAO_INTERVALO_SEGUNDOS):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        self._stop.clear()
+        for indice in range(self.concurrency):
+            thread = threading.Thread(target=self._loop, name=f"ingestao-{indice}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Fila de ingestão iniciada com %d worker(s).", self.concurrency)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _loop(self):
+        # Importado aqui: ingestao_lote depende deste módulo
+        from app.workers.ingestao_lote import claim_next_batch, processar_lote
+
+        while not self._stop.is_set():
+            try:
+                job_id = claim_next_job()
+                lote_id = None if job_id is not None else claim_next_batch()
+            except Exception as e:
+                logger.exception("Erro ao consultar a fila de ingestão: %s", e)
+                job_id = lote_id = None
+
+            if job_id is None and lote_id is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                if job_id is not None:
+                    # Os logs do job levam o id dele no lugar do trace id de uma requisição
+                    with contexto_trace(f"job-{job_id}"), medir_etapa("ingestao"):
+                        process_job(job_id)
+                else:
+                    with contexto_trace(f"lote-{lote_id}"):
+                        processar_lote(lote_id)
+            except Exception as e:
+                # Sem isso a thread morreria em silêncio e a fila ficaria com menos workers; o job
+                # que ficou em PROCESSING é retomado depois de INGESTAO_TIMEOUT_MINUTOS
+                logger.exception("Erro na ingestão (job %s, lote %s): %s", job_id, lote_id, e)
+
+
+if __name__ == "__main__":
+    configurar_logs()
+    pool = IngestionWorkerPool(concurrency=max(INGESTAO_WORKERS, 1))
+    pool.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,603 @@
+"""
+Ingestão em massa: um ZIP (POST /documents/upload-zip) ou um diretório local
+(`python manage.py ingest <diretório>`) vira um lote (IngestionBatch) com um Document e
+um IngestionJob por PDF, e o lote é processado por um pipeline de etapas concorrentes:
+
+    leitura (LOTE_LEITORES arquivos por vez; as páginas são extraídas no pool de processos)
+      -> chunking -> embeddings (EMBEDDING_CONCORRENCIA lotes) -> gravação no PGVector
+
+As etapas são threads ligadas por filas limitadas: quando uma etapa atrasa, as anteriores
+bloqueiam no put, o que limita a memória a LOTE_FILA_PAGINAS páginas e a alguns lotes de
+chunks, qualquer que seja o tamanho do lote. Os lotes de embeddings misturam chunks de
+arquivos diferentes, para as chamadas ao Gemini irem cheias.
+
+Cada arquivo tem seu status no Document/IngestionJob, como no upload avulso. O lote é
+reservado como um job (locked_at renovado durante o processamento): se o processo cair,
+um worker da fila o retoma depois de INGESTAO_TIMEOUT_MINUTOS, pulando os arquivos já
+concluídos e reingerindo do zero os que estavam pela metade (os que já esgotaram as
+tentativas viram FAILED, para um arquivo que derruba o processo não prender o lote).
+Um erro num arquivo só derruba aquele arquivo; um erro inesperado numa etapa aborta o
+pipeline (as demais saem das filas) e os arquivos em andamento são registrados como falha.
+"""
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import BinaryIO, Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.ia.agents.agent_embedding import embed_batch, split_pages
+from app.ia.utils import (
+    UploadTooLargeError, download_file, get_pg_vector, get_s3, iter_pdf_documents, stream_upload,
+)
+from app.observability import medir_etapa
+from app.schemas import Document, DocumentStatus, IngestionBatch, IngestionJob
+from app.workers.ingestao import (
+    TMP_DIR, atualizar_progresso, claim_next_job, concluir_job, descartar_chunks_da_falha, enqueue_ingestion,
+    preparar_ingestao, registrar_falha,
+)
+from config import (
+    AWS_S3_BUCKET, EMBEDDING_BATCH_SIZE, EMBEDDING_CONCORRENCIA, INGESTAO_TIMEOUT_MINUTOS, LOTE_FILA_PAGINAS, LOTE_LEITORES,
+    LOTE_UPLOAD_CONCORRENCIA, UPLOAD_MAX_BYTES,
+)
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo (segundos) entre as renovações da reserva do lote
+_RENOVACAO_SEGUNDOS = 30
+# Intervalo (segundos) em que as etapas bloqueadas numa fila verificam se o pipeline foi abortado
+_ESPERA_FILA_SEGUNDOS = 1
+
+
+def _agora() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+# --- Registro dos arquivos -------------------------------------------------------------
+
+def criar_lote(source: str) -> int:
+    """
+    Cria o lote. Ele só fica disponível para os workers quando o registro dos arquivos
+    termina (finalizar_registro); se o registro for interrompido, o lote é liberado com os
+    arquivos registrados até ali depois de INGESTAO_TIMEOUT_MINUTOS.
+    """
+    with SessionLocal() as db:
+        lote = IngestionBatch(
+            source=source,
+            status=DocumentStatus.PENDING,
+            available_at=_agora() + datetime.timedelta(minutes=INGESTAO_TIMEOUT_MINUTOS),
+        )
+        db.add(lote)
+        db.commit()
+        return lote.id
+
+
+def registrar_arquivo(lote_id: int, file_name: str, fileobj: BinaryIO) -> dict:
+    """
+    Envia um PDF ao S3 e cria o Document e o job dele no lote. Nomes já existentes na base
+    são ignorados (como o 409 de /documents/upload). Retorna {"file_name", "status", ...}.
+    """
+    with SessionLocal() as db:
+        if db.execute(select(Document.id).where(Document.file_name == file_name)).first():
+            return {"file_name": file_name, "status": "ignorado", "motivo": "Documento já existe."}
+
+    s3_key = f"documents/{uuid.uuid4()}_{file_name}"
+    upload = stream_upload(fileobj, s3_key=s3_key)
+    with SessionLocal() as db:
+        document = Document(
+            file_name=file_name,
+            s3_url=upload["s3_url"],
+            status=DocumentStatus.PENDING,
+            content_hash=upload["sha256"],
+            size_bytes=upload["size"],
+        )
+        db.add(document)
+        try:
+            db.flush()
+            job = enqueue_ingestion(db, document, s3_key, batch_id=lote_id)
+            db.commit()
+        except IntegrityError:
+            # Outro upload com o mesmo nome chegou antes (ex: duas pastas do ZIP com o mesmo arquivo)
+            db.rollback()
+            get_s3().delete_object(Bucket=AWS_S3_BUCKET, Key=s3_key)
+            return {"file_name": file_name, "status": "ignorado", "motivo": "Documento já existe."}
+        return {"file_name": file_name, "status": "registrado", "document_id": document.id, "job_id": job.id}
+
+
+def _registrar_todos(
+    lote_id: int, arquivos: Iterable[Tuple[str, Callable[[], BinaryIO]]], ignorados: Optional[List[dict]] = None
+) -> dict:
+    """Registra (file_name, abrir) em paralelo, com até LOTE_UPLOAD_CONCORRENCIA envios ao S3 por vez."""
+    def registrar(file_name: str, abrir: Callable[[], BinaryIO]) -> dict:
+        try:
+            with abrir() as fileobj:
+                return registrar_arquivo(lote_id, file_name, fileobj)
+        except UploadTooLargeError as e:
+            return {"file_name": file_name, "status": "ignorado", "motivo": str(e)}
+        except Exception as e:
+            logger.exception("Erro ao registrar '%s' no lote %s: %s", file_name, lote_id, e)
+            return {"file_name": file_name, "status": "ignorado", "motivo": f"Erro no envio: {e}"}
+
+    with ThreadPoolExecutor(max_workers=max(1, LOTE_UPLOAD_CONCORRENCIA), thread_name_prefix="lote-upload") as executor:
+        resultados = list(executor.map(lambda item: registrar(*item), arquivos))
+    return finalizar_registro(lote_id, list(ignorados or []) + resultados)
+
+
+def finalizar_registro(lote_id: int, resultados: List[dict]) -> dict:
+    """Grava o total e os arquivos ignorados e libera o lote para processamento."""
+    registrados = sum(1 for resultado in resultados if resultado["status"] == "registrado")
+    ignorados = [
+        {"file_name": resultado["file_name"], "motivo": resultado["motivo"]}
+        for resultado in resultados if resultado["status"] == "ignorado"
+    ]
+    with SessionLocal() as db:
+        lote = db.get(IngestionBatch, lote_id)
+        lote.total_files = registrados
+        lote.skipped = list(lote.skipped or []) + ignorados
+        lote.available_at = _agora()
+        if not registrados and lote.status == DocumentStatus.PENDING:
+            lote.status = DocumentStatus.FAILED if ignorados else DocumentStatus.COMPLETED
+        db.commit()
+    logger.info("Lote %s: %d arquivo(s) registrado(s), %d ignorado(s).", lote_id, registrados, len(ignorados))
+    return {"batch_id": lote_id, "registrados": registrados, "ignorados": ignorados}
+
+
+def _eh_pdf(nome: str) -> bool:
+    base = os.path.basename(nome)
+    return base.lower().endswith(".pdf") and not base.startswith(".")
+
+
+def registrar_zip(lote_id: int, caminho_zip: str) -> dict:
+    """Registra os PDFs de um ZIP (o nome do documento é o do arquivo, sem as pastas) e apaga o ZIP."""
+    try:
+        with zipfile.ZipFile(caminho_zip) as arquivo_zip:
+            entradas, ignorados = [], []
+            for info in arquivo_zip.infolist():
+                if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                    continue
+                nome = os.path.basename(info.filename)
+                if not _eh_pdf(nome):
+                    ignorados.append({"file_name": info.filename, "status": "ignorado", "motivo": "Não é um PDF."})
+                elif info.file_size > UPLOAD_MAX_BYTES:
+                    ignorados.append({
+                        "file_name": nome, "status": "ignorado",
+                        "motivo": f"O arquivo excede o limite de {UPLOAD_MAX_BYTES // (1024 * 1024)} MB.",
+                    })
+                else:
+                    entradas.append((nome, lambda info=info: arquivo_zip.open(info)))
+            return _registrar_todos(lote_id, entradas, ignorados)
+    finally:
+        os.remove(caminho_zip)
+
+
+def registrar_diretorio(lote_id: int, diretorio: str) -> dict:
+    """Registra os PDFs de um diretório local (recursivo, em ordem de nome)."""
+    entradas = []
+    for raiz, pastas, arquivos in os.walk(diretorio):
+        pastas.sort()
+        for nome in sorted(arquivos):
+            if _eh_pdf(nome):
+                caminho = os.path.join(raiz, nome)
+                entradas.append((nome, lambda caminho=caminho: open(caminho, "rb")))
+    return _registrar_todos(lote_id, entradas)
+
+
+# --- Reserva do lote -------------------------------------------------------------------
+
+def _reservar_lote(filtro) -> Optional[int]:
+    agora = _agora()
+    with SessionLocal() as db:
+        lote = db.execute(
+            select(IngestionBatch)
+            .where(filtro)
+            .order_by(IngestionBatch.available_at)
+            .with_for_update(skip_locked=True)
+            .limit(1)
+        ).scalar_one_or_none()
+        if lote is None:
+            return None
+
+        lote.status = DocumentStatus.PROCESSING
+        lote.locked_at = agora
+        # Jobs em PROCESSING são de uma execução anterior que caiu
+        falhas = _devolver_jobs_interrompidos(db, lote.id)
+        db.commit()
+        lote_id = lote.id
+    _descartar_chunks(falhas)
+    return lote_id
+
+
+def _devolver_jobs_interrompidos(db, lote_id: int) -> List[Tuple[str, int]]:
+    """
+    Jobs do lote ainda em PROCESSING (a execução caiu ou não conseguiu registrar o resultado
+    deles) voltam para a fila do lote enquanto houver tentativas; os demais viram FAILED, para
+    um arquivo que derruba o processo não prender o lote para sempre. Retorna (file_name,
+    version) dos documentos que falharam, para os chunks serem apagados depois do commit.
+    """
+    falhas = []
+    for job in db.execute(
+        select(IngestionJob).where(IngestionJob.batch_id == lote_id, IngestionJob.status == DocumentStatus.PROCESSING)
+    ).scalars():
+        job.status = DocumentStatus.PENDING if job.attempts < job.max_attempts else DocumentStatus.FAILED
+        job.available_at = _agora()
+        # Sem o claim_token, o que sobrou da execução anterior não grava mais nada nestes jobs
+        job.locked_at = job.claim_token = None
+        document = db.get(Document, job.document_id)
+        document.status = job.status
+        if job.status == DocumentStatus.FAILED:
+            job.last_error = "O processamento foi interrompido e as tentativas acabaram."
+            falhas.append((document.file_name, document.version))
+    db.flush()
+    return falhas
+
+
+def _descartar_chunks(falhas: List[Tuple[str, int]]):
+    for file_name, version in falhas:
+        logger.error("Ingestão de '%s' abandonada: tentativas esgotadas.", file_name)
+        descartar_chunks_da_falha(file_name, version, DocumentStatus.FAILED)
+
+
+def _filtro_disponivel():
+    agora = _agora()
+    limite_travado = agora - datetime.timedelta(minutes=INGESTAO_TIMEOUT_MINUTOS)
+    return or_(
+        and_(IngestionBatch.status == DocumentStatus.PENDING, IngestionBatch.available_at <= agora),
+        and_(IngestionBatch.status == DocumentStatus.PROCESSING, IngestionBatch.locked_at < limite_travado),
+    )
+
+
+def claim_next_batch() -> Optional[int]:
+    """Reserva o próximo lote disponível (ou abandonado por um worker que caiu)."""
+    return _reservar_lote(_filtro_disponivel())
+
+
+def claim_batch(lote_id: int) -> bool:
+    """Reserva um lote específico (CLI); False se ele estiver com outro worker ou não tiver o que processar."""
+    return _reservar_lote(and_(IngestionBatch.id == lote_id, _filtro_disponivel())) is not None
+
+
+def liberar_lote(lote_id: int) -> dict:
+    """
+    Fecha a execução do lote: volta para PENDING se houver arquivos aguardando nova
+    tentativa (disponível quando o primeiro deles estiver); senão COMPLETED, ou FAILED se
+    nenhum arquivo foi ingerido. Retorna a contagem de arquivos por status.
+    """
+    with SessionLocal() as db:
+        lote = db.get(IngestionBatch, lote_id)
+        # Jobs ainda em PROCESSING: a execução não conseguiu registrar o resultado deles (ex: o
+        # banco caiu no meio do pipeline)
+        falhas = _devolver_jobs_interrompidos(db, lote_id)
+
+        contagem = {
+            status.value: quantidade for status, quantidade in db.execute(
+                select(IngestionJob.status, func.count())
+                .where(IngestionJob.batch_id == lote_id)
+                .group_by(IngestionJob.status)
+            ).all()
+        }
+        proxima_tentativa = db.execute(
+            select(func.min(IngestionJob.available_at))
+            .where(IngestionJob.batch_id == lote_id, IngestionJob.status == DocumentStatus.PENDING)
+        ).scalar()
+
+        lote.locked_at = None
+        if proxima_tentativa is not None:
+            lote.status = DocumentStatus.PENDING
+            lote.available_at = proxima_tentativa
+        elif contagem.get(DocumentStatus.COMPLETED.value) or not contagem:
+            lote.status = DocumentStatus.COMPLETED
+        else:
+            lote.status = DocumentStatus.FAILED
+        db.commit()
+        resumo = {"batch_id": lote_id, "status": lote.status.value, "arquivos": contagem}
+    _descartar_chunks(falhas)
+    return resumo
+
+
+# --- Pipeline --------------------------------------------------------------------------
+
+class _Arquivo:
+    """Estado de um arquivo no pipeline, compartilhado entre as etapas."""
+
+    def __init__(self, job_id: int, reserva: Optional[str], file_name: str, s3_key: str):
+        self.job_id = job_id
+        self.reserva = reserva  # claim_token do job
+        self.file_name = file_name
+        self.s3_key = s3_key
+        self.lock = threading.Lock()
+        # Serializa a gravação de chunks do arquivo (_gravar) com a limpeza deles na falha (_falhar)
+        self.gravacao = threading.Lock()
+        self.chunks = 0  # gerados pelo chunking
+        self.gravados = 0  # já gravados no PGVector
+        self.chunking_concluido = False
+        self.finalizado = False
+        self.falhou = False
+
+
+class _PipelineAbortado(Exception):
+    """Uma etapa do pipeline morreu: as demais saem das filas em vez de bloquear para sempre."""
+
+
+class _PipelineLote:
+    """Etapas do lote ligadas por filas limitadas (ver o docstring do módulo)."""
+
+    def __init__(self, lote_id: int):
+        self.lote_id = lote_id
+        self.tamanho_lote = max(1, min(EMBEDDING_BATCH_SIZE, 100))
+        self.leitores = max(1, LOTE_LEITORES)
+        self.embedders = max(1, EMBEDDING_CONCORRENCIA)
+        # Itens: (arquivo, Document da página) ou (arquivo, None) no fim do arquivo; None = fim de um leitor
+        self.paginas: queue.Queue = queue.Queue(maxsize=max(1, LOTE_FILA_PAGINAS))
+        # Itens: [(arquivo, chunk, metadata)]; None = fim
+        self.lotes: queue.Queue = queue.Queue(maxsize=self.embedders * 2)
+        # Itens: ([(arquivo, chunk, metadata)], embeddings); None = fim de um embedder
+        self.gravacao: queue.Queue = queue.Queue(maxsize=self.embedders * 2)
+        self._ultima_renovacao = time.monotonic()
+        self._renovacao_lock = threading.Lock()
+        # Arquivos que entraram no pipeline (para marcar como falha os que ficarem pela metade)
+        self._arquivos: List[_Arquivo] = []
+        self._arquivos_lock = threading.Lock()
+        self._abortado = threading.Event()
+        self._erro: Optional[BaseException] = None
+
+    def executar(self):
+        etapas = [(self._ler, f"lote-leitura-{i}") for i in range(self.leitores)]
+        etapas.append((self._dividir, "lote-chunking"))
+        etapas += [(self._embeddings, f"lote-embedding-{i}") for i in range(self.embedders)]
+        etapas.append((self._gravar, "lote-gravacao"))
+        threads = [threading.Thread(target=self._executar_etapa, args=(etapa,), name=nome) for etapa, nome in etapas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._abortado.is_set():
+            with self._arquivos_lock:
+                pendentes = [arquivo for arquivo in self._arquivos if not arquivo.finalizado]
+            self._falhar(pendentes, self._erro)
+
+    def _executar_etapa(self, etapa: Callable[[], None]):
+        try:
+            etapa()
+        except _PipelineAbortado:
+            pass
+        except Exception as e:
+            logger.exception("Erro na etapa %s do lote %s: %s", threading.current_thread().name, self.lote_id, e)
+            self._erro = e
+            self._abortado.set()
+
+    # As filas são limitadas: sem os timeouts, uma etapa que morreu travaria as anteriores
+    # no put e as seguintes no get
+    def _colocar(self, fila: queue.Queue, item):
+        while not self._abortado.is_set():
+            try:
+                fila.put(item, timeout=_ESPERA_FILA_SEGUNDOS)
+                return
+            except queue.Full:
+                continue
+        raise _PipelineAbortado()
+
+    def _retirar(self, fila: queue.Queue):
+        while not self._abortado.is_set():
+            try:
+                return fila.get(timeout=_ESPERA_FILA_SEGUNDOS)
+            except queue.Empty:
+                continue
+        raise _PipelineAbortado()
+
+    # Etapa 1: reserva os jobs do lote um a um, baixa o PDF e publica as páginas
+    def _ler(self):
+        try:
+            while not self._abortado.is_set():
+                try:
+                    job_id = claim_next_job(batch_id=self.lote_id)
+                except Exception as e:
+                    logger.exception("Erro ao reservar jobs do lote %s: %s", self.lote_id, e)
+                    return
+                if job_id is None:
+                    return
+                self._renovar_lote()
+                self._ler_arquivo(job_id)
+        finally:
+            self._colocar(self.paginas, None)
+
+    def _ler_arquivo(self, job_id: int):
+        try:
+            with SessionLocal() as db:
+                job = db.get(IngestionJob, job_id)
+                arquivo = _Arquivo(job_id, job.claim_token, db.get(Document, job.document_id).file_name, job.s3_key)
+        except Exception as e:
+            # Sem a reserva não há como registrar a falha: o job fica em PROCESSING e
+            # liberar_lote o devolve à fila do lote (ou o marca como FAILED)
+            logger.exception("Erro ao carregar o job %s do lote %s: %s", job_id, self.lote_id, e)
+            return
+        with self._arquivos_lock:
+            self._arquivos.append(arquivo)
+
+        temp_path = None
+        try:
+            os.makedirs(TMP_DIR, exist_ok=True)
+            temp_path = os.path.join(TMP_DIR, f"{uuid.uuid4()}_{os.path.basename(arquivo.s3_key)}")
+            download_file(arquivo.s3_key, temp_path)
+            preparar_ingestao(arquivo.file_name)
+            for pagina in iter_pdf_documents(temp_path):
+                if arquivo.falhou:
+                    break
+                self._colocar(self.paginas, (arquivo, pagina))
+        except _PipelineAbortado:
+            raise
+        except Exception as e:
+            self._falhar([arquivo], e)
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+        self._colocar(self.paginas, (arquivo, None))
+
+    # Etapa 2: divide as páginas em chunks e monta os lotes de embeddings
+    def _dividir(self):
+        buffer: List[Tuple[_Arquivo, str, dict]] = []
+        try:
+            leitores_ativos = self.leitores
+            while leitores_ativos:
+                item = self._retirar(self.paginas)
+                if item is None:
+                    leitores_ativos -= 1
+                    continue
+
+                arquivo, pagina = item
+                if pagina is None:
+                    with arquivo.lock:
+                        arquivo.chunking_concluido = True
+                    # Sem mais páginas na fila, o lote incompleto segue para o arquivo terminar logo
+                    if buffer and self.paginas.empty():
+                        self._colocar(self.lotes, buffer)
+                        buffer = []
+                    self._verificar_conclusao(arquivo)
+                    continue
+                if arquivo.falhou:
+                    continue
+
+                try:
+                    chunks = list(split_pages([pagina], arquivo.file_name))
+                except Exception as e:
+                    self._falhar([arquivo], e)
+                    continue
+                for chunk, metadata in chunks:
+                    with arquivo.lock:
+                        arquivo.chunks += 1
+                    buffer.append((arquivo, chunk, metadata))
+                    if len(buffer) == self.tamanho_lote:
+                        self._colocar(self.lotes, buffer)
+                        buffer = []
+
+            if buffer:
+                self._colocar(self.lotes, buffer)
+        finally:
+            for _ in range(self.embedders):
+                self._colocar(self.lotes, None)
+
+    # Etapa 3: embeddings (cache + Gemini), EMBEDDING_CONCORRENCIA lotes ao mesmo tempo
+    def _embeddings(self):
+        try:
+            while True:
+                itens = self._retirar(self.lotes)
+                if itens is None:
+                    return
+                itens = [item for item in itens if not item[0].falhou]
+                if not itens:
+                    continue
+                try:
+                    embeddings = embed_batch([chunk for _, chunk, _ in itens])
+                except Exception as e:
+                    self._falhar({arquivo for arquivo, _, _ in itens}, e)
+                    continue
+                self._colocar(self.gravacao, (itens, embeddings))
+        finally:
+            self._colocar(self.gravacao, None)
+
+    # Etapa 4: grava no PGVector (um INSERT de várias linhas por lote) e conclui os arquivos
+    def _gravar(self):
+        embedders_ativos = self.embedders
+        while embedders_ativos:
+            item = self._retirar(self.gravacao)
+            if item is None:
+                embedders_ativos -= 1
+                continue
+
+            itens, embeddings = item
+            # A trava de gravação dos arquivos vai da checagem de falhou até o fim do INSERT:
+            # _falhar a toma para apagar os chunks, então ou o INSERT vem antes (e os chunks são
+            # apagados junto) ou o arquivo já aparece como falho e fica de fora
+            erro = None
+            with ExitStack() as travas:
+                for arquivo in sorted({arquivo for arquivo, _, _ in itens}, key=lambda arquivo: arquivo.job_id):
+                    travas.enter_context(arquivo.gravacao)
+                selecionados = [(item, embedding) for item, embedding in zip(itens, embeddings) if not item[0].falhou]
+                arquivos = {arquivo for (arquivo, _, _), _ in selecionados}
+                if selecionados:
+                    try:
+                        with medir_etapa("insercao_vetores"):
+                            get_pg_vector().add_embeddings(
+                                texts=[chunk for (_, chunk, _), _ in selecionados],
+                                embeddings=[embedding for _, embedding in selecionados],
+                                metadatas=[metadata for (_, _, metadata), _ in selecionados],
+                            )
+                    except Exception as e:
+                        erro = e
+            if erro is not None:
+                self._falhar(arquivos, erro)
+            if erro is not None or not selecionados:
+                continue
+
+            for arquivo in arquivos:
+                with arquivo.lock:
+                    arquivo.gravados += sum(1 for (dono, _, _), _ in selecionados if dono is arquivo)
+                    gravados, total = arquivo.gravados, arquivo.chunks if arquivo.chunking_concluido else None
+                try:
+                    atualizar_progresso(arquivo.job_id, arquivo.reserva, gravados, total)
+                    self._verificar_conclusao(arquivo)
+                except Exception as e:
+                    self._falhar([arquivo], e)
+            self._renovar_lote()
+
+    def _verificar_conclusao(self, arquivo: _Arquivo):
+        with arquivo.lock:
+            if arquivo.finalizado or not arquivo.chunking_concluido or arquivo.gravados < arquivo.chunks:
+                return
+            arquivo.finalizado = True
+        try:
+            if not arquivo.chunks:
+                registrar_falha(arquivo.job_id, arquivo.reserva, "Não foi possível extrair texto do PDF.")
+            else:
+                concluir_job(arquivo.job_id, arquivo.reserva, arquivo.file_name)
+        except Exception as e:
+            # O job fica em PROCESSING e liberar_lote o devolve à fila do lote
+            logger.exception("Erro ao concluir '%s' (job %s): %s", arquivo.file_name, arquivo.job_id, e)
+
+    def _falhar(self, arquivos: Iterable[_Arquivo], erro: Optional[BaseException]):
+        for arquivo in arquivos:
+            with arquivo.lock:
+                if arquivo.finalizado:
+                    continue
+                arquivo.finalizado = arquivo.falhou = True
+            logger.error("Erro na ingestão de '%s' (job %s): %s", arquivo.file_name, arquivo.job_id, erro)
+            try:
+                with arquivo.gravacao:
+                    registrar_falha(arquivo.job_id, arquivo.reserva, str(erro))
+            except Exception as e:
+                logger.exception("Erro ao registrar a falha do job %s: %s", arquivo.job_id, e)
+
+    def _renovar_lote(self):
+        """Renova a reserva do lote para ele não ser considerado abandonado."""
+        with self._renovacao_lock:
+            if time.monotonic() - self._ultima_renovacao < _RENOVACAO_SEGUNDOS:
+                return
+            self._ultima_renovacao = time.monotonic()
+        try:
+            with SessionLocal() as db:
+                db.execute(update(IngestionBatch).where(IngestionBatch.id == self.lote_id).values(locked_at=_agora()))
+                db.commit()
+        except Exception as e:
+            # Tenta de novo na próxima renovação; o lote só é retomado depois de INGESTAO_TIMEOUT_MINUTOS
+            logger.warning("Não foi possível renovar a reserva do lote %s: %s", self.lote_id, e)
+
+
+def processar_lote(lote_id: int) -> dict:
+    """Processa os arquivos pendentes de um lote já reservado (claim_next_batch ou claim_batch)."""
+    inicio = time.perf_counter()
+    try:
+        with medir_etapa("ingestao_lote"):
+            _PipelineLote(lote_id).executar()
+    finally:
+        resumo = liberar_lote(lote_id)
+    logger.info("Lote %s processado em %.1fs: %s", lote_id, time.perf_counter() - inicio, resumo["arquivos"])
+    return resumo
@@ -0,0 +1,120 @@
+"""
+Micro-benchmark da classificação de riscos do AgenteRiscoPrazos.
+
+Compara a implementação original (any(palavra in texto_lower ...) por sentença)
+com o matcher compilado em uma única regex, sobre um contrato sintético de 300 páginas.
+
+Uso:
+    python -m benchmarks.bench_classificacao_risco [--paginas 300] [--repeticoes 5] [--regras-extras 0]
+
+--regras-extras acrescenta palavras-chave sintéticas em uma categoria extra, para
+simular o crescimento do conjunto de regras.
+"""
+import argparse
+import random
+import re
+import time
+
+from config import REGRAS_RISCO
+from app.ia.agents.agent_risco_prazos import AgenteRiscoPrazos, MatcherRegrasRisco, dividir_sentencas
+
+FRASES_NEUTRAS = [
+    "As partes acordam com os termos descritos nesta cláusula",
+    "O presente instrumento é firmado em duas vias de igual teor",
+    "A CONTRATADA prestará os serviços conforme o escopo do Anexo I",
+    "Os documentos anexos fazem parte integrante deste contrato",
+    "A comunicação entre as partes será feita por escrito",
+]
+
+
+def gerar_contrato(paginas: int, caracteres_por_pagina: int = 3000, semente: int = 42) -> str:
+    """Gera um texto de contrato com frases neutras e palavras-chave de risco espalhadas."""
+    aleatorio = random.Random(semente)
+    palavras_chave = [palavra for palavras in REGRAS_RISCO.values() for palavra in palavras]
+    paginas_texto = []
+    for _ in range(paginas):
+        frases = []
+        tamanho = 0
+        while tamanho < caracteres_por_pagina:
+            frase = aleatorio.choice(FRASES_NEUTRAS)
+            if aleatorio.random() < 0.3:
+                frase += f" e trata de {aleatorio.choice(palavras_chave)}"
+            frases.append(frase + ".")
+            tamanho += len(frase) + 2
+        paginas_texto.append(" ".join(frases))
+    return "\n".join(paginas_texto)
+
+
+def gerar_regras(regras_extras: int, semente: int = 7):
+    """Copia REGRAS_RISCO e acrescenta uma categoria com palavras-chave sintéticas."""
+    regras = {categoria: list(palavras) for categoria, palavras in REGRAS_RISCO.items()}
+    if regras_extras:
+        aleatorio = random.Random(semente)
+        regras["EXTRA"] = [
+            "".join(aleatorio.choice("abcdefghijlmnoprstuv") for _ in range(aleatorio.randint(6, 12)))
+            for _ in range(regras_extras)
+        ]
+    return regras
+
+
+def classificar_original(texto_contrato: str, regras):
+    """Reprodução da implementação anterior, usada como referência."""
+    resultado = []
+    for sentenca in re.split(r'(?<=[.!?])\s+', texto_contrato):
+        if not sentenca.strip():
+            continue
+        texto_lower = sentenca.lower()
+        for tipo, palavras_chave in regras.items():
+            if any(palavra in texto_lower for palavra in palavras_chave):
+                resultado.append(tipo)
+    return resultado
+
+
+def classificar_compilado(agente: AgenteRiscoPrazos, texto_contrato: str):
+    _, inicios = dividir_sentencas(texto_contrato)
+    resultado = []
+    for categorias in agente._riscos_por_sentenca(texto_contrato, inicios).values():
+        resultado.extend(categorias)
+    return resultado
+
+
+def medir(funcao, repeticoes: int) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, default=300)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--regras-extras", type=int, default=0)
+    args = parser.parse_args()
+
+    texto = gerar_contrato(args.paginas)
+    regras = gerar_regras(args.regras_extras)
+    agente = AgenteRiscoPrazos()
+    agente.regras_risco = regras
+    agente.matcher_risco = MatcherRegrasRisco(regras)
+
+    original = classificar_original(texto, regras)
+    compilado = classificar_compilado(agente, texto)
+    if sorted(original) != sorted(compilado):
+        print("ATENÇÃO: os resultados das duas implementações divergem.")
+
+    tempo_original = medir(lambda: classificar_original(texto, regras), args.repeticoes)
+    tempo_compilado = medir(lambda: classificar_compilado(agente, texto), args.repeticoes)
+
+    total_palavras = sum(len(palavras) for palavras in regras.values())
+    print(f"Contrato sintético: {args.paginas} páginas, {len(texto):,} caracteres, {len(original)} alertas")
+    print(f"Regras: {len(regras)} categorias, {total_palavras} palavras-chave")
+    print(f"Original (any por sentença): {tempo_original * 1000:8.1f} ms")
+    print(f"Matcher compilado:           {tempo_compilado * 1000:8.1f} ms")
+    print(f"Ganho: {tempo_original / tempo_compilado:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark do custo por requisição de montar os clientes de LLM e as cadeias.
+
+Compara a montagem original (PromptTemplate, stuff chain, retriever, retrieval chain e,
+nos insights, um ChatGoogleGenerativeAI novo a cada análise) com os componentes do
+registro (app/ia/registry.py), construídos uma vez por processo.
+
+Só mede a construção local: nenhuma chamada é feita ao Gemini. Na prática o cliente
+novo também paga o handshake TLS/gRPC na primeira chamada, que não aparece aqui.
+
+Uso:
+    python -m benchmarks.bench_overhead_cadeias [--repeticoes 200]
+"""
+import argparse
+import time
+
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain.prompts import PromptTemplate
+
+from app.ia.agents import agent_conversation, agent_proativo
+from app.ia.models import llm_gemini_flash
+from app.ia.registry import componentes_carregados, limpar_componentes
+from app.ia.utils import get_pg_vector
+
+
+def chat_antes():
+    prompt = PromptTemplate.from_template(agent_conversation.TEMPLATE_CONVERSA)
+    combine_docs_chain = create_stuff_documents_chain(llm_gemini_flash, prompt)
+    retriever = get_pg_vector().as_retriever(search_kwargs={"k": agent_conversation.K_DOCUMENTOS})
+    return create_retrieval_chain(retriever, combine_docs_chain)
+
+
+def chat_depois():
+    # O retriever híbrido é criado por requisição (leva o filtro de arquivos); a cadeia vem do registro
+    return agent_conversation.build_retriever(), agent_conversation._build_answer_chain()
+
+
+def insights_antes():
+    llm = agent_proativo._build_llm_insights.__wrapped__()
+    return PromptTemplate.from_template(agent_proativo.TEMPLATE_INSIGHTS) | llm
+
+
+def insights_depois():
+    return agent_proativo._build_chain()
+
+
+def medir(funcao, repeticoes: int) -> float:
+    """Tempo médio por chamada, em milissegundos."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo por requisição de montar clientes e cadeias.")
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    limpar_componentes()
+    print(f"{'etapa':<12} {'antes (ms)':>11} {'depois (ms)':>12} {'ganho':>8}")
+    for nome, antes, depois in (
+        ("chat", chat_antes, chat_depois),
+        ("insights", insights_antes, insights_depois),
+    ):
+        antes_ms = medir(antes, args.repeticoes)
+        depois_ms = medir(depois, args.repeticoes)
+        print(f"{nome:<12} {antes_ms:>11.3f} {depois_ms:>12.4f} {antes_ms / depois_ms:>7.0f}x")
+
+    print("\nComponentes construídos no processo:")
+    for nome, quantidade in componentes_carregados().items():
+        print(f"  {nome}: {quantidade}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Teste de carga das rotas de chat e análise.
+
+Dispara N requisições com C clientes simultâneos contra uma API em execução e
+reporta vazão (req/s), latências p50/p95/máx e erros. Para comparar antes/depois
+da migração para rotas async, rode o mesmo comando contra as duas versões da API
+aumentando --concorrencia até a latência degradar: com rotas síncronas cada
+chamada ao Gemini/Postgres ocupa uma thread do threadpool do Starlette (40 por
+padrão), e a partir daí as requisições passam a esperar em fila.
+
+Uso:
+    python -m benchmarks.carga_concorrente --rota chat --concorrencia 10,40,80,160 --requisicoes 320
+    python -m benchmarks.carga_concorrente --rota analise --arquivo contrato.pdf --concorrencia 50
+
+Opções:
+    --url           Endereço base da API (padrão http://127.0.0.1:5000)
+    --rota          chat (POST /chat/question) ou analise (POST /analysis/{arquivo})
+    --pergunta      Pergunta enviada ao chat
+    --arquivo       Documento já ingerido, usado pela rota de análise
+    --timeout       Timeout de cada requisição, em segundos
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def montar_requisicao(args, indice: int):
+    """Retorna (método, caminho, corpo JSON) da requisição de número `indice`."""
+    if args.rota == "chat":
+        return "POST", "/chat/question", {"query": args.pergunta, "chat_id": f"carga-{uuid.uuid4().hex[:8]}-{indice}"}
+    return "POST", f"/analysis/{args.arquivo}", None
+
+
+def percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[posicao]
+
+
+async def rodar_rodada(args, concorrencia: int) -> dict:
+    """Executa uma rodada de --requisicoes requisições com `concorrencia` clientes simultâneos."""
+    latencias = []
+    erros = 0
+    fila = asyncio.Queue()
+    for indice in range(args.requisicoes):
+        fila.put_nowait(indice)
+
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limites) as cliente:
+
+        async def trabalhador():
+            nonlocal erros
+            while True:
+                try:
+                    indice = fila.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                metodo, caminho, corpo = montar_requisicao(args, indice)
+                inicio = time.perf_counter()
+                try:
+                    resposta = await cliente.request(metodo, caminho, json=corpo)
+                    if resposta.status_code >= 400:
+                        erros += 1
+                        continue
+                except httpx.HTTPError:
+                    erros += 1
+                    continue
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio_rodada = time.perf_counter()
+        await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+        duracao = time.perf_counter() - inicio_rodada
+
+    return {
+        "concorrencia": concorrencia,
+        "ok": len(latencias),
+        "erros": erros,
+        "vazao": len(latencias) / duracao if duracao else 0.0,
+        "p50": percentil(latencias, 50),
+        "p95": percentil(latencias, 95),
+        "max": max(latencias, default=0.0),
+        "media": statistics.fmean(latencias) if latencias else 0.0,
+    }
+
+
+async def main_async(args):
+    niveis = [int(valor) for valor in args.concorrencia.split(",")]
+    print(f"Alvo: {args.url} | rota: {args.rota} | {args.requisicoes} requisições por rodada")
+    print(f"{'clientes':>9} {'ok':>6} {'erros':>6} {'req/s':>8} {'p50 (s)':>9} {'p95 (s)':>9} {'máx (s)':>9}")
+    for concorrencia in niveis:
+        r = await rodar_rodada(args, concorrencia)
+        print(
+            f"{r['concorrencia']:>9} {r['ok']:>6} {r['erros']:>6} {r['vazao']:>8.2f} "
+            f"{r['p50']:>9.3f} {r['p95']:>9.3f} {r['max']:>9.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga das rotas de chat e análise.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--rota", choices=["chat", "analise"], default="chat")
+    parser.add_argument("--concorrencia", default="10,40,80", help="Níveis de clientes simultâneos, separados por vírgula.")
+    parser.add_argument("--requisicoes", type=int, default=160)
+    parser.add_argument("--pergunta", default="Qual é a multa por rescisão antecipada?")
+    parser.add_argument("--arquivo", default="contrato.pdf")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
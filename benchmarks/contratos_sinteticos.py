@@ -0,0 +1,167 @@
+"""
+Gerador de contratos sintéticos em português, em texto ou PDF, para os benchmarks.
+
+O conteúdo é determinístico pela semente e controlado por três parâmetros:
+- páginas;
+- cláusulas por página (cada cláusula tem título numerado e 2 a 4 parágrafos);
+- prazos por página: frases que o ExtratorPrazos reconhece ("em até 30 dias úteis",
+  "até o dia 15 de março de 2026"), com datas passadas e futuras.
+
+As palavras-chave de REGRAS_RISCO aparecem em ~30% dos parágrafos.
+
+O PDF é gerado sem dependências (texto simples em Helvetica, WinAnsiEncoding), com uma
+página do contrato por página do PDF; o pypdf extrai o texto de volta.
+
+Uso:
+    python -m benchmarks.contratos_sinteticos --paginas 50 --saida /tmp/contrato.pdf
+"""
+import argparse
+import random
+import textwrap
+from datetime import date, timedelta
+from typing import List
+
+from config import REGRAS_RISCO
+
+FRASES_NEUTRAS = [
+    "As partes acordam com os termos descritos nesta cláusula",
+    "O presente instrumento é firmado em duas vias de igual teor",
+    "A CONTRATADA prestará os serviços conforme o escopo do Anexo I",
+    "Os documentos anexos fazem parte integrante deste contrato",
+    "A comunicação entre as partes será feita por escrito",
+    "A CONTRATANTE fornecerá as informações necessárias à execução dos serviços",
+    "Eventuais alterações deste instrumento dependerão de termo aditivo",
+    "A tolerância de qualquer das partes não implicará novação",
+]
+
+TITULOS_CLAUSULAS = [
+    "DO OBJETO", "DO PRAZO", "DO PREÇO E DO PAGAMENTO", "DAS OBRIGAÇÕES DA CONTRATADA",
+    "DAS OBRIGAÇÕES DA CONTRATANTE", "DA CONFIDENCIALIDADE", "DA RESCISÃO", "DAS PENALIDADES",
+    "DA PROTEÇÃO DE DADOS", "DA PROPRIEDADE INTELECTUAL", "DO FORO",
+]
+
+MESES = [
+    "janeiro", "fevereiro", "março", "abril", "maio", "junho",
+    "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
+]
+
+# Layout do PDF (A4, Helvetica 9pt)
+_LARGURA_LINHA = 105
+_LINHAS_POR_PAGINA = 78
+
+
+def _frase_prazo(aleatorio: random.Random, hoje: date) -> str:
+    if aleatorio.random() < 0.5:
+        quantidade = aleatorio.choice([5, 10, 15, 30, 45, 60, 90])
+        tipo = aleatorio.choice(["dias úteis", "dias corridos", "dias", "meses"])
+        return f"A obrigação deverá ser cumprida em até {quantidade} {tipo} contados da notificação."
+    data = hoje + timedelta(days=aleatorio.randint(-120, 365))
+    return f"O pagamento deverá ser realizado até o dia {data.day} de {MESES[data.month - 1]} de {data.year}."
+
+
+def gerar_paginas(
+    paginas: int, clausulas_por_pagina: int = 3, prazos_por_pagina: int = 1, semente: int = 42
+) -> List[str]:
+    """Texto de cada página do contrato."""
+    aleatorio = random.Random(semente)
+    hoje = date.today()
+    palavras_chave = [palavra for palavras in REGRAS_RISCO.values() for palavra in palavras]
+    numero_clausula = 0
+    resultado = []
+    for _ in range(paginas):
+        paragrafos = []
+        for _ in range(clausulas_por_pagina):
+            numero_clausula += 1
+            paragrafos.append(f"CLÁUSULA {numero_clausula} - {aleatorio.choice(TITULOS_CLAUSULAS)}")
+            for _ in range(aleatorio.randint(2, 4)):
+                frases = [aleatorio.choice(FRASES_NEUTRAS) for _ in range(aleatorio.randint(1, 3))]
+                if aleatorio.random() < 0.3:
+                    frases[-1] += f", observadas as disposições sobre {aleatorio.choice(palavras_chave)}"
+                paragrafos.append(". ".join(frases) + ".")
+        for _ in range(prazos_por_pagina):
+            posicao = aleatorio.randint(1, len(paragrafos))
+            paragrafos.insert(posicao, _frase_prazo(aleatorio, hoje))
+        resultado.append("\n".join(paragrafos))
+    return resultado
+
+
+def _linhas_pagina(texto: str) -> List[str]:
+    linhas = []
+    for paragrafo in texto.split("\n"):
+        linhas.extend(textwrap.wrap(paragrafo, _LARGURA_LINHA) or [""])
+    return linhas[:_LINHAS_POR_PAGINA]  # o excedente não cabe na página
+
+
+def _escapar(linha: str) -> bytes:
+    codificada = linha.encode("cp1252", errors="replace")
+    return codificada.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def escrever_pdf(paginas: List[str], caminho: str):
+    """Grava um PDF com uma página por item de `paginas`."""
+    objetos: List[bytes] = []
+
+    def adicionar(conteudo: bytes) -> int:
+        objetos.append(conteudo)
+        return len(objetos)
+
+    catalogo = adicionar(b"")  # preenchido no fim, quando o id das páginas for conhecido
+    raiz_paginas = adicionar(b"")
+    fonte = adicionar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    ids_paginas = []
+    for texto in paginas:
+        fluxo = b"BT /F1 9 Tf 11 TL 40 800 Td " + b" ".join(
+            b"(" + _escapar(linha) + b") Tj T*" for linha in _linhas_pagina(texto)
+        ) + b" ET"
+        conteudo = adicionar(b"<< /Length %d >>\nstream\n" % len(fluxo) + fluxo + b"\nendstream")
+        ids_paginas.append(adicionar(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (raiz_paginas, conteudo, fonte)
+        ))
+
+    objetos[catalogo - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % raiz_paginas
+    objetos[raiz_paginas - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % id_ for id_ in ids_paginas), len(ids_paginas)
+    )
+
+    with open(caminho, "wb") as arquivo:
+        arquivo.write(b"%PDF-1.4\n")
+        deslocamentos = []
+        for numero, conteudo in enumerate(objetos, start=1):
+            deslocamentos.append(arquivo.tell())
+            arquivo.write(b"%d 0 obj\n" % numero + conteudo + b"\nendobj\n")
+        inicio_xref = arquivo.tell()
+        arquivo.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+        for deslocamento in deslocamentos:
+            arquivo.write(b"%010d 00000 n \n" % deslocamento)
+        arquivo.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objetos) + 1, catalogo, inicio_xref)
+        )
+
+
+def gerar_pdf(
+    caminho: str, paginas: int, clausulas_por_pagina: int = 3, prazos_por_pagina: int = 1, semente: int = 42
+) -> List[str]:
+    """Gera o contrato e grava o PDF; retorna o texto das páginas."""
+    texto = gerar_paginas(paginas, clausulas_por_pagina, prazos_por_pagina, semente)
+    escrever_pdf(texto, caminho)
+    return texto
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um contrato sintético em PDF.")
+    parser.add_argument("--paginas", type=int, default=20)
+    parser.add_argument("--clausulas", type=int, default=3, help="Cláusulas por página.")
+    parser.add_argument("--prazos", type=int, default=1, help="Frases com prazo por página.")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default="contrato_sintetico.pdf")
+    args = parser.parse_args()
+
+    gerar_pdf(args.saida, args.paginas, args.clausulas, args.prazos, args.semente)
+    print(f"Contrato de {args.paginas} páginas gravado em {args.saida}.")
+
+
+if __name__ == "__main__":
+    main()
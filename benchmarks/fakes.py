@@ -0,0 +1,173 @@
+"""
+Substitutos locais do Gemini e do S3 para os benchmarks (nenhuma chamada externa).
+
+- LLMFalso: chat model determinístico (a resposta depende só do prompt), com latência
+  configurável por chamada e streaming palavra por palavra.
+- EmbeddingsFalsos: vetores determinísticos (hash do texto), normalizados, com a
+  dimensão de EMBEDDING_DIMENSOES e latência configurável por lote.
+- s3_local(): bucket em memória (moto), com o nome de AWS_S3_BUCKET.
+
+instalar_fakes() troca llm_gemini_flash, llm_gemini_pro, google_embedding e
+ChatGoogleGenerativeAI em todos os módulos de app/ já importados e descarta os
+componentes do registro, para as cadeias serem remontadas com os substitutos.
+"""
+import asyncio
+import contextlib
+import hashlib
+import math
+import random
+import sys
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from config import EMBEDDING_DIMENSOES
+
+_PALAVRAS = (
+    "o contrato prevê multa rescisão prazo pagamento cláusula obrigação partes "
+    "confidencialidade notificação dias úteis reajuste garantia foro vigência"
+).split()
+
+
+def _resposta_para(prompt: str, palavras: int) -> str:
+    aleatorio = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    return " ".join(aleatorio.choice(_PALAVRAS) for _ in range(palavras)).capitalize() + "."
+
+
+class LLMFalso(BaseChatModel):
+    """Chat model determinístico com latência simulada (sleep, sem CPU)."""
+
+    model: str = "llm-falso"
+    latencia: float = 0.5  # segundos por chamada
+    palavras: int = 60  # tamanho da resposta
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-falso"
+
+    def _texto(self, messages: List[BaseMessage]) -> str:
+        return _resposta_para("\n".join(str(mensagem.content) for mensagem in messages), self.palavras)
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latencia)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._texto(messages)))])
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latencia)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._texto(messages)))])
+
+    def _stream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        palavras = self._texto(messages).split(" ")
+        for indice, palavra in enumerate(palavras):
+            time.sleep(self.latencia / len(palavras))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=palavra if indice == 0 else " " + palavra))
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        palavras = self._texto(messages).split(" ")
+        for indice, palavra in enumerate(palavras):
+            await asyncio.sleep(self.latencia / len(palavras))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=palavra if indice == 0 else " " + palavra))
+
+
+class EmbeddingsFalsos(Embeddings):
+    """Embeddings determinísticos: o mesmo texto sempre gera o mesmo vetor unitário."""
+
+    def __init__(self, dimensoes: int = EMBEDDING_DIMENSOES, latencia: float = 0.2, model: str = "embedding-falso"):
+        self.dimensoes = dimensoes
+        self.latencia = latencia  # segundos por lote (uma requisição ao Gemini)
+        self.model = f"{model}-{dimensoes}"
+
+    def _vetor(self, texto: str) -> List[float]:
+        aleatorio = random.Random(hashlib.sha256(texto.encode("utf-8")).digest())
+        vetor = [aleatorio.gauss(0, 1) for _ in range(self.dimensoes)]
+        norma = math.sqrt(sum(valor * valor for valor in vetor)) or 1.0
+        return [valor / norma for valor in vetor]
+
+    def embed_documents(self, texts: List[str], batch_size: int = 100, **kwargs: Any) -> List[List[float]]:
+        lotes = math.ceil(len(texts) / max(batch_size, 1))
+        time.sleep(self.latencia * lotes)
+        return [self._vetor(texto) for texto in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latencia)
+        return self._vetor(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latencia)
+        return [self._vetor(texto) for texto in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latencia)
+        return self._vetor(text)
+
+
+def instalar_fakes(latencia_llm: float = 0.5, latencia_embedding: float = 0.2) -> dict:
+    """
+    Troca os clientes do Gemini pelos substitutos em todos os módulos de app/ já
+    importados (importe app/main antes de chamar). Retorna os substitutos instalados.
+    """
+    import app.ia.agents.agent_embedding  # noqa: F401 (garante que os módulos estejam carregados)
+    import app.ia.agents.agent_conversation  # noqa: F401
+    import app.ia.agents.agent_proativo  # noqa: F401
+    import app.ia.retrieval  # noqa: F401
+    from app.ia import models
+    from app.ia.embedding_cache import CachedEmbedder
+    from app.ia.registry import limpar_componentes
+    from app.observability import metricas_llm
+
+    llm = LLMFalso(latencia=latencia_llm, callbacks=[metricas_llm])
+    embeddings = EmbeddingsFalsos(latencia=latencia_embedding)
+    trocas = {
+        id(models.llm_gemini_flash): llm,
+        id(models.llm_gemini_pro): llm,
+        id(models.google_embedding): embeddings,
+        id(models.ChatGoogleGenerativeAI): lambda **_kwargs: llm,
+    }
+    for nome, modulo in list(sys.modules.items()):
+        if not (nome == "app" or nome.startswith("app.")) or modulo is None:
+            continue
+        for atributo, valor in list(vars(modulo).items()):
+            if id(valor) in trocas:
+                setattr(modulo, atributo, trocas[id(valor)])
+
+    # Cache persistente de embeddings com o nome do modelo falso (não mistura com os do Gemini)
+    app.ia.agents.agent_embedding.embedding_cache = CachedEmbedder(model_name=embeddings.model)
+    limpar_componentes()
+    return {"llm": llm, "embeddings": embeddings}
+
+
+@contextlib.contextmanager
+def s3_local():
+    """Bucket AWS_S3_BUCKET em memória (moto) durante o bloco; get_s3() passa a usá-lo."""
+    from moto import mock_aws
+
+    from app.ia.registry import limpar_componentes
+    from app.ia.utils import get_s3
+    from config import AWS_S3_BUCKET, AWS_S3_REGION
+
+    with mock_aws():
+        get_s3.cache_clear()
+        regiao = AWS_S3_REGION or "us-east-1"
+        configuracao = {} if regiao == "us-east-1" else {"CreateBucketConfiguration": {"LocationConstraint": regiao}}
+        get_s3().create_bucket(Bucket=AWS_S3_BUCKET, **configuracao)
+        try:
+            yield get_s3()
+        finally:
+            limpar_componentes()
@@ -12,6 +12,99 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Arquivo com os feriados usados no cálculo de prazos em dias úteis (formato AAAA-MM-DD;Descrição)
+FERIADOS_ARQUIVO = os.getenv(
+    "FERIADOS_ARQUIVO",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "ia", "dados", "feriados_nacionais.csv"),
+)
+
+# Upload de arquivos: tamanho máximo aceito, tamanho dos blocos lidos e das partes do multipart no S3
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 200 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+S3_PART_BYTES = max(int(os.getenv("S3_PART_BYTES", 8 * 1024 * 1024)), 5 * 1024 * 1024)  # mínimo do S3: 5 MiB
+
+# Limite (em caracteres) do cache em memória de textos completos reconstruídos por documento
+TEXTO_CACHE_MAX_CARACTERES = int(os.getenv("TEXTO_CACHE_MAX_CARACTERES", 50_000_000))
+
+# Fila de ingestão de documentos (app/workers/ingestao.py)
+INGESTAO_WORKERS = int(os.getenv("INGESTAO_WORKERS", 2))  # 0 = não iniciar workers junto com a API
+INGESTAO_MAX_TENTATIVAS = int(os.getenv("INGESTAO_MAX_TENTATIVAS", 3))
+INGESTAO_INTERVALO_SEGUNDOS = float(os.getenv("INGESTAO_INTERVALO_SEGUNDOS", 2))
+INGESTAO_BACKOFF_SEGUNDOS = int(os.getenv("INGESTAO_BACKOFF_SEGUNDOS", 30))
+# Um job em PROCESSING há mais tempo que isso é considerado abandonado (worker caiu) e volta para a fila
+INGESTAO_TIMEOUT_MINUTOS = int(os.getenv("INGESTAO_TIMEOUT_MINUTOS", 30))
+
+# Ingestão em massa (ZIP ou diretório, app/workers/ingestao_lote.py): arquivos lidos ao mesmo
+# tempo, páginas em memória entre a leitura e o chunking, envios simultâneos ao S3 no registro
+# dos arquivos e tamanho máximo do ZIP
+LOTE_LEITORES = int(os.getenv("LOTE_LEITORES", 2))
+LOTE_FILA_PAGINAS = int(os.getenv("LOTE_FILA_PAGINAS", 64))
+LOTE_UPLOAD_CONCORRENCIA = int(os.getenv("LOTE_UPLOAD_CONCORRENCIA", 8))
+LOTE_ZIP_MAX_BYTES = int(os.getenv("LOTE_ZIP_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+
+# Pipeline de embeddings (app/ia/agents/agent_embedding.py)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 100))  # a API do Gemini aceita até 100 textos por lote
+EMBEDDING_CONCORRENCIA = int(os.getenv("EMBEDDING_CONCORRENCIA", 4))  # lotes em paralelo por ingestão
+# Cota de textos enviados ao Gemini por minuto, por processo (divida a cota do projeto entre os workers)
+EMBEDDING_TEXTOS_POR_MINUTO = int(os.getenv("EMBEDDING_TEXTOS_POR_MINUTO", 1500))
+EMBEDDING_MAX_TENTATIVAS = int(os.getenv("EMBEDDING_MAX_TENTATIVAS", 6))
+
+# Páginas de PDF por tarefa na extração paralela de texto (app/ia/pdf.py)
+PDF_PAGINAS_POR_TAREFA = int(os.getenv("PDF_PAGINAS_POR_TAREFA", 25))
+
+# Número de processos do pool de CPU (análise por regras em lote e extração de texto dos PDFs)
+ANALISE_MAX_WORKERS = int(os.getenv("ANALISE_MAX_WORKERS", os.cpu_count() or 2))
+
+# Quantos documentos do lote podem estar carregados/em análise ao mesmo tempo
+ANALISE_LOTE_CONCORRENCIA = int(os.getenv("ANALISE_LOTE_CONCORRENCIA", ANALISE_MAX_WORKERS * 2))
+
+# Tempo máximo (segundos) de cada etapa de /analysis/{file_name}: análise por regras e insights da IA
+ANALISE_TIMEOUT_REGRAS_SEGUNDOS = float(os.getenv("ANALISE_TIMEOUT_REGRAS_SEGUNDOS", 60))
+ANALISE_TIMEOUT_INSIGHTS_SEGUNDOS = float(os.getenv("ANALISE_TIMEOUT_INSIGHTS_SEGUNDOS", 90))
+
+# Insights da IA em contratos longos (app/ia/agents/agent_proativo.py): acima do orçamento de
+# tokens, o contrato é dividido em seções resumidas em paralelo antes do resumo executivo
+INSIGHTS_ORCAMENTO_TOKENS = int(os.getenv("INSIGHTS_ORCAMENTO_TOKENS", 100_000))
+INSIGHTS_TOKENS_POR_SECAO = int(os.getenv("INSIGHTS_TOKENS_POR_SECAO", 20_000))
+INSIGHTS_CONCORRENCIA_SECOES = int(os.getenv("INSIGHTS_CONCORRENCIA_SECOES", 4))
+
+# Histórico do chat enviado ao LLM (app/ia/chat_history.py): últimos N turnos, até o limite de tokens
+CHAT_HISTORICO_TURNOS = int(os.getenv("CHAT_HISTORICO_TURNOS", 10))
+CHAT_HISTORICO_TOKENS = int(os.getenv("CHAT_HISTORICO_TOKENS", 4000))
+# Resume em segundo plano os turnos que saem da janela (uma chamada ao LLM a cada CHAT_RESUMO_A_CADA turnos)
+CHAT_RESUMO_ATIVO = os.getenv("CHAT_RESUMO_ATIVO", "false").lower() in ("1", "true", "sim")
+CHAT_RESUMO_A_CADA = int(os.getenv("CHAT_RESUMO_A_CADA", 5))
+
+# Busca híbrida do chat (app/ia/retrieval.py): candidatos de cada busca (lexical e vetorial)
+# antes da fusão e constante k do Reciprocal Rank Fusion (1 / (k + posição))
+BUSCA_CANDIDATOS = int(os.getenv("BUSCA_CANDIDATOS", 50))
+BUSCA_RRF_K = int(os.getenv("BUSCA_RRF_K", 60))
+# Máximo de trechos ranqueados pela busca lexical por consulta, para os que têm todos os
+# termos da pergunta e para os que têm só alguns (palavras comuns casam com quase tudo)
+BUSCA_LEXICAL_MAX_RANQUEADOS = int(os.getenv("BUSCA_LEXICAL_MAX_RANQUEADOS", 1000))
+
+# Índice HNSW das coleções do PGVector (app/ia/vector_index.py). EMBEDDING_DIMENSOES precisa
+# bater com o modelo de embeddings (gemini-embedding-001: 3072). HNSW_M e HNSW_EF_CONSTRUCTION
+# valem na criação do índice (`python manage.py indexes --recriar` para aplicar mudanças);
+# BUSCA_EF_SEARCH é aplicado por consulta (maior = mais recall, mais latência).
+EMBEDDING_DIMENSOES = int(os.getenv("EMBEDDING_DIMENSOES", 3072))
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 64))
+BUSCA_EF_SEARCH = int(os.getenv("BUSCA_EF_SEARCH", 100))
+
+# Cache do chat (app/ia/chat_cache.py). Nível 1: embeddings das perguntas, em memória, por processo.
+CHAT_EMBEDDING_CACHE_MAX = int(os.getenv("CHAT_EMBEDDING_CACHE_MAX", 10_000))
+CHAT_EMBEDDING_CACHE_TTL_SEGUNDOS = int(os.getenv("CHAT_EMBEDDING_CACHE_TTL_SEGUNDOS", 3600))
+# Nível 2: respostas no Postgres, reaproveitadas quando a distância de cosseno entre a pergunta
+# nova e a em cache for até CHAT_CACHE_DISTANCIA_MAX (0.05 = similaridade >= 0.95)
+CHAT_CACHE_ATIVO = os.getenv("CHAT_CACHE_ATIVO", "true").lower() in ("1", "true", "sim")
+CHAT_CACHE_DISTANCIA_MAX = float(os.getenv("CHAT_CACHE_DISTANCIA_MAX", 0.05))
+CHAT_CACHE_TTL_HORAS = int(os.getenv("CHAT_CACHE_TTL_HORAS", 24))
+
+# Logs da aplicação: nível (DEBUG, INFO, WARNING...) e formato ("texto" ou "json", uma linha por registro)
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO")
+LOG_FORMATO = os.getenv("LOG_FORMATO", "texto")
+
 
 # REGRAS_RISCO é um dicionário que mapeia um TIPO de risco a uma lista de PALAVRAS-CHAVE.
 # O agente irá procurar por essas palavras-chave no texto do contrato para gerar alertas.
@@ -21,7 +114,7 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 # - O VALOR (ex: ["rescisão", "rescindir"]) é a lista de termos que acionam esse alerta.
 #
 # Dicas para melhorar a detecção:
-# - Use palavras em minúsculo e sem acentos para uma correspondência mais ampla.
+# - Maiúsculas e acentos são ignorados na comparação ("rescisao" encontra "Rescisão").
 # - Adicione variações da mesma palavra (ex: "rescindir", "rescisão", "rescindido").
 # - Pense em sinônimos e termos relacionados ao risco.
 # - Você pode adicionar quantas categorias e palavras-chave desejar.
@@ -1,13 +1,26 @@
+import logging
+
 import psycopg2
 from config import DATABASE_URL
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
+logger = logging.getLogger(__name__)
+
 def test_database():
     conn = psycopg2.connect(DATABASE_URL)
-    print("Conexão conclúida: ", conn)
+    logger.info("Conexão concluída: %s", conn)
+
+def to_async_url(url, driver="asyncpg"):
+    """Converte a DATABASE_URL para o driver assíncrono (postgresql+asyncpg ou postgresql+psycopg)."""
+    return make_url(url).set(drivername=f"postgresql+{driver}")
 
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine)
 
-test_database()
\ No newline at end of file
+# Engine e sessões assíncronas (asyncpg) para as rotas async
+async_engine = create_async_engine(to_async_url(DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
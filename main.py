@@ -1,15 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware  # <--- 1. Importar o CORSMiddleware
 
-from app.routers import upload, analysis
-from app.schemas import Base
-from database import engine
+from app.routers import upload, analysis, chat, health, risks
+from app.ia.executor import shutdown_process_pool
+from app.ia.vector_index import averificar_indices_ann
+from app.observability import MiddlewareObservabilidade, configurar_logs
+from app.workers.ingestao import IngestionWorkerPool
+from config import INGESTAO_WORKERS
+
+# As tabelas ("documents", "ingestion_jobs", ...) são criadas/atualizadas por `python manage.py migrate`.
+# Importar este módulo não abre conexões: Postgres, S3 e PGVector são inicializados no primeiro uso.
+
+configurar_logs()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Workers da fila de ingestão (podem rodar à parte com INGESTAO_WORKERS=0 e `python -m app.workers.ingestao`)
+    ingestao = IngestionWorkerPool(concurrency=INGESTAO_WORKERS)
+    if INGESTAO_WORKERS > 0:
+        ingestao.start()
+    # Avisa (sem bloquear a subida) se alguma coleção está sem índice HNSW
+    verificacao_indices = asyncio.create_task(averificar_indices_ann())
+    yield
+    verificacao_indices.cancel()
+    ingestao.stop(timeout=5)
+    # Encerra os processos usados na análise em lote
+    shutdown_process_pool()
 
-# Esta linha é a responsável por criar a tabela "documents"
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Projeto AuditIA - Arquitetura Final")
+app = FastAPI(title="Projeto AuditIA - Arquitetura Final", lifespan=lifespan)
 
 # --- NOVO CÓDIGO PARA CORRIGIR O ERRO DE CORS ---
 
@@ -31,13 +55,28 @@ app.add_middleware(
 )
 # --- FIM DO CÓDIGO DE CORS ---
 
+# Trace id por requisição (header X-Trace-Id) e métricas HTTP; adicionado por último para
+# ficar por fora do CORS e medir a requisição inteira
+app.add_middleware(MiddlewareObservabilidade)
+
+
+# Readiness probe (/ready) e métricas do Prometheus (/metrics)
+app.include_router(health.router)
 
 # Rota para adicionar documentos à base
 app.include_router(upload.router)
 
+# Análise de riscos e prazos de um PDF enviado na hora, sem passar pela base. Incluída antes de
+# analysis.router: as duas usam o prefixo /analysis e /analysis/{file_name} capturaria
+# /analysis/process-contract
+app.include_router(risks.router)
+
 # Rota para analisar um documento existente na base
 app.include_router(analysis.router)
 
+# Rota de perguntas (chat) sobre os documentos da base
+app.include_router(chat.router)
+
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=5000, reload=True)
\ No newline at end of file
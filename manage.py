@@ -0,0 +1,101 @@
+"""
+Comandos de administração do AuditIA.
+
+Uso:
+    python manage.py migrate   # cria/atualiza o schema do banco (rodar antes de subir a API/workers)
+    python manage.py check     # testa a conexão com o Postgres e com o S3
+    python manage.py indexes [--recriar]        # cria/reconstrói os índices HNSW das coleções
+    python manage.py recall [--ef-search 40,80,160] [--amostras 50] [--k 10]
+                                                # recall/latência do HNSW contra a busca exata
+    python manage.py ingest <diretório>         # ingestão em massa dos PDFs de um diretório
+    python manage.py ingest --lote 12           # retoma um lote interrompido
+"""
+import argparse
+import os
+import sys
+
+
+def migrate(_args):
+    from app.migrations import apply_migrations
+    from database import engine
+
+    apply_migrations(engine)
+    print("Schema atualizado.")
+
+
+def check(_args):
+    from app.ia.utils import check_s3
+    from database import test_database
+
+    test_database()
+    if not check_s3():
+        sys.exit(1)
+
+
+def indexes(args):
+    from app.ia.vector_index import criar_indices_ann
+
+    criados = criar_indices_ann(recriar=args.recriar)
+    print(f"{len(criados)} índice(s) HNSW criado(s)." if criados else "Índices HNSW em dia.")
+
+
+def recall(args):
+    from app.ia.utils import COLLECTION_NAME
+    from app.ia.vector_index import relatorio_recall
+
+    valores_ef = [int(valor) for valor in args.ef_search.split(",")]
+    linhas = relatorio_recall(args.colecao or COLLECTION_NAME, amostras=args.amostras, k=args.k, valores_ef=valores_ef)
+    print(f"{'ef_search':>10} {f'recall@{args.k}':>10} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for linha in linhas:
+        ef = "exata" if linha["ef_search"] is None else linha["ef_search"]
+        print(f"{ef:>10} {linha['recall']:>10.3f} {linha['p50_ms']:>9.2f} {linha['p95_ms']:>9.2f}")
+
+
+def ingest(args):
+    from app.workers.ingestao_lote import claim_batch, criar_lote, processar_lote, registrar_diretorio
+
+    if args.lote is None:
+        if not args.diretorio or not os.path.isdir(args.diretorio):
+            sys.exit("Informe um diretório existente ou --lote para retomar um lote.")
+        lote_id = criar_lote(os.path.abspath(args.diretorio))
+        registro = registrar_diretorio(lote_id, args.diretorio)
+        print(f"Lote {lote_id}: {registro['registrados']} arquivo(s) registrado(s), {len(registro['ignorados'])} ignorado(s).")
+        for ignorado in registro["ignorados"]:
+            print(f"  ignorado: {ignorado['file_name']} ({ignorado['motivo']})")
+    else:
+        lote_id = args.lote
+
+    if not claim_batch(lote_id):
+        sys.exit(f"Lote {lote_id} sem arquivos disponíveis ou em processamento por outro worker.")
+    resumo = processar_lote(lote_id)
+    print(f"Lote {lote_id} ({resumo['status']}): {resumo['arquivos']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comandos de administração do AuditIA.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("migrate", help="Cria/atualiza as tabelas, a extensão vector e os índices.").set_defaults(func=migrate)
+    comandos.add_parser("check", help="Testa a conexão com o Postgres e com o S3.").set_defaults(func=check)
+    indices = comandos.add_parser("indexes", help="Cria os índices HNSW que faltam (ou reconstrói todos).")
+    indices.add_argument("--recriar", action="store_true", help="Reconstrói os índices existentes com os parâmetros atuais.")
+    indices.set_defaults(func=indexes)
+    relatorio = comandos.add_parser("recall", help="Recall e latência do índice HNSW contra a busca exata.")
+    relatorio.add_argument("--colecao", help="Coleção do PGVector (padrão: a de documentos).")
+    relatorio.add_argument("--ef-search", default="40,80,160", help="Valores de hnsw.ef_search, separados por vírgula.")
+    relatorio.add_argument("--amostras", type=int, default=50, help="Quantidade de consultas sorteadas.")
+    relatorio.add_argument("--k", type=int, default=10)
+    relatorio.set_defaults(func=recall)
+    ingestao = comandos.add_parser("ingest", help="Ingestão em massa dos PDFs de um diretório (ou retoma um lote).")
+    ingestao.add_argument("diretorio", nargs="?", help="Diretório com os PDFs (recursivo).")
+    ingestao.add_argument("--lote", type=int, help="Retoma o lote informado em vez de criar um novo.")
+    ingestao.set_defaults(func=ingest)
+    args = parser.parse_args()
+
+    from app.observability import configurar_logs
+
+    configurar_logs()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
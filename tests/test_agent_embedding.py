@@ -0,0 +1,17 @@
+from langchain_core.documents import Document
+
+from app.ia.agents import agent_embedding
+
+
+def test_nova_versao_sem_texto_tira_a_anterior_das_buscas(monkeypatch):
+    vigentes = [("id-1", "Cláusula primeira.", {"chunk_hash": "a"}), ("id-2", "Cláusula segunda.", {"chunk_hash": "b"})]
+    publicadas = []
+    monkeypatch.setattr(agent_embedding, "list_current_chunks", lambda file_name, pending_version=None: vigentes)
+    monkeypatch.setattr(agent_embedding, "publish_chunk_version", lambda *args: publicadas.append(args))
+
+    resumo = agent_embedding.update_embeddings(
+        [Document(page_content="  ", metadata={"page_number": 1})], "contrato.pdf", 2
+    )
+
+    assert resumo == {"total": 0, "mantidos": 0, "realocados": 0, "inseridos": 0, "removidos": 2}
+    assert publicadas == [("contrato.pdf", 2, ["id-1", "id-2"], {})]
@@ -0,0 +1,20 @@
+from app.ia.agents.agent_risco_prazos import MatcherRegrasRisco
+from config import REGRAS_RISCO
+
+
+def test_palavras_chave_sobrepostas_acionam_as_duas_regras():
+    # "comarca" (FORO_E_LEGISLACAO) e "marcas" (PROPRIEDADE_INTELECTUAL) se sobrepõem em "comarcas"
+    matcher = MatcherRegrasRisco(REGRAS_RISCO)
+
+    acertos = list(matcher.varrer("Fica eleito o foro das Comarcas da capital."))
+
+    assert ("FORO_E_LEGISLACAO", "comarca", 23) in acertos
+    assert ("PROPRIEDADE_INTELECTUAL", "marcas", 25) in acertos
+    assert matcher.categorias_encontradas("comarcas") == ["PROPRIEDADE_INTELECTUAL", "FORO_E_LEGISLACAO"]
+
+
+def test_palavras_chave_contidas_em_outras():
+    matcher = MatcherRegrasRisco({"MULTA": ["multa", "multas"], "DANOS": ["danos", "perdas e danos"]})
+
+    assert sorted(matcher.varrer("multas")) == [("MULTA", "multa", 0), ("MULTA", "multas", 0)]
+    assert sorted(matcher.varrer("Perdas e Danos")) == [("DANOS", "danos", 9), ("DANOS", "perdas e danos", 0)]